@@ -1,13 +1,33 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import UserProfile, Reminder, EmailLog
+from .models import UserProfile, Reminder, EmailLog, MessageTemplate
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin
+from django.db.models import Q
+from . import search
 
-class ReminderAdmin(admin.ModelAdmin):
+class FullTextSearchAdmin(admin.ModelAdmin):
+    """
+    Admin search through the full-text index (core.search), plus exact matches
+    on exact_search_fields. Uses search_fields when the index isn't installed.
+    """
+    exact_search_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.is_available(self.model):
+            return super().get_search_results(request, queryset, search_term)
+
+        matches = search.search(queryset, search_term).values('id')
+        condition = Q(id__in=matches)
+        for field in self.exact_search_fields:
+            condition |= Q(**{f'{field}__iexact': search_term})
+        return queryset.filter(condition), False
+
+class ReminderAdmin(FullTextSearchAdmin):
     list_display = ('title', 'user_info', 'scheduled_time', 'status', 'retry_count', 'created_at')
     list_filter = ('status', 'created_at', 'scheduled_time')
     search_fields = ('title', 'message', 'user__username', 'user__email')
+    exact_search_fields = ('user__username', 'user__email')
     readonly_fields = ('created_at', 'updated_at', 'retry_count', 'last_retry')
     
     def user_info(self, obj):
@@ -15,11 +35,13 @@ class ReminderAdmin(admin.ModelAdmin):
     
     user_info.short_description = 'User'
 
-class EmailLogAdmin(admin.ModelAdmin):
+class EmailLogAdmin(FullTextSearchAdmin):
     list_display = ('subject', 'to_email', 'sent_at', 'status', 'related_reminder')
     list_filter = ('status', 'sent_at')
-    search_fields = ('subject', 'to_email', 'body')
-    readonly_fields = ('sent_at',)
+    search_fields = ('subject', 'to_email')
+    readonly_fields = ('sent_at', 'body')
+    exclude = ('message_body',)
+    list_select_related = ('reminder',)
     
     def related_reminder(self, obj):
         if obj.reminder:
@@ -39,6 +61,13 @@ class UserProfileAdmin(admin.ModelAdmin):
     
     user_email.short_description = 'Email'
 
+class MessageTemplateAdmin(admin.ModelAdmin):
+    list_display = ('name', 'variant', 'subject', 'updated_at')
+    list_filter = ('name',)
+    search_fields = ('name', 'subject')
+    readonly_fields = ('created_at', 'updated_at')
+
 admin.site.register(UserProfile, UserProfileAdmin)
 admin.site.register(Reminder, ReminderAdmin)
-admin.site.register(EmailLog, EmailLogAdmin)
\ No newline at end of file
+admin.site.register(EmailLog, EmailLogAdmin)
+admin.site.register(MessageTemplate, MessageTemplateAdmin)
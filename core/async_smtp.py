@@ -0,0 +1,186 @@
+"""
+Asyncio delivery engine, enabled with EMAIL_ENGINE = 'async'.
+
+Instead of one blocking SMTP conversation per task, a worker process keeps an
+event loop in a background thread with a pool of at most
+EMAIL_ASYNC_POOL_SIZE persistent SMTP connections. send_email_batch_async
+hands a whole batch to that loop, which sends the messages concurrently over
+the pool. Connections stay open between batches and are reopened when the
+server has dropped them.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+import aiosmtplib
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.core.mail import EmailMessage
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPPool:
+    """A bounded pool of persistent SMTP connections, used from a single event loop"""
+
+    def __init__(self, size, host, port, username='', password='', use_tls=False, use_ssl=False, timeout=None):
+        self.size = size
+        self.options = {
+            'hostname': host,
+            'port': port,
+            'username': username or None,
+            'password': password or None,
+            'use_tls': use_ssl,
+            'start_tls': use_tls,
+            'timeout': timeout,
+        }
+        self._idle = []
+        self._slots = None
+
+    async def _connect(self):
+        options = dict(self.options)
+        username = options.pop('username')
+        password = options.pop('password')
+        client = aiosmtplib.SMTP(**options)
+        await client.connect()
+        if username:
+            await client.login(username, password)
+        return client
+
+    async def _acquire(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        await self._slots.acquire()
+        while self._idle:
+            client = self._idle.pop()
+            if client.is_connected:
+                return client
+        try:
+            return await self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, client, reuse=True):
+        if reuse and client.is_connected:
+            self._idle.append(client)
+        else:
+            client.close()
+        self._slots.release()
+
+    async def send(self, message):
+        """Send one email.message.Message, retrying once on a connection the server has dropped"""
+        for attempt in (1, 2):
+            client = await self._acquire()
+            try:
+                await client.send_message(message)
+            except aiosmtplib.SMTPServerDisconnected:
+                self._release(client, reuse=False)
+                if attempt == 2:
+                    raise
+            except (aiosmtplib.SMTPResponseException, aiosmtplib.SMTPRecipientsRefused):
+                # The server rejected this message; the connection is still usable
+                try:
+                    await client.rset()
+                except aiosmtplib.SMTPException:
+                    self._release(client, reuse=False)
+                else:
+                    self._release(client)
+                raise
+            except BaseException:
+                self._release(client, reuse=False)
+                raise
+            else:
+                self._release(client)
+                return
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for client in idle:
+            try:
+                await client.quit()
+            except aiosmtplib.SMTPException:
+                client.close()
+
+
+def build_pool():
+    return SMTPPool(
+        settings.EMAIL_ASYNC_POOL_SIZE,
+        settings.EMAIL_HOST,
+        settings.EMAIL_PORT,
+        username=settings.EMAIL_HOST_USER,
+        password=settings.EMAIL_HOST_PASSWORD,
+        use_tls=settings.EMAIL_USE_TLS,
+        use_ssl=settings.EMAIL_USE_SSL,
+        timeout=settings.EMAIL_TIMEOUT,
+    )
+
+
+async def send_all(pool, messages, from_email):
+    """
+    Send messages concurrently over the pool. Returns a list of (message, error)
+    in input order, where error is None for a delivered message.
+    """
+    async def send(message):
+        email = EmailMessage(message['subject'], message['body'], from_email, [message['to_email']])
+        start = time.monotonic()
+        try:
+            await pool.send(email.message())
+        except Exception as exc:
+            logger.error(f"Failed to send email to {message['to_email']}: {exc}")
+            return message, str(exc) or exc.__class__.__name__
+        finally:
+            metrics.observe('notimailer_smtp_duration_seconds', time.monotonic() - start)
+        return message, None
+
+    return await asyncio.gather(*(send(message) for message in messages))
+
+
+class _Engine:
+    """The event loop thread and connection pool of one worker process"""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        self.pool = build_pool()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='async-smtp', daemon=True)
+        self.thread.start()
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def stop(self):
+        self.run(self.pool.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Return this process's engine, starting one after a fork"""
+    global _engine
+    with _engine_lock:
+        if _engine is None or _engine.pid != os.getpid():
+            _engine = _Engine()
+        return _engine
+
+
+@worker_process_shutdown.connect
+def shutdown(**kwargs):
+    global _engine
+    with _engine_lock:
+        if _engine is not None and _engine.pid == os.getpid():
+            _engine.stop()
+        _engine = None
+
+
+def send_messages(messages, from_email):
+    """Send a batch from synchronous code (a Celery task) through the process-wide pool"""
+    engine = get_engine()
+    return engine.run(send_all(engine.pool, messages, from_email))
@@ -0,0 +1,127 @@
+"""
+JWT authentication without a user query on every request.
+
+CachedJWTAuthentication resolves the token's user from two caches before
+falling back to the database:
+- a per-process dict, kept for AUTH_USER_LOCAL_CACHE_TTL seconds
+- the default (Redis) cache, kept for AUTH_USER_CACHE_TTL seconds
+
+Saving or deleting a user drops both entries (core.signals), which covers
+deactivation through the admin or the API. Other processes only see the
+change once their local entry expires, and queryset.update() skips the
+signals, so the timeouts bound how long a deactivated user stays signed in.
+
+With AUTH_JWT_STATELESS the user is built from the token's claims (see
+MyTokenObtainPairSerializer) and never loaded: no query at all, but changes
+to the user, including deactivation, only apply to tokens issued afterwards.
+
+Either way request.user must not be saved; code that writes to the user
+fetches it first (UserProfileView.get_object).
+"""
+import logging
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+# The password hash is left out of the shared cache
+CACHED_FIELDS = [
+    field.attname for field in User._meta.concrete_fields if field.attname != 'password'
+]
+
+_local_cache = {}
+_lock = threading.Lock()
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_user(user_id):
+    """Drop a user from this process's cache and the shared cache"""
+    with _lock:
+        _local_cache.pop(user_id, None)
+    try:
+        cache.delete(user_cache_key(user_id))
+    except Exception as exc:
+        logger.warning(f"Could not invalidate cached user {user_id}: {exc}")
+
+
+def get_local(user_id):
+    with _lock:
+        entry = _local_cache.get(user_id)
+    if entry is None or entry[0] < time.monotonic():
+        return None
+    return entry[1]
+
+
+def set_local(user_id, values):
+    with _lock:
+        if len(_local_cache) >= settings.AUTH_USER_LOCAL_CACHE_SIZE:
+            _local_cache.clear()
+        _local_cache[user_id] = (time.monotonic() + settings.AUTH_USER_LOCAL_CACHE_TTL, values)
+
+
+def get_cached_user(user_id):
+    """Return the user's cached field values, loading and caching them on a miss"""
+    values = get_local(user_id)
+    if values is not None:
+        return values
+    try:
+        values = cache.get(user_cache_key(user_id))
+    except Exception as exc:
+        logger.warning(f"User cache unavailable: {exc}")
+        values = None
+    if values is None:
+        values = User.objects.filter(pk=user_id).values_list(*CACHED_FIELDS).first()
+        if values is None:
+            return None
+        try:
+            cache.set(user_cache_key(user_id), values, settings.AUTH_USER_CACHE_TTL)
+        except Exception as exc:
+            logger.warning(f"User cache unavailable: {exc}")
+    set_local(user_id, values)
+    return values
+
+
+def stateless_user(validated_token, user_id):
+    """Unsaved User carrying only what the token's claims say about it"""
+    return User(
+        id=user_id,
+        username=validated_token.get('username', ''),
+        email=validated_token.get('email', ''),
+        is_staff=validated_token.get('is_staff', False),
+        is_active=True
+    )
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication resolving users from the user cache or the token's claims"""
+
+    def get_user(self, validated_token):
+        # Revocation compares the password hash, which isn't cached
+        if api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if settings.AUTH_JWT_STATELESS:
+            return stateless_user(validated_token, user_id)
+
+        values = get_cached_user(user_id)
+        if values is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        user = User.from_db('default', CACHED_FIELDS, values)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
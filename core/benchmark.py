@@ -0,0 +1,293 @@
+"""
+Benchmarks for the scheduler, fan-out and API hot paths (`manage.py benchmark`).
+
+A run seeds `size` reminders and email logs, one user (with a profile) per ten
+reminders, then measures each scenario's wall time, SQL query count and peak
+Python memory (tracemalloc). Results are compared against a stored baseline
+per database vendor and size.
+
+delivery() compares the two email engines instead: it sends the same batch
+through send_email_batch and send_email_batch_async to an in-process SMTP
+sink and reports messages per second.
+"""
+import asyncio
+import gc
+import json
+import os
+import random
+import socket
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from . import async_smtp
+from .models import EmailLog, MessageBody, Reminder, UserProfile
+from .tasks import birthday_task, clean_old_logs, reminder_task, send_email_batch, send_email_batch_async
+
+SEED_BATCH_SIZE = 5000
+USERNAME_PREFIX = 'bench'
+DUE_EVERY = 100  # one past reminder in this many is still pending, i.e. due
+BODY_VARIANTS = 100
+METRICS = ('wall_time', 'queries', 'peak_memory')
+# Absolute headroom so millisecond-scale scenarios don't fail on noise
+SLACK = {'wall_time': 0.05, 'queries': 0, 'peak_memory': 1024 * 1024}
+
+
+def _batches(objects, size=SEED_BATCH_SIZE):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@contextmanager
+def _explicit_sent_at():
+    """Let bulk_create keep the sent_at values set on seeded logs"""
+    field = EmailLog._meta.get_field('sent_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def seed(size, seed_value=0):
+    """Seed `size` reminders and email logs. Returns the user the API scenarios run as."""
+    rng = random.Random(seed_value)
+    now = timezone.now()
+    user_count = max(size // 10, 1)
+    password = make_password('bench')
+
+    for batch in _batches(
+        User(username=f'{USERNAME_PREFIX}{i}', email=f'{USERNAME_PREFIX}{i}@example.com', password=password)
+        for i in range(user_count)
+    ):
+        User.objects.bulk_create(batch)
+    user_ids = list(
+        User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('id').values_list('id', flat=True)
+    )
+
+    def profiles():
+        for user_id in user_ids:
+            birthdate = date(1990, 1, 1) + timedelta(days=rng.randrange(365))
+            yield UserProfile(user_id=user_id, birthdate=birthdate, birthday_key=UserProfile.birthday_key_for(birthdate))
+
+    for batch in _batches(profiles()):
+        UserProfile.objects.bulk_create(batch)
+
+    def reminders():
+        for i in range(size):
+            scheduled_time = now + timedelta(minutes=rng.randint(-30 * 24 * 60, 30 * 24 * 60))
+            if scheduled_time > now or i % DUE_EVERY == 0:
+                status = 'pending'
+            else:
+                status = 'sent'
+            yield Reminder(
+                user_id=user_ids[i % user_count],
+                title=f'Reminder {i}',
+                message=f'Benchmark message {i % BODY_VARIANTS}',
+                scheduled_time=scheduled_time,
+                status=status
+            )
+
+    for batch in _batches(reminders()):
+        Reminder.objects.bulk_create(batch)
+    reminder_ids = list(Reminder.objects.order_by('id').values_list('id', flat=True)) or [None]
+
+    bodies = MessageBody.objects.intern_many([f'Benchmark message {i}' for i in range(BODY_VARIANTS)])
+    body_list = list(bodies.values())
+
+    def logs():
+        for i in range(size):
+            yield EmailLog(
+                reminder_id=reminder_ids[i % len(reminder_ids)],
+                to_email=f'{USERNAME_PREFIX}{i % user_count}@example.com',
+                subject=f'Reminder {i}',
+                message_body=body_list[i % BODY_VARIANTS],
+                status='success' if i % 20 else 'failed',
+                # Half the logs are past the 30 day retention window
+                sent_at=now - timedelta(minutes=rng.randint(0, 60 * 24 * 60)),
+            )
+
+    with _explicit_sent_at():
+        for batch in _batches(logs()):
+            EmailLog.objects.bulk_create(batch)
+
+    return User.objects.get(id=user_ids[0])
+
+
+def measure(fn):
+    """Run fn and return its wall time (seconds), SQL query count and peak memory (bytes)"""
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(count):
+            fn()
+        wall_time = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'wall_time': round(wall_time, 4), 'queries': queries, 'peak_memory': peak}
+
+
+def api_scenario(user, url_name):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    url = reverse(url_name)
+
+    def run():
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+
+    return run
+
+
+def scenarios(user):
+    """The measured scenarios in run order: read-only API calls first, then the tasks"""
+    return [
+        ('api_reminders', api_scenario(user, 'reminder-list')),
+        ('api_email_logs', api_scenario(user, 'email_log-list')),
+        ('api_dashboard', api_scenario(user, 'dashboard')),
+        ('reminder_task', reminder_task),
+        ('birthday_task', birthday_task),
+        ('clean_old_logs', clean_old_logs),
+    ]
+
+
+def run(size, seed_value=0):
+    """Seed a dataset of the given size and measure every scenario against it"""
+    user = seed(size, seed_value)
+    return {name: measure(fn) for name, fn in scenarios(user)}
+
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, baseline):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return (scenario, metric, baseline, current) for every regression. Any
+    extra query is a regression; time and memory may grow by `tolerance`
+    (or by SLACK, whichever is larger).
+    """
+    regressions = []
+    for name, metrics in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        for metric in METRICS:
+            if metric not in expected:
+                continue
+            if metric == 'queries':
+                limit = expected[metric]
+            else:
+                limit = max(expected[metric] * (1 + tolerance), expected[metric] + SLACK[metric])
+            if metrics[metric] > limit:
+                regressions.append((name, metric, expected[metric], metrics[metric]))
+    return regressions
+
+
+class SinkHandler:
+    """Accepts every message after `latency` seconds, standing in for a remote SMTP server"""
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.received += 1
+        return '250 Message accepted for delivery'
+
+
+@contextmanager
+def smtp_sink(latency=0):
+    """Run an in-process SMTP server and point both delivery engines at it. Yields its handler."""
+    # aiosmtpd is only needed for the delivery benchmark and the tests
+    from aiosmtpd.controller import Controller
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    handler = SinkHandler(latency)
+    controller = Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    try:
+        with override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=port,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            EMAIL_USE_TLS=False,
+            EMAIL_USE_SSL=False,
+            EMAIL_DOMAIN_RATE_LIMITS={},
+        ):
+            try:
+                yield handler
+            finally:
+                # The async engine's pool is connected to this sink
+                async_smtp.shutdown()
+    finally:
+        controller.stop()
+
+
+def delivery(count, latency=0):
+    """
+    Send the same `count` messages through each engine to an SMTP sink that
+    answers every message after `latency` seconds. Returns, per engine, the
+    messages sent, the wall time and the messages per second. Both engines
+    record their outcomes, so this includes writing the email logs.
+    """
+    messages = [
+        {
+            'to_email': f'{USERNAME_PREFIX}{i}@example.com',
+            'subject': f'Reminder {i}',
+            'body': f'Benchmark message {i % BODY_VARIANTS}',
+        }
+        for i in range(count)
+    ]
+    results = {}
+    with smtp_sink(latency):
+        for engine, send in (('sync', send_email_batch), ('async', send_email_batch_async)):
+            start = time.perf_counter()
+            sent = send(messages)
+            wall_time = time.perf_counter() - start
+            results[engine] = {
+                'messages': sent,
+                'wall_time': round(wall_time, 4),
+                'messages_per_second': round(sent / wall_time, 1),
+            }
+    return results
@@ -0,0 +1,76 @@
+"""
+Bulk writes for /api/reminders/bulk/.
+
+bulk_create, bulk_update and raw deletes skip the model signals, so the
+scheduler queue and the cached dashboard are updated here once per request
+instead of once per reminder.
+"""
+import logging
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from . import scheduler
+from .cache import invalidate_dashboards
+from .models import EmailLog, Reminder
+
+logger = logging.getLogger(__name__)
+
+
+def _after_write(user_id, reminders=(), deleted_ids=()):
+    """Once committed, drop the user's cached dashboard and update the scheduler queue in one call"""
+    def refresh():
+        invalidate_dashboards([user_id])
+        if not scheduler.is_enabled():
+            return
+        try:
+            if reminders:
+                scheduler.schedule(reminders)
+            if deleted_ids:
+                scheduler.unschedule(deleted_ids)
+        except Exception as exc:
+            # The reconciliation sweep picks the reminders up instead
+            logger.error(f"Could not update the scheduler queue for user {user_id}: {exc}")
+
+    transaction.on_commit(refresh)
+
+
+def create_reminders(user, items):
+    """Create reminders for user from validated serializer data"""
+    reminders = [Reminder(user=user, **item) for item in items]
+    with transaction.atomic():
+        Reminder.objects.bulk_create(reminders, batch_size=settings.REMINDER_BULK_BATCH_SIZE)
+        _after_write(user.id, reminders=reminders)
+    return reminders
+
+
+def update_reminders(user, reminders, fields):
+    """Save the given fields of already modified reminders"""
+    now = timezone.now()
+    for reminder in reminders:
+        reminder.updated_at = now
+    with transaction.atomic():
+        Reminder.objects.bulk_update(
+            reminders, [*fields, 'updated_at'], batch_size=settings.REMINDER_BULK_BATCH_SIZE
+        )
+        _after_write(user.id, reminders=reminders)
+    return reminders
+
+
+def delete_reminders(user, ids):
+    """Delete the user's reminders with the given ids and their email logs. Returns the deleted ids."""
+    ids = list(Reminder.objects.filter(user=user, id__in=ids).values_list('id', flat=True))
+    if not ids:
+        return []
+    batch_size = settings.REMINDER_BULK_BATCH_SIZE
+    log_table = connection.ops.quote_name(EmailLog._meta.db_table)
+    reminder_table = connection.ops.quote_name(Reminder._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            placeholders = ', '.join(['%s'] * len(batch))
+            # Plain DELETEs skip the per-row collection and signals of QuerySet.delete();
+            # EmailLog is the only model referencing Reminder (on_delete=CASCADE)
+            cursor.execute(f'DELETE FROM {log_table} WHERE reminder_id IN ({placeholders})', batch)
+            cursor.execute(f'DELETE FROM {reminder_table} WHERE id IN ({placeholders})', batch)
+        _after_write(user.id, deleted_ids=ids)
+    return ids
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.cache import cache
+
+
+def dashboard_cache_key(user_id):
+    return f'dashboard:{user_id}'
+
+
+def get_dashboard(user_id):
+    return cache.get(dashboard_cache_key(user_id))
+
+
+def set_dashboard(user_id, data):
+    cache.set(dashboard_cache_key(user_id), data, settings.DASHBOARD_CACHE_TIMEOUT)
+
+
+def invalidate_dashboards(user_ids):
+    """Drop the cached dashboard payload for each given user"""
+    keys = {dashboard_cache_key(user_id) for user_id in user_ids if user_id is not None}
+    if keys:
+        cache.delete_many(list(keys))
@@ -0,0 +1,21 @@
+from rest_framework import filters
+from rest_framework.settings import api_settings
+from . import search
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    ?search= backed by the full-text index (core.search), best matches first
+    unless ?ordering= is given. Falls back to SearchFilter's substring matching
+    over search_fields when the index isn't installed.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or not search.is_available(queryset.model):
+            return super().filter_queryset(request, queryset, view)
+
+        queryset = search.search(queryset, ' '.join(terms))
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return queryset
+        return queryset.order_by('-search_rank')
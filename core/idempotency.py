@@ -0,0 +1,84 @@
+"""
+Protection against sending the same email twice.
+
+POST /api/send-email/ accepts an Idempotency-Key header. The first request
+with a key is processed and its response stored for IDEMPOTENCY_KEY_TTL
+seconds; a retry with the same key gets that response back instead of
+queueing another email. Reusing a key for a different payload is rejected.
+
+The email tasks claim a dedup key for each delivery attempt (task id, retry
+number and, for batches, the message's position) in Redis before talking to
+SMTP. A message redelivered after a worker crash or a visibility timeout
+finds the key and is skipped. The key is 'sending' while the attempt is in
+progress and expires after EMAIL_DEDUP_SENDING_TTL, so an attempt whose
+worker died before sending can go out again later. Once the attempt is over
+(sent, or handed to a retry) it is 'done' for EMAIL_DEDUP_TTL. Requires
+Redis 7 or later for SET NX GET.
+"""
+import hashlib
+import json
+import logging
+from django.conf import settings
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'dedup:send:'
+REQUEST_KEY_PREFIX = 'idempotency:send-email:'
+MAX_KEY_LENGTH = 255
+
+SENDING = 'sending'
+DONE = 'done'
+
+
+def get_client():
+    return get_redis_connection('default')
+
+
+def request_key(user_id, key):
+    return f'{REQUEST_KEY_PREFIX}{user_id}:{key}'
+
+
+def fingerprint(data):
+    """Hash of a request payload, to detect a key reused for a different request"""
+    raw = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def attempt_key(task_id, retries, index=None):
+    key = f'{KEY_PREFIX}{task_id}:{retries}'
+    return key if index is None else f'{key}:{index}'
+
+
+def claim(keys):
+    """
+    Mark delivery attempts as in progress. Returns, for each key, None if the
+    attempt is now claimed by the caller, or the state ('sending' or 'done')
+    it was already in.
+    """
+    if not keys:
+        return []
+    try:
+        pipe = get_client().pipeline(transaction=False)
+        for key in keys:
+            # SET NX GET: claims the key, or returns its value without changing it
+            pipe.set(key, SENDING, nx=True, ex=settings.EMAIL_DEDUP_SENDING_TTL, get=True)
+        states = pipe.execute()
+    except Exception as exc:
+        # Without Redis we can't tell duplicates apart; sending beats dropping mail
+        logger.warning(f"Could not check send dedup keys, sending anyway: {exc}")
+        return [None] * len(keys)
+    return [state.decode() if isinstance(state, bytes) else state for state in states]
+
+
+def finish(keys):
+    """Mark attempts as over, so redeliveries of them are skipped for EMAIL_DEDUP_TTL"""
+    if not keys:
+        return
+    try:
+        pipe = get_client().pipeline(transaction=False)
+        for key in keys:
+            pipe.set(key, DONE, ex=settings.EMAIL_DEDUP_TTL)
+        pipe.execute()
+    except Exception as exc:
+        logger.warning(f"Could not update send dedup keys: {exc}")
@@ -0,0 +1,84 @@
+import json
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = "Seed datasets of the given sizes and benchmark the task and API hot paths against a baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[10000],
+            help='Number of reminders and email logs to seed per run (e.g. 10000 100000 1000000)',
+        )
+        parser.add_argument(
+            '--baseline',
+            default=str(settings.BASE_DIR / 'benchmarks' / 'baseline.json'),
+            help='Baseline JSON file, keyed by database vendor and size',
+        )
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='Store this run as the new baseline for the sizes it covered',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Allowed relative growth of wall time and peak memory over the baseline',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Exit with an error if any scenario regressed',
+        )
+        parser.add_argument('--output', help='Also write the results of this run to this JSON file')
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'BENCHMARK', False):
+            raise CommandError(
+                "The benchmark wipes the database, run it with DJANGO_SETTINGS_MODULE=notimailer.settings_bench"
+            )
+
+        baseline = benchmark.load_baseline(options['baseline'])
+        vendor_baseline = baseline.setdefault(connection.vendor, {})
+        results = {}
+        regressions = []
+
+        for size in options['sizes']:
+            call_command('flush', interactive=False, verbosity=0)
+            self.stdout.write(f"Seeding and running {size} rows on {connection.vendor}...")
+            results[str(size)] = run = benchmark.run(size)
+            expected = vendor_baseline.get(str(size), {})
+
+            self.stdout.write(f"{'scenario':<16}{'wall time':>12}{'queries':>10}{'peak memory':>14}{'baseline time':>16}")
+            for name, metrics in run.items():
+                base = expected.get(name, {}).get('wall_time')
+                self.stdout.write(
+                    f"{name:<16}{metrics['wall_time']:>11.3f}s{metrics['queries']:>10}"
+                    f"{metrics['peak_memory'] / 1024 / 1024:>12.1f}MB"
+                    f"{'-' if base is None else f'{base:.3f}s':>16}"
+                )
+
+            for name, metric, before, after in benchmark.compare(run, expected, options['tolerance']):
+                regressions.append((size, name, metric))
+                self.stdout.write(self.style.WARNING(f"{size}: {name} {metric} regressed from {before} to {after}"))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({connection.vendor: results}, f, indent=2, sort_keys=True)
+
+        if options['save_baseline']:
+            vendor_baseline.update(results)
+            benchmark.save_baseline(options['baseline'], baseline)
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {options['baseline']}"))
+
+        if regressions and options['check']:
+            raise CommandError(f"{len(regressions)} benchmark regressions")
+        self.stdout.write(self.style.SUCCESS("Benchmark completed"))
@@ -0,0 +1,48 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = "Send the same batch through the sync and async email engines to a local SMTP sink and compare throughput"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=1000,
+            help='Number of messages each engine sends',
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0.01,
+            help='Seconds the sink waits before accepting each message, like a remote SMTP server',
+        )
+        parser.add_argument('--output', help='Also write the results of this run to this JSON file')
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'BENCHMARK', False):
+            raise CommandError(
+                "The benchmark writes email logs, run it with DJANGO_SETTINGS_MODULE=notimailer.settings_bench"
+            )
+
+        self.stdout.write(
+            f"Sending {options['messages']} messages per engine "
+            f"(sink latency {options['latency'] * 1000:.0f}ms, async pool of {settings.EMAIL_ASYNC_POOL_SIZE})..."
+        )
+        results = benchmark.delivery(options['messages'], options['latency'])
+
+        self.stdout.write(f"{'engine':<10}{'sent':>8}{'wall time':>12}{'messages/s':>14}")
+        for engine, metrics in results.items():
+            self.stdout.write(
+                f"{engine:<10}{metrics['messages']:>8}{metrics['wall_time']:>11.3f}s"
+                f"{metrics['messages_per_second']:>14.1f}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+
+        self.stdout.write(self.style.SUCCESS("Benchmark completed"))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core import partitions
+
+
+class Command(BaseCommand):
+    help = "Create upcoming EmailLog partitions, or convert the table to a partitioned layout (PostgreSQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Convert core_emaillog into a table partitioned by sent_at (one-time, locks the table)',
+        )
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=None,
+            help='Number of future periods to create partitions for (default: EMAIL_LOG_PARTITIONS_AHEAD)',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("EmailLog partitioning is only available on PostgreSQL")
+
+        if options['convert']:
+            try:
+                partitions.convert_to_partitioned()
+            except RuntimeError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(self.style.SUCCESS(f"Converted {partitions.TABLE} to a partitioned table"))
+        elif not partitions.is_partitioned():
+            raise CommandError(f"{partitions.TABLE} is not partitioned, run with --convert first")
+
+        created = partitions.create_partitions(options['ahead'])
+        for name in created:
+            self.stdout.write(f"Created partition {name}")
+        self.stdout.write(self.style.SUCCESS(f"{len(created)} partitions created"))
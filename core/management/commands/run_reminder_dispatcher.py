@@ -0,0 +1,47 @@
+import logging
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+from core import scheduler
+from core.tasks import dispatch_scheduled_reminders
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Send reminders as soon as they are due from the Redis scheduler queue"
+
+    def handle(self, *args, **options):
+        if not scheduler.is_enabled():
+            raise CommandError("Set REMINDER_SCHEDULER_ENABLED=True to use the reminder dispatcher")
+
+        idle = settings.REMINDER_DISPATCHER_IDLE_SECONDS
+        self.stdout.write(self.style.SUCCESS("Reminder dispatcher started"))
+
+        failures = 0
+        while True:
+            # Drop connections the database closed or that outlived CONN_MAX_AGE
+            close_old_connections()
+            try:
+                now = timezone.now()
+                sent = dispatch_scheduled_reminders(now)
+                if sent:
+                    failures = 0
+                    self.stdout.write(f"Dispatched {sent} reminders")
+                    continue
+
+                # Sleep until the next entry is due, but wake up regularly for newly added ones
+                next_due = scheduler.next_due()
+                failures = 0
+                wait = idle if next_due is None else next_due - time.time()
+                time.sleep(min(max(wait, 0), idle))
+            except Exception as exc:
+                # Redis or the database being unavailable must not stop the dispatcher;
+                # reminder_task still sends anything due in the meantime
+                failures += 1
+                backoff = min(idle * 2 ** failures, settings.REMINDER_DISPATCHER_MAX_BACKOFF_SECONDS)
+                logger.error(f"Reminder dispatch failed, retrying in {backoff:.0f}s: {exc}")
+                close_old_connections()
+                time.sleep(backoff)
@@ -0,0 +1,235 @@
+"""
+Delivery metrics in the Prometheus text format, served at /api/metrics/.
+
+Enabled with METRICS_ENABLED. Workers count sends, failures and retries and
+time SMTP calls and the database work of every task. Observations are added
+up in process and written to Redis in one pipeline when the task finishes
+(task_postrun), so every worker process contributes to the same totals. The
+reminder backlog is a gauge refreshed by the update_backlog_metrics beat
+task, and queue depth is read from the broker with LLEN, so scraping never
+queries the reminder or email log tables.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+import redis
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.db import connection
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+VALUES_KEY = 'metrics:values'
+GAUGES_KEY = 'metrics:gauges'
+
+SMTP_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TASK_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'notimailer_emails_sent_total': ('counter', 'Emails delivered', None),
+    'notimailer_emails_failed_total': ('counter', 'Failed delivery attempts', None),
+    'notimailer_emails_retried_total': ('counter', 'Failed emails scheduled for another attempt', None),
+    'notimailer_smtp_duration_seconds': ('histogram', 'Duration of SMTP send calls', SMTP_BUCKETS),
+    'notimailer_task_duration_seconds': ('histogram', 'Celery task run time', TASK_BUCKETS),
+    'notimailer_task_db_seconds': ('histogram', 'Time spent in database queries per Celery task', TASK_BUCKETS),
+    'notimailer_reminder_backlog': ('gauge', 'Due reminders not sent yet, by status', None),
+    'notimailer_reminder_backlog_oldest_seconds': ('gauge', 'Age of the oldest due reminder not sent yet', None),
+    'notimailer_metrics_updated_timestamp_seconds': ('gauge', 'When the backlog gauges were computed', None),
+    'notimailer_celery_queue_length': ('gauge', 'Messages waiting in each Celery queue', None),
+}
+
+# Increments not written to Redis yet: series -> amount
+_pending = {}
+_pending_lock = threading.Lock()
+_task_timers = {}
+_broker = None
+
+
+def is_enabled():
+    return settings.METRICS_ENABLED
+
+
+def get_client():
+    return get_redis_connection('default')
+
+
+def get_broker_client():
+    global _broker
+    if _broker is None:
+        _broker = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+    return _broker
+
+
+def series(name, labels=None, le=None):
+    """Return the series name, e.g. name{task="x"}, with labels in a stable order and le last"""
+    pairs = [f'{key}="{escape(value)}"' for key, value in sorted((labels or {}).items())]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return f'{name}{{{",".join(pairs)}}}' if pairs else name
+
+
+def escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _add(key, amount):
+    with _pending_lock:
+        _pending[key] = _pending.get(key, 0) + amount
+
+
+def inc(name, amount=1, **labels):
+    """Add amount to a counter"""
+    if amount and is_enabled():
+        _add(series(name, labels), amount)
+
+
+def observe(name, value, **labels):
+    """Record one observation in a histogram"""
+    if not is_enabled():
+        return
+    for bound in METRICS[name][2]:
+        if value <= bound:
+            _add(series(f'{name}_bucket', labels, le=bound), 1)
+    _add(series(f'{name}_bucket', labels, le='+Inf'), 1)
+    _add(series(f'{name}_sum', labels), value)
+    _add(series(f'{name}_count', labels), 1)
+
+
+@contextmanager
+def timer(name, **labels):
+    """Observe the duration of the block in a histogram, whether it raises or not"""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        observe(name, time.monotonic() - start, **labels)
+
+
+def flush():
+    """Write the pending increments to Redis in one round trip"""
+    global _pending
+    with _pending_lock:
+        pending, _pending = _pending, {}
+    if not pending:
+        return
+    try:
+        pipe = get_client().pipeline(transaction=False)
+        for key, amount in pending.items():
+            pipe.hincrbyfloat(VALUES_KEY, key, amount)
+        pipe.execute()
+    except Exception as exc:
+        # Metrics must never break delivery; these increments are lost
+        logger.warning(f"Could not write metrics: {exc}")
+
+
+def set_gauges(values):
+    """Store gauges given as {series: value}"""
+    get_client().hset(GAUGES_KEY, mapping=values)
+
+
+class QueryTimer:
+    """execute_wrapper adding up the time spent in database queries"""
+
+    def __init__(self):
+        self.total = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.total += time.monotonic() - start
+
+
+@task_prerun.connect
+def start_task_timers(task_id=None, **kwargs):
+    if not is_enabled():
+        return
+    query_timer = QueryTimer()
+    connection.execute_wrappers.append(query_timer)
+    _task_timers[task_id] = (time.monotonic(), query_timer)
+
+
+@task_postrun.connect
+def stop_task_timers(task_id=None, task=None, **kwargs):
+    timers = _task_timers.pop(task_id, None)
+    if timers is not None:
+        start, query_timer = timers
+        if query_timer in connection.execute_wrappers:
+            connection.execute_wrappers.remove(query_timer)
+        observe('notimailer_task_duration_seconds', time.monotonic() - start, task=task.name)
+        observe('notimailer_task_db_seconds', query_timer.total, task=task.name)
+    flush()
+
+
+def queue_lengths():
+    """Return {queue: length} for METRICS_QUEUES, read from the Redis broker"""
+    if not settings.CELERY_BROKER_URL.startswith(('redis://', 'rediss://')):
+        return {}
+    client = get_broker_client()
+    pipe = client.pipeline(transaction=False)
+    for queue in settings.METRICS_QUEUES:
+        pipe.llen(queue)
+    return dict(zip(settings.METRICS_QUEUES, pipe.execute()))
+
+
+def format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def metric_name(key):
+    """Return the metric a stored series belongs to"""
+    name = key.split('{', 1)[0]
+    for suffix in ('_bucket', '_sum', '_count'):
+        if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+            return name[:-len(suffix)]
+    return name
+
+
+def histogram_order(key, order):
+    """Sort key putting each label set's buckets in ascending order, then its sum and count"""
+    name, _, labels = key.partition('{')
+    labels = labels.rstrip('}')
+    if name.endswith('_bucket'):
+        labels, _, le = labels.rpartition('le="')
+        return (labels.rstrip(','), 0, order.get(le.rstrip('"'), len(order)))
+    return (labels, 1 if name.endswith('_sum') else 2, 0)
+
+
+def render():
+    """Return all metrics in the Prometheus text exposition format"""
+    client = get_client()
+    pipe = client.pipeline(transaction=False)
+    pipe.hgetall(VALUES_KEY)
+    pipe.hgetall(GAUGES_KEY)
+    stored = {}
+    for values in pipe.execute():
+        for key, value in values.items():
+            key = key.decode() if isinstance(key, bytes) else key
+            stored[key] = float(value)
+    try:
+        for queue, length in queue_lengths().items():
+            stored[series('notimailer_celery_queue_length', {'queue': queue})] = length
+    except Exception as exc:
+        logger.warning(f"Could not read Celery queue lengths: {exc}")
+
+    by_metric = {}
+    for key, value in stored.items():
+        by_metric.setdefault(metric_name(key), []).append((key, value))
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        samples = by_metric.get(name, [])
+        if buckets:
+            order = {str(bound): i for i, bound in enumerate(buckets)}
+            samples = sorted(samples, key=lambda sample: histogram_order(sample[0], order))
+        else:
+            samples = sorted(samples)
+        lines.extend(f'{key} {format_value(value)}' for key, value in samples)
+    return '\n'.join(lines) + '\n'
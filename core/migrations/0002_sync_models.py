@@ -0,0 +1,128 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="reminder",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="reminders",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RenameField(
+            model_name="reminder",
+            old_name="send_at",
+            new_name="scheduled_time",
+        ),
+        migrations.RemoveField(
+            model_name="reminder",
+            name="sent",
+        ),
+        migrations.AddField(
+            model_name="emaillog",
+            name="error_message",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="emaillog",
+            name="reminder",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="logs",
+                to="core.reminder",
+            ),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="last_retry",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="retry_count",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("sent", "Sent"),
+                    ("failed", "Failed"),
+                ],
+                default="pending",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="title",
+            field=models.CharField(default="", max_length=200),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name="emaillog",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("success", "Success"),
+                    ("failed", "Failed"),
+                    ("retry", "Retry"),
+                ],
+                max_length=10,
+            ),
+        ),
+        migrations.CreateModel(
+            name="UserProfile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("birthdate", models.DateField(blank=True, null=True)),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="profile",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.DeleteModel(
+            name="User",
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_reminder_queued_status"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="emaillog",
+            index=models.Index(
+                fields=["reminder", "-sent_at"], name="emaillog_reminder_sent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="emaillog",
+            index=models.Index(fields=["sent_at"], name="emaillog_sent_at_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="reminder",
+            index=models.Index(
+                condition=models.Q(("status__in", ["pending", "queued"])),
+                fields=["status", "scheduled_time"],
+                name="reminder_due_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reminder",
+            index=models.Index(
+                fields=["user", "scheduled_time"], name="reminder_user_sched_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reminder",
+            index=models.Index(
+                fields=["user", "status", "scheduled_time"],
+                name="reminder_user_status_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:50
+
+from django.db import migrations, models
+from django.db.models.functions import ExtractDay, ExtractMonth
+
+
+def backfill_birthday_key(apps, schema_editor):
+    UserProfile = apps.get_model("core", "UserProfile")
+    UserProfile.objects.filter(birthdate__isnull=False).update(
+        birthday_key=ExtractMonth("birthdate") * 100 + ExtractDay("birthdate")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="birthday_key",
+            field=models.PositiveSmallIntegerField(
+                blank=True, db_index=True, editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(backfill_birthday_key, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:56
+
+import hashlib
+import zlib
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def backfill_message_bodies(apps, schema_editor):
+    EmailLog = apps.get_model("core", "EmailLog")
+    MessageBody = apps.get_model("core", "MessageBody")
+    threshold = getattr(settings, "MESSAGE_BODY_COMPRESS_THRESHOLD", None)
+
+    def pack(digest, text):
+        raw = text.encode("utf-8")
+        if threshold is not None and len(raw) > threshold:
+            return MessageBody(digest=digest, data=zlib.compress(raw))
+        return MessageBody(digest=digest, text=text)
+
+    last_pk = 0
+    while True:
+        rows = list(
+            EmailLog.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", "body")[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+
+        digests = {
+            pk: hashlib.sha256(body.encode("utf-8")).hexdigest() for pk, body in rows
+        }
+        texts = {digests[pk]: body for pk, body in rows}
+        MessageBody.objects.bulk_create(
+            [pack(digest, text) for digest, text in texts.items()],
+            ignore_conflicts=True,
+        )
+        body_ids = dict(
+            MessageBody.objects.filter(digest__in=texts).values_list("digest", "pk")
+        )
+        EmailLog.objects.bulk_update(
+            [EmailLog(pk=pk, message_body_id=body_ids[digests[pk]]) for pk, _ in rows],
+            ["message_body"],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_userprofile_birthday_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MessageBody",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("digest", models.CharField(max_length=64, unique=True)),
+                ("text", models.TextField(blank=True)),
+                ("data", models.BinaryField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="emaillog",
+            name="message_body",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="logs",
+                to="core.messagebody",
+            ),
+        ),
+        migrations.RunPython(backfill_message_bodies, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="emaillog",
+            name="body",
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_message_body_store"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="emaillog",
+            index=models.Index(
+                fields=["sent_at", "id"], name="emaillog_sent_at_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reminder",
+            index=models.Index(
+                fields=["user", "scheduled_time", "id"],
+                name="reminder_user_sched_id_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reminder",
+            index=models.Index(
+                fields=["user", "status", "scheduled_time", "id"],
+                name="reminder_user_status_id_idx",
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name="emaillog",
+            name="emaillog_sent_at_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="reminder",
+            name="reminder_user_sched_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="reminder",
+            name="reminder_user_status_idx",
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def install_search(apps, schema_editor):
+    from core import search
+    search.install(schema_editor.connection)
+
+
+def uninstall_search(apps, schema_editor):
+    from core import search
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """
+    Full-text search (core.search): tsvector columns, GIN indexes and triggers on
+    PostgreSQL, FTS5 tables and triggers on SQLite. Nothing on other databases.
+    """
+
+    dependencies = [
+        ("core", "0007_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def drop_sqlite_search_triggers(apps, schema_editor):
+    # SQLite rebuilds core_messagebody to add the column, which its FTS triggers
+    # on core_emaillog refer to; they are recreated afterwards
+    from core import search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for suffix in ('ai', 'au', 'ad'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS "{search.EMAIL_LOG_TABLE}_fts_{suffix}"')
+
+
+def restore_sqlite_search_triggers(apps, schema_editor):
+    from core import search
+    if schema_editor.connection.vendor == 'sqlite':
+        search.install(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_message_template"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_sqlite_search_triggers, restore_sqlite_search_triggers),
+        migrations.AddField(
+            model_name="messagebody",
+            name="last_used",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(restore_sqlite_search_triggers, drop_sqlite_search_triggers),
+    ]
@@ -1,4 +1,11 @@
+import calendar
+import hashlib
+import zlib
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.template import TemplateSyntaxError
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
@@ -6,13 +13,38 @@ from django.utils import timezone
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     birthdate = models.DateField(null=True, blank=True)
+    # month * 100 + day of birthdate, kept in sync on save so birthday_task can use an index
+    birthday_key = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, db_index=True)
 
     def __str__(self):
         return f"{self.user.username}'s profile"
 
+    @staticmethod
+    def birthday_key_for(day):
+        return day.month * 100 + day.day
+
+    @classmethod
+    def birthday_keys_on(cls, day):
+        """
+        Return the birthday keys celebrated on the given day.
+        Feb 29 birthdays are celebrated on Feb 28 in non-leap years.
+        """
+        keys = [cls.birthday_key_for(day)]
+        if day.month == 2 and day.day == 28 and not calendar.isleap(day.year):
+            keys.append(229)
+        return keys
+
+    def save(self, *args, **kwargs):
+        self.birthday_key = self.birthday_key_for(self.birthdate) if self.birthdate else None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'birthdate' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'birthday_key'}
+        super().save(*args, **kwargs)
+
 class Reminder(models.Model):
     STATUS_CHOICES = (
         ('pending', _('Pending')),
+        ('queued', _('Queued')),
         ('sent', _('Sent')),
         ('failed', _('Failed')),
     )
@@ -27,9 +59,134 @@ class Reminder(models.Model):
     retry_count = models.PositiveSmallIntegerField(default=0)
     last_retry = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # reminder_task: due reminders waiting to be claimed, oldest first
+            models.Index(
+                fields=['status', 'scheduled_time'],
+                name='reminder_due_idx',
+                condition=models.Q(status__in=['pending', 'queued']),
+            ),
+            # Reminder list and dashboard upcoming/status lookups per user; id makes
+            # them match the (scheduled_time, id) keyset pagination order
+            models.Index(fields=['user', 'scheduled_time', 'id'], name='reminder_user_sched_id_idx'),
+            models.Index(fields=['user', 'status', 'scheduled_time', 'id'], name='reminder_user_status_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.title} - {self.user.username}"
 
+class MessageBodyManager(models.Manager):
+    def intern(self, text):
+        """Return the stored body for text, creating it if needed"""
+        return self.intern_many([text])[text]
+
+    def intern_many(self, texts):
+        """Return a dict mapping each text to its stored body, with one lookup and one insert"""
+        by_digest = {MessageBody.digest_for(text): text for text in texts}
+        stored = {body.digest: body for body in self.filter(digest__in=by_digest)}
+        gone = self.touch(stored.values())
+        if gone:
+            # Swept by clean_old_logs since they were read; stored again below
+            stored = {digest: body for digest, body in stored.items() if body.pk not in gone}
+
+        missing = [MessageBody.pack(text) for digest, text in by_digest.items() if digest not in stored]
+        if missing:
+            # Another worker may store the same body concurrently, so re-read after inserting
+            self.bulk_create(missing, ignore_conflicts=True)
+            stored.update((body.digest, body) for body in self.filter(digest__in=[m.digest for m in missing]))
+
+        return {text: stored[digest] for digest, text in by_digest.items()}
+
+    def touch(self, bodies):
+        """
+        Refresh last_used on bodies about to be referenced again, at most once per
+        MESSAGE_BODY_TOUCH_INTERVAL, so clean_old_logs doesn't delete them meanwhile.
+        Returns the pks of bodies that no longer exist.
+        """
+        now = timezone.now()
+        stale = {body.pk for body in bodies
+                 if body.last_used < now - timedelta(seconds=settings.MESSAGE_BODY_TOUCH_INTERVAL)}
+        if not stale or self.filter(pk__in=stale).update(last_used=now) == len(stale):
+            return set()
+        return stale - set(self.filter(pk__in=stale).values_list('pk', flat=True))
+
+class MessageBody(models.Model):
+    """
+    Deduplicated email body keyed by the SHA-256 of its text. Bodies longer than
+    MESSAGE_BODY_COMPRESS_THRESHOLD bytes are stored zlib-compressed in data.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    text = models.TextField(blank=True)
+    data = models.BinaryField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Last time intern() handed the body out; orphans unused past retention are deleted
+    last_used = models.DateTimeField(default=timezone.now)
+
+    objects = MessageBodyManager()
+
+    def __str__(self):
+        return self.digest
+
+    @staticmethod
+    def digest_for(text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def pack(cls, text):
+        """Build an unsaved body for text, compressed when it is over the threshold"""
+        body = cls(digest=cls.digest_for(text))
+        raw = text.encode('utf-8')
+        threshold = settings.MESSAGE_BODY_COMPRESS_THRESHOLD
+        if threshold is not None and len(raw) > threshold:
+            body.data = zlib.compress(raw)
+        else:
+            body.text = text
+        return body
+
+    @property
+    def content(self):
+        return self.unpack(self.text, self.data)
+
+    @staticmethod
+    def unpack(text, data):
+        """Return the body text from the stored text and data columns"""
+        if data is not None:
+            return zlib.decompress(bytes(data)).decode('utf-8')
+        return text
+
+class MessageTemplate(models.Model):
+    """
+    Email subject and body in Django template syntax, rendered per recipient
+    by core.message_templates. Variants of the same name are split between
+    recipients.
+    """
+    name = models.CharField(max_length=100)
+    variant = models.CharField(max_length=50, default='default')
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'variant'], name='message_template_name_variant_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.variant})"
+
+    def clean(self):
+        from .message_templates import compile_source
+        errors = {}
+        for field in ('subject', 'body'):
+            try:
+                compile_source(getattr(self, field))
+            except TemplateSyntaxError as exc:
+                errors[field] = str(exc)
+        if errors:
+            raise ValidationError(errors)
+
 class EmailLog(models.Model):
     STATUS_CHOICES = (
         ('success', _('Success')),
@@ -40,10 +197,40 @@ class EmailLog(models.Model):
     reminder = models.ForeignKey(Reminder, on_delete=models.CASCADE, related_name='logs', null=True, blank=True)
     to_email = models.EmailField()
     subject = models.CharField(max_length=200)
-    body = models.TextField()
+    message_body = models.ForeignKey(MessageBody, on_delete=models.PROTECT, related_name='logs', null=True, blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES)
     sent_at = models.DateTimeField(auto_now_add=True)
     error_message = models.TextField(blank=True, null=True)
 
+    # Body text assigned through the body property, stored on save()
+    _pending_body = None
+
+    class Meta:
+        indexes = [
+            # Email log list and dashboard recent logs, newest first per reminder
+            models.Index(fields=['reminder', '-sent_at'], name='emaillog_reminder_sent_idx'),
+            # clean_old_logs range scan and the (sent_at, id) keyset pagination order
+            models.Index(fields=['sent_at', 'id'], name='emaillog_sent_at_id_idx'),
+        ]
+
     def __str__(self):
         return f"Email to {self.to_email} - {self.status}"
+
+    @property
+    def body(self):
+        if self._pending_body is not None:
+            return self._pending_body
+        return self.message_body.content if self.message_body_id else ''
+
+    @body.setter
+    def body(self, value):
+        self._pending_body = value
+
+    def save(self, *args, **kwargs):
+        if self._pending_body is not None:
+            self.message_body = MessageBody.objects.intern(self._pending_body)
+            self._pending_body = None
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'message_body'} - {'body'}
+        super().save(*args, **kwargs)
@@ -0,0 +1,272 @@
+"""
+Recording of delivery outcomes: the EmailLog row and the reminder status.
+
+By default each outcome is written as soon as it happens. With
+EMAIL_WRITE_BEHIND enabled, outcomes are appended to a Redis stream instead
+and written in bulk by the flush_delivery_outcomes task, triggered once
+EMAIL_WRITE_BEHIND_FLUSH_SIZE entries are waiting and every
+EMAIL_WRITE_BEHIND_FLUSH_SECONDS by beat. Entries are acknowledged only after
+their rows are committed, so recording is at-least-once: a crash between the
+commit and the acknowledgement writes those outcomes again. When the stream
+can't be reached, outcomes are written directly instead.
+"""
+import json
+import logging
+import os
+import socket
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from . import metrics
+from .cache import invalidate_dashboards
+from .models import EmailLog, MessageBody, Reminder
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = 'outcomes:stream'
+GROUP = 'outcome-flushers'
+FLUSH_SCHEDULED_KEY = 'outcomes:flush-scheduled'
+
+
+def outcome(to_email, subject, body, status, reminder_id=None, reminder_status=None, error_message=None):
+    """
+    Build one delivery outcome. status is the EmailLog status ('success' or
+    'failed'), reminder_status the reminder's new status. A failed attempt also
+    counts as a retry on the reminder.
+    """
+    return {
+        'to_email': to_email,
+        'subject': subject,
+        'body': body,
+        'status': status,
+        'reminder_id': reminder_id,
+        'reminder_status': reminder_status,
+        'error_message': error_message,
+    }
+
+
+def record_outcomes(outcomes):
+    """Write outcomes now, or buffer them when EMAIL_WRITE_BEHIND is enabled"""
+    if not outcomes:
+        return
+    count_outcomes(outcomes)
+    if settings.EMAIL_WRITE_BEHIND:
+        try:
+            buffer_outcomes(outcomes)
+            return
+        except RedisError as exc:
+            # The emails are already sent, so the outcomes must not be lost
+            logger.warning(f"Could not buffer {len(outcomes)} delivery outcomes, writing them now: {exc}")
+    write_outcomes(outcomes)
+
+
+def record_outcome(*args, **kwargs):
+    o = outcome(*args, **kwargs)
+    count_outcomes([o])
+    if settings.EMAIL_WRITE_BEHIND:
+        try:
+            buffer_outcomes([o])
+            return
+        except RedisError as exc:
+            logger.warning(f"Could not buffer a delivery outcome, writing it now: {exc}")
+    write_outcome(o)
+
+
+def count_outcomes(outcomes):
+    sent = sum(1 for o in outcomes if o['status'] == 'success')
+    metrics.inc('notimailer_emails_sent_total', sent)
+    metrics.inc('notimailer_emails_failed_total', len(outcomes) - sent)
+
+
+def write_outcome(o):
+    """
+    Write a single outcome in one transaction without fetching the reminder:
+    a filtered UPDATE returning the owner, the body lookup and the log INSERT.
+    """
+    now = timezone.now()
+    reminder_id = o['reminder_id']
+    user_id = None
+
+    with transaction.atomic():
+        if reminder_id:
+            # The UPDATE locks the row, so the reminder can't be deleted before the log is inserted
+            user_id = update_reminder_returning_user(reminder_id, o, now)
+            if user_id is None:
+                reminder_id = None
+
+        # bulk_create skips the post_save signal, which would look the owner up again
+        EmailLog.objects.bulk_create([EmailLog(
+            reminder_id=reminder_id,
+            to_email=o['to_email'],
+            subject=o['subject'],
+            message_body=MessageBody.objects.intern(o['body']),
+            status=o['status'],
+            error_message=o['error_message'],
+        )])
+
+    if user_id is not None:
+        invalidate_dashboards([user_id])
+
+
+def update_reminder_returning_user(reminder_id, o, now):
+    """
+    Apply an outcome to its reminder and return the owner's id, or None if the
+    reminder no longer exists. Uses a single UPDATE ... RETURNING where the
+    database supports it (PostgreSQL, SQLite 3.35+), else an UPDATE and a lookup.
+    """
+    if not supports_update_returning():
+        if o['status'] == 'success':
+            changes = {'status': o['reminder_status'], 'updated_at': now}
+        else:
+            changes = {'status': o['reminder_status'], 'retry_count': F('retry_count') + 1, 'last_retry': now, 'updated_at': now}
+        reminders = Reminder.objects.filter(pk=reminder_id)
+        if not reminders.update(**changes):
+            return None
+        return reminders.values_list('user_id', flat=True).first()
+
+    table = connection.ops.quote_name(Reminder._meta.db_table)
+    timestamp = connection.ops.adapt_datetimefield_value(now)
+    if o['status'] == 'success':
+        assignments, params = 'status = %s, updated_at = %s', [o['reminder_status'], timestamp]
+    else:
+        assignments = 'status = %s, retry_count = retry_count + 1, last_retry = %s, updated_at = %s'
+        params = [o['reminder_status'], timestamp, timestamp]
+    with connection.cursor() as cursor:
+        cursor.execute(f'UPDATE {table} SET {assignments} WHERE id = %s RETURNING user_id', [*params, reminder_id])
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def supports_update_returning():
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return False
+
+
+def write_outcomes(outcomes):
+    """
+    Write outcomes with one INSERT for the logs and grouped UPDATEs for the reminders.
+    """
+    now = timezone.now()
+    reminder_ids = {o['reminder_id'] for o in outcomes if o['reminder_id']}
+
+    with transaction.atomic():
+        # Logs of reminders deleted in the meantime are kept without the link
+        existing = set(Reminder.objects.filter(id__in=reminder_ids).values_list('id', flat=True)) if reminder_ids else set()
+        bodies = MessageBody.objects.intern_many({o['body'] for o in outcomes})
+        EmailLog.objects.bulk_create([
+            EmailLog(
+                reminder_id=o['reminder_id'] if o['reminder_id'] in existing else None,
+                to_email=o['to_email'],
+                subject=o['subject'],
+                message_body=bodies[o['body']],
+                status=o['status'],
+                error_message=o['error_message'],
+            )
+            for o in outcomes
+        ])
+
+        # Failures first so a later success in the same batch wins
+        retries = Counter()
+        failed_status = {}
+        sent = set()
+        for o in outcomes:
+            if o['reminder_id'] not in existing:
+                continue
+            if o['status'] == 'success':
+                sent.add(o['reminder_id'])
+            else:
+                retries[o['reminder_id']] += 1
+                failed_status[o['reminder_id']] = o['reminder_status']
+
+        groups = defaultdict(list)
+        for reminder_id, count in retries.items():
+            groups[(failed_status[reminder_id], count)].append(reminder_id)
+        for (reminder_status, count), ids in groups.items():
+            Reminder.objects.filter(id__in=ids).update(
+                status=reminder_status,
+                retry_count=F('retry_count') + count,
+                last_retry=now,
+                updated_at=now
+            )
+        if sent:
+            Reminder.objects.filter(id__in=sent).update(status='sent', updated_at=now)
+
+        if existing:
+            invalidate_dashboards(
+                Reminder.objects.filter(id__in=existing).values_list('user_id', flat=True).distinct()
+            )
+
+
+def get_client():
+    return get_redis_connection('default')
+
+
+def buffer_outcomes(outcomes):
+    """
+    Append outcomes to the stream and trigger a flush when enough are waiting.
+    Raises RedisError only if the outcomes were not appended.
+    """
+    client = get_client()
+    pipe = client.pipeline(transaction=False)
+    for o in outcomes:
+        pipe.xadd(STREAM_KEY, {'outcome': json.dumps(o)})
+    pipe.xlen(STREAM_KEY)
+    waiting = pipe.execute()[-1]
+
+    if waiting >= settings.EMAIL_WRITE_BEHIND_FLUSH_SIZE:
+        try:
+            # One triggered flush at a time; beat covers the rest
+            if client.set(FLUSH_SCHEDULED_KEY, 1, nx=True, ex=settings.EMAIL_WRITE_BEHIND_FLUSH_SECONDS):
+                from .tasks import flush_delivery_outcomes
+                flush_delivery_outcomes.delay()
+        except Exception as exc:
+            # Already buffered, so falling back to a direct write would record them twice
+            logger.warning(f"Could not trigger a delivery outcome flush, leaving it to beat: {exc}")
+
+
+def _ensure_group(client):
+    try:
+        client.xgroup_create(STREAM_KEY, GROUP, id='0', mkstream=True)
+    except Exception as exc:
+        if 'BUSYGROUP' not in str(exc):
+            raise
+
+
+def flush(max_entries=None):
+    """
+    Write buffered outcomes to the database and acknowledge them.
+    Entries another flusher read but never acknowledged (it crashed) are
+    claimed after a minute. Returns the number of outcomes written.
+    """
+    max_entries = max_entries or settings.EMAIL_WRITE_BEHIND_FLUSH_SIZE
+    client = get_client()
+    _ensure_group(client)
+    consumer = f'{socket.gethostname()}-{os.getpid()}'
+
+    written = 0
+    while True:
+        _, entries, *_ = client.xautoclaim(STREAM_KEY, GROUP, consumer, min_idle_time=60000, start_id='0-0', count=max_entries)
+        entries = [(entry_id, fields) for entry_id, fields in entries if fields]
+        if not entries:
+            response = client.xreadgroup(GROUP, consumer, {STREAM_KEY: '>'}, count=max_entries)
+            entries = response[0][1] if response else []
+        if not entries:
+            break
+
+        write_outcomes([json.loads(fields[b'outcome']) for _, fields in entries])
+        ids = [entry_id for entry_id, _ in entries]
+        client.xack(STREAM_KEY, GROUP, *ids)
+        client.xdel(STREAM_KEY, *ids)
+        written += len(entries)
+
+    client.delete(FLUSH_SCHEDULED_KEY)
+    if written:
+        logger.info(f"Flushed {written} buffered delivery outcomes")
+    return written
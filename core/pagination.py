@@ -0,0 +1,137 @@
+"""
+Keyset (cursor) pagination for the reminder and email log lists.
+
+Pages are ordered by the view's ordering field with the primary key as a tie
+breaker, e.g. (scheduled_time, id), and the cursor carries the last row's
+values. The next page starts right after that row on an index that matches
+the ordering, so page N costs the same as page 1.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    count_query_param = 'count'
+    # Used when the queryset has no ordering of its own
+    ordering = '-id'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE or 50
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        """Return (field name, descending) of the first ordering term, ignoring expressions"""
+        order_by = [o for o in queryset.query.order_by if isinstance(o, str)] or [self.ordering]
+        term = order_by[0]
+        name = term.lstrip('-')
+        return ('id' if name == 'pk' else name), term.startswith('-')
+
+    def encode_cursor(self, value, pk):
+        raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value, pk])
+        return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, queryset, field_name, cursor):
+        try:
+            raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            value, pk = json.loads(raw)
+            pk = int(pk)
+        except Exception:
+            raise NotFound('Invalid cursor')
+        try:
+            field = queryset.model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            # An annotation such as search_rank; its JSON value is used as is
+            return value, pk
+        try:
+            return field.to_python(value), pk
+        except ValidationError:
+            raise NotFound('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        field_name, descending = self.get_ordering(queryset)
+        self.field_name = field_name
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'estimate':
+            self.count = self.estimate_count(queryset)
+
+        prefix = '-' if descending else ''
+        ordering = [f'{prefix}{field_name}'] if field_name == 'id' else [f'{prefix}{field_name}', f'{prefix}id']
+        queryset = queryset.order_by(*ordering)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self.decode_cursor(queryset, field_name, cursor)
+            lookup = 'lt' if descending else 'gt'
+            if field_name == 'id':
+                queryset = queryset.filter(**{f'id__{lookup}': pk})
+            else:
+                # The redundant bound on the ordering field lets the index range-scan
+                queryset = queryset.filter(
+                    Q(**{f'{field_name}__{lookup}e': value}),
+                    Q(**{f'{field_name}__{lookup}': value}) | Q(**{f'id__{lookup}': pk})
+                )
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def estimate_count(self, queryset):
+        """
+        Approximate number of rows in the list. On PostgreSQL this is the
+        planner's row estimate, which doesn't scan the table; other databases
+        run an exact COUNT.
+        """
+        if connection.vendor != 'postgresql':
+            return queryset.count()
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        # Rows are model instances or, for values() querysets, dicts
+        if isinstance(last, dict):
+            cursor = self.encode_cursor(last[self.field_name], last['id'])
+        else:
+            cursor = self.encode_cursor(getattr(last, self.field_name), last.pk)
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link(), 'results': data}
+        if self.count is not None:
+            response['count'] = self.count
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer', 'description': f'Only with ?{self.count_query_param}=estimate'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,220 @@
+"""
+Optional range partitioning of the EmailLog table by sent_at (PostgreSQL only).
+
+The table is converted once with `manage.py emaillog_partitions --convert`.
+After that, upcoming partitions are created ahead of time and clean_old_logs
+drops whole partitions instead of deleting rows.
+"""
+import logging
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from . import search
+from .models import EmailLog
+
+logger = logging.getLogger(__name__)
+
+TABLE = EmailLog._meta.db_table
+LEGACY_TABLE = f'{TABLE}_legacy'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+INDEX_TABLE_RE = re.compile(rf' ON (?:\S+\.)?"?{TABLE}"? ')
+
+
+def is_partitioned():
+    """Return True if the EmailLog table is a partitioned table"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def period_start(moment, interval=None):
+    """Return the start (UTC) of the partition period containing moment"""
+    interval = interval or settings.EMAIL_LOG_PARTITION_INTERVAL
+    moment = moment.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'day':
+        return moment
+    return moment.replace(day=1)
+
+
+def next_period(start, interval=None):
+    interval = interval or settings.EMAIL_LOG_PARTITION_INTERVAL
+    if interval == 'day':
+        return start + timedelta(days=1)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def partition_name(start, interval=None):
+    interval = interval or settings.EMAIL_LOG_PARTITION_INTERVAL
+    if interval == 'day':
+        return f'{TABLE}_p{start:%Y%m%d}'
+    return f'{TABLE}_p{start:%Y%m}'
+
+
+def _parse_bound(value):
+    value = value.strip().strip("'")
+    if value in ('MINVALUE', 'MAXVALUE'):
+        return None
+    return datetime.fromisoformat(value)
+
+
+def list_partitions():
+    """Return (name, lower, upper) for each range partition, oldest first. Open bounds are None."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            """,
+            [TABLE]
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = BOUND_RE.search(bound)
+        if not match:
+            continue  # the DEFAULT partition
+        partitions.append((name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+    return sorted(partitions, key=lambda p: p[1] or datetime.min.replace(tzinfo=dt_timezone.utc))
+
+
+def create_partitions(ahead=None):
+    """Create partitions for the current period and `ahead` periods after it. Returns created names."""
+    ahead = settings.EMAIL_LOG_PARTITIONS_AHEAD if ahead is None else ahead
+    existing = list_partitions()
+    created = []
+
+    def covered(start, end):
+        return any(
+            (lower is None or lower < end) and (upper is None or upper > start)
+            for _, lower, upper in existing
+        )
+
+    start = period_start(timezone.now())
+    with connection.cursor() as cursor:
+        for _ in range(ahead + 1):
+            end = next_period(start)
+            name = partition_name(start)
+            if not covered(start, end):
+                cursor.execute(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{TABLE}" FOR VALUES FROM (%s) TO (%s)',
+                    [start, end]
+                )
+                created.append(name)
+            start = end
+
+    if created:
+        logger.info(f"Created email log partitions: {', '.join(created)}")
+    return created
+
+
+def drop_partitions_before(threshold):
+    """
+    Detach and drop every partition whose upper bound is at or before threshold.
+    Returns the estimated number of rows dropped (from planner statistics, so no table scan).
+    """
+    dropped_rows = 0
+    for name, _, upper in list_partitions():
+        if upper is None or upper > threshold:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = to_regclass(%s)", [name])
+            rows = cursor.fetchone()[0]
+            cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+            cursor.execute(f'DROP TABLE "{name}"')
+        logger.info(f"Dropped email log partition {name} (~{rows} rows)")
+        dropped_rows += rows
+    return dropped_rows
+
+
+def convert_to_partitioned():
+    """
+    Convert the EmailLog table into a table partitioned by range on sent_at.
+
+    Existing rows stay in place: the old table is renamed and attached as the
+    partition covering everything up to the end of the current period, so
+    conversion does not copy data. It holds an exclusive lock on the table
+    while PostgreSQL validates the attached rows.
+    """
+    if connection.vendor != 'postgresql':
+        raise RuntimeError("EmailLog partitioning requires PostgreSQL")
+    if is_partitioned():
+        raise RuntimeError(f"{TABLE} is already partitioned")
+
+    # The old table keeps every row up to the end of the current period
+    boundary = next_period(period_start(timezone.now()))
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE "{TABLE}" IN ACCESS EXCLUSIVE MODE')
+
+        # Indexes and foreign keys to recreate on the partitioned parent
+        cursor.execute(
+            """
+            SELECT indexname, indexdef FROM pg_indexes
+            WHERE tablename = %s AND indexname <> %s
+            """,
+            [TABLE, f'{TABLE}_pkey']
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            """
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE conrelid = to_regclass(%s) AND contype = 'f'
+            """,
+            [TABLE]
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM "{TABLE}"')
+        next_id = cursor.fetchone()[0]
+
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{LEGACY_TABLE}"')
+        cursor.execute(f'ALTER TABLE "{LEGACY_TABLE}" ALTER COLUMN id DROP IDENTITY IF EXISTS')
+        cursor.execute(f'ALTER TABLE "{LEGACY_TABLE}" ALTER COLUMN id DROP DEFAULT')
+        cursor.execute(f'DROP SEQUENCE IF EXISTS "{TABLE}_id_seq"')
+        cursor.execute(f'ALTER TABLE "{LEGACY_TABLE}" RENAME CONSTRAINT "{TABLE}_pkey" TO "{LEGACY_TABLE}_pkey"')
+        for name, _ in indexes:
+            cursor.execute(f'ALTER INDEX "{name}" RENAME TO "{name[:56]}_legacy"')
+
+        # The primary key of a partitioned table has to include the partition key
+        cursor.execute(
+            f'CREATE TABLE "{TABLE}" (LIKE "{LEGACY_TABLE}" INCLUDING DEFAULTS) PARTITION BY RANGE (sent_at)'
+        )
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD PRIMARY KEY (id, sent_at)')
+        cursor.execute(f'CREATE SEQUENCE "{TABLE}_id_seq" START WITH %s OWNED BY "{TABLE}".id', [next_id])
+        cursor.execute(f'ALTER TABLE "{TABLE}" ALTER COLUMN id SET DEFAULT nextval(\'"{TABLE}_id_seq"\')')
+        for name, definition in indexes:
+            # Definitions were read before the rename, so they still point at the original table name
+            cursor.execute(INDEX_TABLE_RE.sub(f' ON "{TABLE}" ', definition, count=1))
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{name}" {definition}')
+
+        # The full-text trigger moves to the parent, which clones it to every partition
+        cursor.execute(
+            "SELECT 1 FROM pg_trigger WHERE tgrelid = to_regclass(%s) AND tgname = %s",
+            [LEGACY_TABLE, f'{TABLE}_search_trg']
+        )
+        has_search_trigger = cursor.fetchone() is not None
+        if has_search_trigger:
+            cursor.execute(f'DROP TRIGGER "{TABLE}_search_trg" ON "{LEGACY_TABLE}"')
+
+        cursor.execute(
+            f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{LEGACY_TABLE}" FOR VALUES FROM (MINVALUE) TO (%s)',
+            [boundary]
+        )
+        if has_search_trigger:
+            search.create_postgres_trigger(cursor, TABLE)
+        # Catches rows outside every range partition so inserts never fail
+        cursor.execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT')
+
+    logger.info(f"Converted {TABLE} to a partitioned table")
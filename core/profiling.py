@@ -0,0 +1,140 @@
+"""
+Opt-in profiling of Celery tasks.
+
+With TASK_PROFILING_ENABLED, a TASK_PROFILING_SAMPLE_RATE share of the runs
+of the tasks in TASK_PROFILING_TASKS is profiled. A single run of any task
+can also be profiled by sending it with the `notimailer_profile` header,
+which the manual /api/tasks/ views do for staff users passing
+"X-Profile: 1".
+
+Each profiled run writes two files to TASK_PROFILING_DIR, named after the
+task, the start time and the task id:
+- <name>.prof: cProfile stats, for pstats or snakeviz
+- <name>.sql.json: wall time, total SQL time and the statements grouped by
+  SQL text, slowest first
+
+When disabled, the signal handlers only check the setting and the header.
+"""
+import cProfile
+import json
+import logging
+import os
+import random
+import threading
+import time
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'notimailer_profile'
+
+# Only one cProfile profiler can be active per thread, so eager subtasks of a
+# profiled task are not profiled on their own
+_local = threading.local()
+
+
+def requested(task):
+    """Return True if this run was sent with the profiling header"""
+    request = task.request
+    return bool(getattr(request, PROFILE_HEADER, None) or (request.headers or {}).get(PROFILE_HEADER))
+
+
+def should_profile(task):
+    if requested(task):
+        return True
+    return (
+        settings.TASK_PROFILING_ENABLED
+        and task.name in settings.TASK_PROFILING_TASKS
+        and random.random() < settings.TASK_PROFILING_SAMPLE_RATE
+    )
+
+
+class QueryLog:
+    """execute_wrapper recording the duration of every statement"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    def summary(self):
+        grouped = {}
+        for sql, duration in self.queries:
+            entry = grouped.setdefault(sql, {'sql': sql, 'count': 0, 'time': 0.0})
+            entry['count'] += 1
+            entry['time'] += duration
+        statements = sorted(grouped.values(), key=lambda entry: entry['time'], reverse=True)
+        for entry in statements:
+            entry['time'] = round(entry['time'], 6)
+        return {
+            'queries': len(self.queries),
+            'sql_time': round(sum(duration for _, duration in self.queries), 6),
+            'statements': statements,
+        }
+
+
+class Profile:
+    def __init__(self, task, task_id):
+        self.task = task
+        self.task_id = task_id
+        self.started_at = timezone.now()
+        self.query_log = QueryLog()
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        connection.execute_wrappers.append(self.query_log)
+        self.start_time = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        wall_time = time.perf_counter() - self.start_time
+        if self.query_log in connection.execute_wrappers:
+            connection.execute_wrappers.remove(self.query_log)
+
+        directory = settings.TASK_PROFILING_DIR
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(
+            directory, f"{self.task.name}-{self.started_at.strftime('%Y%m%dT%H%M%S')}-{self.task_id}"
+        )
+        self.profiler.dump_stats(f'{base}.prof')
+        with open(f'{base}.sql.json', 'w') as f:
+            json.dump({
+                'task': self.task.name,
+                'task_id': self.task_id,
+                'started_at': self.started_at.isoformat(),
+                'wall_time': round(wall_time, 6),
+                **self.query_log.summary(),
+            }, f, indent=2)
+        logger.info(f"Profiled {self.task.name} ({wall_time:.3f}s) to {base}.prof")
+        return base
+
+
+@task_prerun.connect
+def start_profile(task_id=None, task=None, **kwargs):
+    if getattr(_local, 'profile', None) is not None or not should_profile(task):
+        return
+    profile = Profile(task, task_id)
+    _local.profile = profile
+    profile.start()
+
+
+@task_postrun.connect
+def stop_profile(task_id=None, **kwargs):
+    profile = getattr(_local, 'profile', None)
+    if profile is None or profile.task_id != task_id:
+        return
+    _local.profile = None
+    try:
+        profile.stop()
+    except Exception as exc:
+        # A failed write must not fail the task
+        logger.error(f"Could not write profile for {profile.task.name}: {exc}")
@@ -0,0 +1,119 @@
+"""
+Per-recipient-domain send rate limiting shared by all workers.
+
+EMAIL_DOMAIN_RATE_LIMITS maps a domain to a rate such as '600/min' (the '*'
+entry applies to every other domain). Each domain has a token bucket in
+Redis, refilled continuously at that rate and holding at most one period's
+worth of tokens. Senders reserve tokens before sending: when the bucket is
+empty the reservation goes into debt and the caller gets the exact number of
+seconds until its slot, so it can be rescheduled for then instead of being
+deferred by the provider.
+"""
+import logging
+from django.conf import settings
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ratelimit:domain:'
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Refill the bucket, then take `count` tokens even if that leaves it negative.
+# Returns the tokens available before taking them, so the caller can work out
+# when each reserved token becomes due.
+RESERVE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local count = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - count), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens + count) / rate) + 1)
+return tostring(tokens)
+"""
+
+_reserve = None
+
+
+def get_client():
+    return get_redis_connection('default')
+
+
+def parse_rate(rate):
+    """Return (tokens per second, capacity) for a rate like '600/min'"""
+    num, period = rate.split('/')
+    num = int(num)
+    return num / DURATIONS[period.strip()[0]], num
+
+
+def domain_of(email):
+    return email.rsplit('@', 1)[-1].strip().lower()
+
+
+def limit_for(domain):
+    limits = settings.EMAIL_DOMAIN_RATE_LIMITS
+    rate = limits.get(domain) or limits.get('*')
+    return parse_rate(rate) if rate else None
+
+
+def reserve(domain, count=1):
+    """
+    Reserve `count` sends to domain. Returns the delay in seconds before each
+    reserved send may go out, 0 for the ones that can go now.
+    """
+    limit = limit_for(domain)
+    if limit is None:
+        return [0] * count
+    rate, capacity = limit
+
+    global _reserve
+    client = get_client()
+    if _reserve is None:
+        _reserve = client.register_script(RESERVE_SCRIPT)
+    try:
+        available = float(_reserve(keys=[KEY_PREFIX + domain], args=[rate, capacity, count], client=client))
+    except Exception as exc:
+        # Don't hold up delivery when the limiter itself is unavailable
+        logger.warning(f"Rate limiter unavailable, sending to {domain} unthrottled: {exc}")
+        return [0] * count
+    return [max(0.0, (i + 1 - available) / rate) for i in range(count)]
+
+
+def reserve_one(email):
+    return reserve(domain_of(email))[0]
+
+
+def levels():
+    """Return the current bucket level of every configured domain that has one"""
+    client = get_client()
+    now = float('{}.{:06d}'.format(*client.time()))
+    result = {}
+    domains = set(settings.EMAIL_DOMAIN_RATE_LIMITS) - {'*'}
+    domains.update(
+        key.decode()[len(KEY_PREFIX):] if isinstance(key, bytes) else key[len(KEY_PREFIX):]
+        for key in client.scan_iter(match=KEY_PREFIX + '*', count=1000)
+    )
+    for domain in sorted(domains):
+        limit = limit_for(domain)
+        if limit is None:
+            continue
+        rate, capacity = limit
+        tokens, ts = client.hmget(KEY_PREFIX + domain, 'tokens', 'ts')
+        if tokens is None:
+            level = capacity
+        else:
+            level = min(capacity, float(tokens) + max(0.0, now - float(ts)) * rate)
+        result[domain] = {
+            'tokens': round(level, 2),
+            'capacity': capacity,
+            'rate_per_second': round(rate, 4),
+            # Seconds until a send reserved now would go out
+            'wait': round(max(0.0, (1 - level) / rate), 2),
+        }
+    return result
@@ -0,0 +1,91 @@
+"""
+JSON renderer backed by orjson, several times faster than the standard
+library encoder on large lists.
+
+The output matches rest_framework's JSONRenderer: values orjson doesn't
+encode itself (dates, decimals, lazy translation strings) go through DRF's
+encoder, and indented output, which the browsable API asks for, is left to
+the parent class.
+
+CSVRenderer and NDJSONRenderer write flat rows for exports. Besides the
+usual render(), they can encode an iterator of rows chunk by chunk for a
+StreamingHttpResponse, so the whole result is never held in memory.
+"""
+import csv
+import io
+from itertools import islice
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Integer keys, e.g. per-item errors, are written as strings like json.dumps does
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+_default = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_default, option=OPTIONS)
+        # Escaped by JSONRenderer too, so the output can be embedded in <script>
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class StreamingRenderer(BaseRenderer):
+    charset = 'utf-8'
+    # Rows encoded per chunk of the streamed response
+    rows_per_chunk = 500
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # Error responses are a single dict
+        rows = [data] if isinstance(data, dict) else data
+        return b''.join(self.render_stream(rows))
+
+    def chunks(self, rows):
+        rows = iter(rows)
+        return iter(lambda: list(islice(rows, self.rows_per_chunk)), [])
+
+    def render_stream(self, rows, header=None):
+        """Yield the encoded rows in chunks of rows_per_chunk"""
+        raise NotImplementedError
+
+
+class CSVRenderer(StreamingRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def render_stream(self, rows, header=None):
+        buffer = io.StringIO()
+        writer = None
+        if header is not None:
+            writer = csv.DictWriter(buffer, fieldnames=header)
+            writer.writeheader()
+        for chunk in self.chunks(rows):
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(chunk[0]))
+                writer.writeheader()
+            writer.writerows(chunk)
+            yield buffer.getvalue().encode(self.charset)
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            # Header of an empty result
+            yield buffer.getvalue().encode(self.charset)
+
+
+class NDJSONRenderer(StreamingRenderer):
+    """One JSON object per line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render_stream(self, rows, header=None):
+        for chunk in self.chunks(rows):
+            yield b''.join(orjson.dumps(row, default=_default, option=OPTIONS) + b'\n' for row in chunk)
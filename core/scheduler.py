@@ -0,0 +1,66 @@
+"""
+Event-driven reminder scheduling, enabled with REMINDER_SCHEDULER_ENABLED.
+
+Pending reminders are kept in a Redis sorted set scored by their scheduled
+time. `manage.py run_reminder_dispatcher` sleeps until the earliest entry is
+due and hands due reminders to the normal delivery path, so reminders go out
+on time instead of on the next reminder_task tick. reminder_task keeps
+running as a low-frequency reconciliation sweep.
+"""
+import logging
+from django.conf import settings
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = 'reminders:due'
+
+
+def is_enabled():
+    return settings.REMINDER_SCHEDULER_ENABLED
+
+
+def get_client():
+    return get_redis_connection('default')
+
+
+def schedule(reminders):
+    """Add pending reminders to the due queue and remove any that are no longer pending"""
+    pending = {str(r.id): r.scheduled_time.timestamp() for r in reminders if r.status == 'pending'}
+    done = [str(r.id) for r in reminders if r.status != 'pending']
+
+    pipe = get_client().pipeline(transaction=False)
+    if pending:
+        pipe.zadd(QUEUE_KEY, pending)
+    if done:
+        pipe.zrem(QUEUE_KEY, *done)
+    pipe.execute()
+
+
+def unschedule(reminder_ids):
+    if reminder_ids:
+        get_client().zrem(QUEUE_KEY, *[str(i) for i in reminder_ids])
+
+
+def pop_due(now, limit):
+    """
+    Remove and return the ids of up to `limit` entries due at `now`.
+    Each entry is only returned to the dispatcher whose ZREM removed it, so
+    several dispatchers can run side by side.
+    """
+    client = get_client()
+    members = client.zrangebyscore(QUEUE_KEY, '-inf', now.timestamp(), start=0, num=limit)
+    if not members:
+        return []
+
+    pipe = client.pipeline(transaction=False)
+    for member in members:
+        pipe.zrem(QUEUE_KEY, member)
+    removed = pipe.execute()
+    return [int(member) for member, ok in zip(members, removed) if ok]
+
+
+def next_due():
+    """Return the timestamp of the earliest scheduled entry, or None when the queue is empty"""
+    entries = get_client().zrange(QUEUE_KEY, 0, 0, withscores=True)
+    return entries[0][1] if entries else None
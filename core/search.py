@@ -0,0 +1,202 @@
+"""
+Full-text search over reminders (title, message) and email logs (subject,
+recipient, body).
+
+On PostgreSQL each table has a `search_vector` tsvector column with a GIN
+index, kept up to date by a trigger on insert and update. On SQLite the
+documents are kept in FTS5 tables by triggers instead. Both are created by
+migration 0008 through install(). Email log bodies stored compressed (above
+MESSAGE_BODY_COMPRESS_THRESHOLD) are matched by subject and recipient only.
+
+search() filters a queryset to the matching rows and annotates them with
+`search_rank`, higher is better. When neither backend is installed,
+is_available() is False and callers fall back to substring matching.
+"""
+import logging
+from django.db import DatabaseError, connection as default_connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from .models import EmailLog, Reminder
+
+logger = logging.getLogger(__name__)
+
+CONFIG = 'pg_catalog.english'
+
+REMINDER_TABLE = Reminder._meta.db_table
+EMAIL_LOG_TABLE = EmailLog._meta.db_table
+
+# PostgreSQL: weighted document expressions, with NEW. referring to the row being written
+POSTGRES_DOCUMENTS = {
+    REMINDER_TABLE: (
+        "setweight(to_tsvector('{config}', coalesce({row}title, '')), 'A') || "
+        "setweight(to_tsvector('{config}', coalesce({row}message, '')), 'B')"
+    ),
+    EMAIL_LOG_TABLE: (
+        "setweight(to_tsvector('{config}', coalesce({row}subject, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce({row}to_email, '')), 'A') || "
+        "setweight(to_tsvector('{config}', coalesce("
+        "(SELECT text FROM core_messagebody WHERE id = {row}message_body_id), '')), 'B')"
+    ),
+}
+
+# Columns whose changes re-index a row, so status updates on the hot paths don't
+SEARCHED_COLUMNS = {
+    REMINDER_TABLE: ['title', 'message'],
+    EMAIL_LOG_TABLE: ['subject', 'to_email', 'message_body_id'],
+}
+
+# SQLite: FTS5 columns and the SELECT producing them for a row
+SQLITE_DOCUMENTS = {
+    REMINDER_TABLE: (
+        ['title', 'message'],
+        "{row}title, {row}message",
+    ),
+    EMAIL_LOG_TABLE: (
+        ['subject', 'to_email', 'body'],
+        "{row}subject, {row}to_email, "
+        "coalesce((SELECT text FROM core_messagebody WHERE id = {row}message_body_id), '')",
+    ),
+}
+
+
+def fts_table(table):
+    return f'{table}_fts'
+
+
+def install(connection=None):
+    """Create the search columns, indexes, triggers and FTS tables and index existing rows"""
+    connection = connection or default_connection
+    if connection.vendor == 'postgresql':
+        _install_postgres(connection)
+    elif connection.vendor == 'sqlite':
+        _install_sqlite(connection)
+
+
+def uninstall(connection=None):
+    connection = connection or default_connection
+    with connection.cursor() as cursor:
+        for table in (REMINDER_TABLE, EMAIL_LOG_TABLE):
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'DROP TRIGGER IF EXISTS "{table}_search_trg" ON "{table}"')
+                cursor.execute(f'DROP FUNCTION IF EXISTS "{table}_search_update"()')
+                cursor.execute(f'ALTER TABLE "{table}" DROP COLUMN IF EXISTS search_vector')
+            elif connection.vendor == 'sqlite':
+                for suffix in ('ai', 'au', 'ad'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS "{table}_fts_{suffix}"')
+                cursor.execute(f'DROP TABLE IF EXISTS "{fts_table(table)}"')
+
+
+def create_postgres_trigger(cursor, table):
+    """(Re)create the trigger keeping search_vector current; also used after partitioning EmailLog"""
+    document = POSTGRES_DOCUMENTS[table].format(config=CONFIG, row='NEW.')
+    cursor.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION "{table}_search_update"() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {document};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    cursor.execute(f'DROP TRIGGER IF EXISTS "{table}_search_trg" ON "{table}"')
+    cursor.execute(
+        f'CREATE TRIGGER "{table}_search_trg" BEFORE INSERT OR UPDATE OF {", ".join(SEARCHED_COLUMNS[table])} '
+        f'ON "{table}" '
+        f'FOR EACH ROW EXECUTE FUNCTION "{table}_search_update"()'
+    )
+
+
+def _install_postgres(connection):
+    with connection.cursor() as cursor:
+        for table in (REMINDER_TABLE, EMAIL_LOG_TABLE):
+            cursor.execute(f'ALTER TABLE "{table}" ADD COLUMN IF NOT EXISTS search_vector tsvector')
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS "{table}_search_idx" ON "{table}" USING GIN (search_vector)'
+            )
+            create_postgres_trigger(cursor, table)
+            document = POSTGRES_DOCUMENTS[table].format(config=CONFIG, row='')
+            cursor.execute(f'UPDATE "{table}" SET search_vector = {document} WHERE search_vector IS NULL')
+
+
+def _install_sqlite(connection):
+    with connection.cursor() as cursor:
+        for table, (columns, select) in SQLITE_DOCUMENTS.items():
+            fts = fts_table(table)
+            try:
+                cursor.execute(f'CREATE VIRTUAL TABLE IF NOT EXISTS "{fts}" USING fts5({", ".join(columns)})')
+            except DatabaseError as exc:
+                logger.warning(f"SQLite FTS5 is not available, search falls back to substring matching: {exc}")
+                return
+
+            column_list = ', '.join(columns)
+            new_row = select.format(row='NEW.')
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS "{table}_fts_ai" AFTER INSERT ON "{table}" BEGIN '
+                f'INSERT INTO "{fts}" (rowid, {column_list}) SELECT NEW.id, {new_row}; END'
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS "{table}_fts_au" '
+                f'AFTER UPDATE OF {", ".join(SEARCHED_COLUMNS[table])} ON "{table}" BEGIN '
+                f'DELETE FROM "{fts}" WHERE rowid = OLD.id; '
+                f'INSERT INTO "{fts}" (rowid, {column_list}) SELECT NEW.id, {new_row}; END'
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS "{table}_fts_ad" AFTER DELETE ON "{table}" BEGIN '
+                f'DELETE FROM "{fts}" WHERE rowid = OLD.id; END'
+            )
+            cursor.execute(
+                f'INSERT INTO "{fts}" (rowid, {column_list}) '
+                f'SELECT id, {select.format(row="")} FROM "{table}" '
+                f'WHERE id NOT IN (SELECT rowid FROM "{fts}")'
+            )
+
+
+def is_available(model, connection=None):
+    """Return True if the full-text backend is installed for this model's table"""
+    connection = connection or default_connection
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT 1 FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = 'search_vector'",
+                [table]
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [fts_table(table)])
+        else:
+            return False
+        return cursor.fetchone() is not None
+
+
+def fts5_query(query):
+    """Quote each term so user input can't use FTS5 operators; all terms must match"""
+    terms = query.replace('"', ' ').split()
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def search(queryset, query):
+    """Filter queryset to rows matching query and annotate them with search_rank"""
+    table = queryset.model._meta.db_table
+    if default_connection.vendor == 'postgresql':
+        tsquery = f"websearch_to_tsquery('{CONFIG}', %s)"
+        return queryset.filter(
+            RawSQL(f'"{table}".search_vector @@ {tsquery}', [query], output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(f'ts_rank_cd("{table}".search_vector, {tsquery})', [query], output_field=FloatField())
+        )
+
+    fts = fts_table(table)
+    match = fts5_query(query)
+    if not match:
+        return queryset.none()
+    # bm25() is lower for better matches
+    return queryset.filter(
+        id__in=RawSQL(f'SELECT rowid FROM "{fts}" WHERE "{fts}" MATCH %s', [match])
+    ).annotate(
+        search_rank=RawSQL(
+            f'(SELECT -bm25("{fts}") FROM "{fts}" WHERE "{fts}" MATCH %s AND rowid = "{table}".id)',
+            [match],
+            output_field=FloatField()
+        )
+    )
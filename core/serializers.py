@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Reminder, UserProfile, EmailLog
+from .models import Reminder, UserProfile, EmailLog, MessageBody
 from django.contrib.auth.password_validation import validate_password
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
@@ -11,6 +11,8 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         # Add custom claims
         token['username'] = user.username
         token['email'] = user.email
+        # Used by stateless authentication (AUTH_JWT_STATELESS)
+        token['is_staff'] = user.is_staff
         return token
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -73,3 +75,72 @@ class EmailLogSerializer(serializers.ModelSerializer):
         model = EmailLog
         fields = ['id', 'reminder', 'to_email', 'subject', 'body', 'status', 'sent_at', 'error_message']
         read_only_fields = ['sent_at', 'status', 'error_message']
+
+# Same output as a ModelSerializer DateTimeField, in the current time zone
+datetime_representation = serializers.DateTimeField().to_representation
+
+class ValuesSerializer:
+    """
+    Read-only serializer for list responses. Rows come from queryset.values()
+    with the related columns joined in, and each output field is a plain
+    lookup plus an optional converter fixed at class level, so there is no
+    per-row field binding or attribute access. The output matches the
+    corresponding ModelSerializer.
+    """
+    # (output name, values() lookup, converter or None)
+    fields = ()
+    # Lookups needed by to_representation() that aren't output directly
+    extra_lookups = ()
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @classmethod
+    def values(cls, queryset):
+        """Return queryset as rows for this serializer, keeping annotations such as search_rank"""
+        lookups = [lookup for _, lookup, _ in cls.fields]
+        return queryset.values(*lookups, *cls.extra_lookups, *queryset.query.annotations)
+
+    def to_representation(self, row):
+        return {
+            name: convert(row[lookup]) if convert is not None else row[lookup]
+            for name, lookup, convert in self.fields
+        }
+
+    @property
+    def data(self):
+        return [self.to_representation(row) for row in self.rows]
+
+class ReminderListSerializer(ValuesSerializer):
+    """values() version of ReminderSerializer"""
+    fields = (
+        ('id', 'id', None),
+        ('user', 'user_id', None),
+        ('user_email', 'user__email', None),
+        ('title', 'title', None),
+        ('message', 'message', None),
+        ('scheduled_time', 'scheduled_time', datetime_representation),
+        ('status', 'status', None),
+        ('created_at', 'created_at', datetime_representation),
+        ('updated_at', 'updated_at', datetime_representation),
+        ('retry_count', 'retry_count', None),
+    )
+
+class EmailLogListSerializer(ValuesSerializer):
+    """values() version of EmailLogSerializer"""
+    fields = (
+        ('id', 'id', None),
+        ('reminder', 'reminder_id', None),
+        ('to_email', 'to_email', None),
+        ('subject', 'subject', None),
+        ('body', 'message_body__text', None),
+        ('status', 'status', None),
+        ('sent_at', 'sent_at', datetime_representation),
+        ('error_message', 'error_message', None),
+    )
+    extra_lookups = ('message_body__data',)
+
+    def to_representation(self, row):
+        data = super().to_representation(row)
+        data['body'] = MessageBody.unpack(row['message_body__text'], row['message_body__data']) or ''
+        return data
@@ -1,7 +1,14 @@
-from django.db.models.signals import post_save
+import logging
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import UserProfile, Reminder, EmailLog
+from .cache import invalidate_dashboards
+from .authentication import invalidate_user
+from . import scheduler
+
+logger = logging.getLogger(__name__)
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -9,4 +16,60 @@ def create_user_profile(sender, instance, created, **kwargs):
     Signal to create a UserProfile when a new User is created
     """
     if created and not hasattr(instance, 'profile'):
-        UserProfile.objects.create(user=instance)
\ No newline at end of file
+        UserProfile.objects.create(user=instance)
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Signal to drop a changed or deleted user from the authentication cache
+    """
+    invalidate_user(instance.pk)
+
+@receiver([post_save, post_delete], sender=Reminder)
+def invalidate_reminder_dashboard(sender, instance, **kwargs):
+    """
+    Signal to drop the owner's cached dashboard when a reminder changes
+    """
+    invalidate_dashboards([instance.user_id])
+
+@receiver([post_save, post_delete], sender=EmailLog)
+def invalidate_email_log_dashboard(sender, instance, **kwargs):
+    """
+    Signal to drop the cached dashboard of the user whose reminder the log belongs to
+    """
+    if instance.reminder_id is None:
+        return
+    if EmailLog.reminder.is_cached(instance):
+        user_id = instance.reminder.user_id
+    else:
+        user_id = Reminder.objects.filter(pk=instance.reminder_id).values_list('user_id', flat=True).first()
+    invalidate_dashboards([user_id])
+
+@receiver(post_save, sender=Reminder)
+def schedule_reminder(sender, instance, **kwargs):
+    """
+    Signal to add or remove a reminder in the scheduler queue once the change is committed
+    """
+    if not scheduler.is_enabled():
+        return
+
+    def update_queue():
+        try:
+            scheduler.schedule([instance])
+        except Exception as exc:
+            # The reconciliation sweep picks the reminder up instead
+            logger.error(f"Could not schedule reminder {instance.id}: {exc}")
+
+    transaction.on_commit(update_queue)
+
+@receiver(post_delete, sender=Reminder)
+def unschedule_reminder(sender, instance, **kwargs):
+    """
+    Signal to remove a deleted reminder from the scheduler queue
+    """
+    if not scheduler.is_enabled():
+        return
+    try:
+        scheduler.unschedule([instance.id])
+    except Exception as exc:
+        logger.error(f"Could not unschedule reminder {instance.id}: {exc}")
@@ -1,8 +1,16 @@
 import logging
+import time
+from collections import defaultdict
+from itertools import islice
 from celery import shared_task
-from django.core.mail import send_mail
-from .models import EmailLog, Reminder, UserProfile
-from datetime import date, timedelta
+from django.core.mail import send_mail, get_connection, EmailMessage
+from django.db import IntegrityError, connection as db_connection, transaction
+from django.db.models import Count, Max, Min, ProtectedError
+from .models import EmailLog, MessageBody, Reminder, UserProfile
+from . import async_smtp, idempotency, message_templates, metrics, outcomes, partitions, ratelimit, scheduler
+from .cache import invalidate_dashboards
+from .outcomes import outcome, record_outcome, record_outcomes
+from datetime import timedelta
 from django.utils import timezone
 from django.conf import settings
 from celery.exceptions import MaxRetriesExceededError
@@ -10,77 +18,287 @@ from django.contrib.auth.models import User
 
 logger = logging.getLogger(__name__)
 
+FROM_EMAIL = 'no-reply@example.com'
+
+def email_queue(call_site):
+    """
+    Queue for the email tasks sent from call_site (EMAIL_QUEUE_ROUTES), or None
+    to use the task's route in CELERY_TASK_ROUTES.
+    """
+    return settings.EMAIL_QUEUE_ROUTES.get(call_site)
+
+def current_queue(task):
+    """Queue the running task was delivered from, so follow-up sends stay on it"""
+    return (task.request.delivery_info or {}).get('routing_key')
+
+def dedup_key(task, index=None):
+    """Dedup key of the running attempt (core.idempotency), None when it isn't checked"""
+    if not settings.EMAIL_DEDUP_ENABLED or not task.request.id:
+        return None
+    return idempotency.attempt_key(task.request.id, task.request.retries, index)
+
+def claim_batch(task, messages):
+    """
+    Claim each message of the running batch attempt. Returns the messages not
+    already handled by an earlier delivery of the same batch, and their keys.
+    """
+    keys = [dedup_key(task, index) for index in range(len(messages))]
+    if not keys or keys[0] is None:
+        return messages, []
+    claimed = [
+        (message, key)
+        for message, key, state in zip(messages, keys, idempotency.claim(keys))
+        if state is None
+    ]
+    if len(claimed) < len(messages):
+        logger.info(f"Skipping {len(messages) - len(claimed)} emails handled by an earlier delivery of this batch")
+    return [message for message, _ in claimed], [key for _, key in claimed]
+
 @shared_task(bind=True, max_retries=3)
-def send_email_task(self, to_email, subject, body, reminder_id=None):
+def send_email_task(self, to_email, subject, body, reminder_id=None, rate_reserved=None):
     """
     Send an email with retry logic. 
     Will retry up to 3 times with exponential backoff if sending fails.
+    When the recipient's domain is over its rate limit, the task is rescheduled
+    for its reserved slot; rate_reserved is the attempt that slot belongs to.
+    A redelivered message whose attempt was already made is skipped.
     """
+    key = dedup_key(self)
+    if key is not None:
+        state, = idempotency.claim([key])
+        if state is not None:
+            logger.info(f"Skipping redelivered email to {to_email}, attempt {self.request.retries} is {state}")
+            return None
+
+    if rate_reserved != self.request.retries:
+        wait = ratelimit.reserve_one(to_email)
+        if wait:
+            logger.info(f"Rate limit reached for {ratelimit.domain_of(to_email)}, sending to {to_email} in {wait:.1f}s")
+            defer_reminders([reminder_id], wait)
+            send_email_task.apply_async(
+                args=(to_email, subject, body),
+                kwargs={'reminder_id': reminder_id, 'rate_reserved': self.request.retries},
+                countdown=wait,
+                retries=self.request.retries,
+                queue=current_queue(self)
+            )
+            if key is not None:
+                idempotency.finish([key])
+            return None
+
     logger.info(f"Attempting to send email to {to_email}: {subject}")
     
     try:
-        send_mail(subject, body, 'no-reply@example.com', [to_email])
-        
-        log_entry = EmailLog.objects.create(
-            to_email=to_email, 
-            subject=subject, 
-            body=body, 
-            status='success'
-        )
-        
-        # Update the reminder if provided
-        if reminder_id:
-            try:
-                reminder = Reminder.objects.get(id=reminder_id)
-                reminder.status = 'sent'
-                reminder.save()
-                log_entry.reminder = reminder
-                log_entry.save()
-            except Reminder.DoesNotExist:
-                logger.error(f"Reminder with ID {reminder_id} not found")
-        
-        logger.info(f"Successfully sent email to {to_email}")
-        return True
-    
+        with metrics.timer('notimailer_smtp_duration_seconds'):
+            send_mail(subject, body, FROM_EMAIL, [to_email])
     except Exception as exc:
+        if key is not None:
+            # This attempt is over; the retry below is a new attempt with its own key
+            idempotency.finish([key])
         # Log the error
         error_message = str(exc)
         logger.error(f"Failed to send email to {to_email}: {error_message}")
         
-        # Create or update the log entry
-        log_entry = EmailLog.objects.create(
-            to_email=to_email, 
-            subject=subject, 
-            body=body, 
-            status='failed',
+        # Stays claimed while the retry is scheduled so reminder_task doesn't pick it up again
+        reminder_status = 'failed' if self.request.retries >= self.max_retries else 'queued'
+        record_outcome(
+            to_email,
+            subject,
+            body,
+            'failed',
+            reminder_id=reminder_id,
+            reminder_status=reminder_status,
             error_message=error_message
         )
         
-        # Update the reminder if provided
-        if reminder_id:
-            try:
-                reminder = Reminder.objects.get(id=reminder_id)
-                reminder.retry_count += 1
-                reminder.last_retry = timezone.now()
-                
-                if self.request.retries >= self.max_retries:
-                    reminder.status = 'failed'
-                else:
-                    reminder.status = 'pending'
-                
-                reminder.save()
-                log_entry.reminder = reminder
-                log_entry.save()
-            except Reminder.DoesNotExist:
-                logger.error(f"Reminder with ID {reminder_id} not found")
-        
         # Retry with exponential backoff
         try:
             countdown = 2 ** self.request.retries * 60  # 1 min, 2 min, 4 min
+            if self.request.retries < self.max_retries:
+                metrics.inc('notimailer_emails_retried_total')
             raise self.retry(exc=exc, countdown=countdown)
         except MaxRetriesExceededError:
             logger.error(f"Max retries exceeded for email to {to_email}")
             return False
+    
+    if key is not None:
+        idempotency.finish([key])
+    record_outcome(to_email, subject, body, 'success', reminder_id=reminder_id, reminder_status='sent')
+    logger.info(f"Successfully sent email to {to_email}")
+    return True
+
+def record_batch(sent, failed):
+    """
+    Record the outcomes of a batch and hand failed messages to send_email_task,
+    which retries them one by one with the usual backoff.
+    """
+    # Failed reminders stay claimed while send_email_task retries them
+    record_outcomes(
+        [
+            outcome(m['to_email'], m['subject'], m['body'], 'success',
+                    reminder_id=m.get('reminder_id'), reminder_status='sent')
+            for m in sent
+        ] + [
+            outcome(m['to_email'], m['subject'], m['body'], 'failed',
+                    reminder_id=m.get('reminder_id'), reminder_status='queued', error_message=error_message)
+            for m, error_message in failed
+        ]
+    )
+
+    metrics.inc('notimailer_emails_retried_total', len(failed))
+    for message, _ in failed:
+        # The batch was the first attempt, so this is the first retry of max_retries
+        send_email_task.apply_async(
+            args=(message['to_email'], message['subject'], message['body']),
+            kwargs={'reminder_id': message.get('reminder_id')},
+            countdown=60,
+            retries=1,
+            queue=email_queue('retry')
+        )
+
+def defer_reminders(reminder_ids, wait):
+    """
+    Keep reminders whose send was rescheduled `wait` seconds ahead claimed until then.
+    claim_due_reminders reclaims reminders left 'queued' for REMINDER_QUEUED_TIMEOUT_MINUTES
+    after updated_at, so updated_at is moved to the rescheduled send time.
+    """
+    reminder_ids = [reminder_id for reminder_id in reminder_ids if reminder_id is not None]
+    if reminder_ids:
+        Reminder.objects.filter(id__in=reminder_ids, status='queued').update(
+            updated_at=timezone.now() + timedelta(seconds=wait)
+        )
+
+def throttle(messages, queue=None):
+    """
+    Reserve a send slot for each message in its recipient domain's rate limit.
+    Returns the messages that can go now; the others are handed to
+    send_email_task on queue to be sent at their slot.
+    """
+    if not settings.EMAIL_DOMAIN_RATE_LIMITS:
+        return messages
+
+    by_domain = defaultdict(list)
+    for message in messages:
+        by_domain[ratelimit.domain_of(message['to_email'])].append(message)
+
+    ready, deferred, longest_wait = [], [], 0
+    for domain, group in by_domain.items():
+        for message, wait in zip(group, ratelimit.reserve(domain, len(group))):
+            if not wait:
+                ready.append(message)
+                continue
+            deferred.append(message.get('reminder_id'))
+            longest_wait = max(longest_wait, wait)
+            send_email_task.apply_async(
+                args=(message['to_email'], message['subject'], message['body']),
+                kwargs={'reminder_id': message.get('reminder_id'), 'rate_reserved': 0},
+                countdown=wait,
+                queue=queue
+            )
+    if deferred:
+        # One update for the batch; each reminder stays claimed at least until its slot
+        defer_reminders(deferred, longest_wait)
+        logger.info(f"Rate limits deferred {len(deferred)} of {len(messages)} emails")
+    return ready
+
+@shared_task
+def send_email_batch(messages):
+    """
+    Send a batch of emails over a single backend connection.
+    Each message is a dict with to_email, subject, body and an optional reminder_id.
+    Messages that fail are handed to send_email_task so they get the usual retry logic.
+    """
+    logger.info(f"Sending batch of {len(messages)} emails")
+    messages, keys = claim_batch(send_email_batch, messages)
+    messages = throttle(messages, queue=current_queue(send_email_batch))
+    sent, failed = [], []
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        logger.error(f"Could not open email connection: {exc}")
+        failed = [(message, str(exc)) for message in messages]
+    else:
+        try:
+            for message in messages:
+                email = EmailMessage(
+                    message['subject'],
+                    message['body'],
+                    FROM_EMAIL,
+                    [message['to_email']],
+                    connection=connection
+                )
+                try:
+                    with metrics.timer('notimailer_smtp_duration_seconds'):
+                        connection.send_messages([email])
+                    sent.append(message)
+                except Exception as exc:
+                    logger.error(f"Failed to send email to {message['to_email']}: {exc}")
+                    failed.append((message, str(exc)))
+        finally:
+            connection.close()
+
+    # Deferred and failed messages have been handed to send_email_task
+    idempotency.finish(keys)
+    record_batch(sent, failed)
+
+    logger.info(f"Batch completed. Sent {len(sent)}, failed {len(failed)}.")
+    return len(sent)
+
+@shared_task
+def send_email_batch_async(messages):
+    """
+    Send a batch of emails concurrently through this worker's asyncio SMTP pool
+    (EMAIL_ENGINE = 'async'). Outcomes are recorded as in send_email_batch.
+    """
+    logger.info(f"Sending batch of {len(messages)} emails (async)")
+    messages, keys = claim_batch(send_email_batch_async, messages)
+    messages = throttle(messages, queue=current_queue(send_email_batch_async))
+    results = async_smtp.send_messages(messages, FROM_EMAIL) if messages else []
+    sent = [message for message, error in results if error is None]
+    failed = [(message, error) for message, error in results if error is not None]
+
+    idempotency.finish(keys)
+    record_batch(sent, failed)
+
+    logger.info(f"Batch completed. Sent {len(sent)}, failed {len(failed)}.")
+    return len(sent)
+
+def dispatch_emails(messages, call_site=None):
+    """
+    Queue messages for delivery. When EMAIL_BATCH_SIZE is set, messages are
+    grouped into send_email_batch chunks of that size, otherwise each message
+    gets its own send_email_task. The async engine always sends in batches.
+    The tasks go to the queue routed for call_site.
+    """
+    queue = email_queue(call_site)
+    batch_size = getattr(settings, 'EMAIL_BATCH_SIZE', 0)
+    batch_task = send_email_batch
+    if settings.EMAIL_ENGINE == 'async':
+        batch_size = batch_size or settings.EMAIL_ASYNC_BATCH_SIZE
+        batch_task = send_email_batch_async
+    count = 0
+    chunk = []
+
+    for message in messages:
+        count += 1
+        if not batch_size:
+            send_email_task.apply_async(
+                args=(message['to_email'], message['subject'], message['body']),
+                kwargs={'reminder_id': message['reminder_id']} if message.get('reminder_id') else {},
+                queue=queue
+            )
+            continue
+
+        chunk.append(message)
+        if len(chunk) >= batch_size:
+            batch_task.apply_async((chunk,), queue=queue)
+            chunk = []
+
+    if chunk:
+        batch_task.apply_async((chunk,), queue=queue)
+    return count
 
 @shared_task
 def birthday_task():
@@ -88,69 +306,244 @@ def birthday_task():
     Task to send birthday emails to users whose birthdate is today.
     """
     logger.info("Running birthday email task")
-    today = date.today()
+    today = timezone.localdate()
     
-    # Get profiles with today's birthdate
+    # Get profiles with today's birthdate, streamed so memory stays flat
     profiles = UserProfile.objects.filter(
-        birthdate__month=today.month, 
-        birthdate__day=today.day
-    ).select_related('user')
+        birthday_key__in=UserProfile.birthday_keys_on(today)
+    ).values_list(
+        'user__email', 'user__first_name', 'user__username'
+    ).iterator(chunk_size=settings.BIRTHDAY_CHUNK_SIZE)
     
-    sent_count = 0
-    for profile in profiles:
-        user = profile.user
-        if user.email:
-            logger.info(f"Sending birthday email to {user.email}")
-            subject = "Happy Birthday!"
-            body = f"Hello {user.first_name or user.username},\n\nWishing you a wonderful birthday and a great year ahead!\n\nBest regards,\nNotimailer Team"
-            send_email_task.delay(user.email, subject, body)
-            sent_count += 1
+    def recipients():
+        for email, first_name, username in profiles:
+            if email:
+                logger.info(f"Sending birthday email to {email}")
+                yield email, {'name': first_name or username, 'first_name': first_name, 'username': username}
+
+    # Bodies are rendered from the 'birthday' template (or the built-in default)
+    messages = message_templates.render_messages('birthday', recipients())
+    sent_count = dispatch_emails(messages, call_site='birthday')
     
     logger.info(f"Birthday task completed. Sent {sent_count} emails.")
     return sent_count
 
+def claim_due_reminders(now, limit, ids=None):
+    """
+    Atomically move up to `limit` due reminders to 'queued' and return them.
+    Rows locked by a concurrent scheduler are skipped, so two callers never claim
+    the same reminder. Reminders stuck in 'queued' past REMINDER_QUEUED_TIMEOUT_MINUTES
+    are claimed again. When ids is given, only those reminders are considered.
+    """
+    stale_before = now - timedelta(minutes=settings.REMINDER_QUEUED_TIMEOUT_MINUTES)
+
+    with transaction.atomic():
+        # The status__in filter matches the condition of the partial reminder_due_idx
+        due = (
+            Reminder.objects.select_for_update(skip_locked=True)
+            .filter(status__in=['pending', 'queued'], scheduled_time__lte=now)
+            .exclude(status='queued', updated_at__gte=stale_before)
+        )
+        if ids is not None:
+            due = due.filter(id__in=ids)
+        claimed = list(due.order_by('scheduled_time').values_list('id', flat=True)[:limit])
+        if claimed:
+            Reminder.objects.filter(id__in=claimed).update(status='queued', updated_at=now)
+
+    return list(Reminder.objects.filter(id__in=claimed).select_related('user'))
+
+def send_claimed_reminders(reminders, now):
+    """
+    Queue delivery of claimed reminders and return how many were dispatched.
+    """
+    # Nobody to deliver to, so don't leave these claimed forever
+    no_email = [reminder for reminder in reminders if not reminder.user.email]
+    if no_email:
+        logger.warning(f"Marking {len(no_email)} reminders failed: user has no email")
+        Reminder.objects.filter(id__in=[r.id for r in no_email]).update(status='failed', updated_at=now)
+        invalidate_dashboards(r.user_id for r in no_email)
+
+    def messages():
+        for reminder in reminders:
+            if reminder.user.email:
+                logger.info(f"Processing reminder: {reminder.title} for {reminder.user.email}")
+                # Send the email with the reminder ID for tracking
+                yield {
+                    'to_email': reminder.user.email,
+                    'subject': f"Reminder: {reminder.title}",
+                    'body': reminder.message,
+                    'reminder_id': reminder.id,
+                }
+
+    return dispatch_emails(messages(), call_site='reminder')
+
+def dispatch_scheduled_reminders(now=None):
+    """
+    Pop due entries from the scheduler queue and send them.
+    Used by the run_reminder_dispatcher loop; returns how many were dispatched.
+    """
+    now = now or timezone.now()
+    ids = scheduler.pop_due(now, settings.REMINDER_CLAIM_BATCH_SIZE)
+    if not ids:
+        return 0
+    reminders = claim_due_reminders(now, len(ids), ids=ids)
+    return send_claimed_reminders(reminders, now)
+
 @shared_task
 def reminder_task():
     """
     Task to process and send due reminders.
+    With the event-driven scheduler enabled this is the reconciliation sweep:
+    it sends anything the dispatcher missed and re-registers upcoming reminders.
     """
     logger.info("Running reminder task")
     now = timezone.now()
-    
-    # Get reminders that are due and not yet sent or failed
-    reminders = Reminder.objects.filter(
-        status='pending',
-        scheduled_time__lte=now
-    ).select_related('user')
-    
+    batch_size = settings.REMINDER_CLAIM_BATCH_SIZE
+
     sent_count = 0
-    for reminder in reminders:
-        if reminder.user.email:
-            logger.info(f"Processing reminder: {reminder.title} for {reminder.user.email}")
-            
-            subject = f"Reminder: {reminder.title}"
-            body = reminder.message
-            
-            # Send the email with the reminder ID for tracking
-            send_email_task.delay(
-                reminder.user.email,
-                subject,
-                body,
-                reminder_id=reminder.id
-            )
-            sent_count += 1
+    while True:
+        reminders = claim_due_reminders(now, batch_size)
+        sent_count += send_claimed_reminders(reminders, now)
+        if len(reminders) < batch_size:
+            break
+
+    if scheduler.is_enabled():
+        # Cover reminders written without signals (bulk updates) until the next sweep
+        horizon = now + timedelta(minutes=2 * settings.REMINDER_SWEEP_MINUTES)
+        upcoming = Reminder.objects.filter(
+            status='pending',
+            scheduled_time__lte=horizon
+        ).only('id', 'status', 'scheduled_time').iterator(chunk_size=batch_size)
+        while chunk := list(islice(upcoming, batch_size)):
+            scheduler.schedule(chunk)
     
     logger.info(f"Reminder task completed. Processed {sent_count} reminders.")
     return sent_count
 
+def delete_logs_before(threshold, deadline):
+    """
+    Delete logs older than threshold in primary-key ranges of EMAIL_LOG_DELETE_CHUNK_SIZE,
+    each in its own short transaction, stopping once the deadline (time.monotonic) passes.
+    """
+    chunk_size = settings.EMAIL_LOG_DELETE_CHUNK_SIZE
+    bounds = EmailLog.objects.filter(sent_at__lt=threshold).aggregate(low=Min('pk'), high=Max('pk'))
+    low, high = bounds['low'], bounds['high']
+
+    # Plain SQL avoids loading every row for the post_delete dashboard signal; a cached
+    # dashboard still listing a purged log expires within DASHBOARD_CACHE_TIMEOUT
+    table = db_connection.ops.quote_name(EmailLog._meta.db_table)
+    threshold_value = db_connection.ops.adapt_datetimefield_value(threshold)
+
+    deleted = 0
+    while low is not None and low <= high and time.monotonic() < deadline:
+        # Under autocommit each statement is its own transaction
+        with db_connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id >= %s AND id < %s AND sent_at < %s',
+                [low, low + chunk_size, threshold_value]
+            )
+            deleted += cursor.rowcount
+        low += chunk_size
+
+    if low is not None and low <= high:
+        logger.info("Log cleanup hit its time limit, the rest is left for the next run")
+    return deleted
+
+def delete_unused_bodies_before(threshold, deadline):
+    """
+    Delete stored bodies no log refers to and intern() hasn't handed out since
+    threshold, in primary-key ranges of EMAIL_LOG_DELETE_CHUNK_SIZE until the deadline.
+    """
+    chunk_size = settings.EMAIL_LOG_DELETE_CHUNK_SIZE
+    unused = MessageBody.objects.filter(last_used__lt=threshold, logs__isnull=True)
+    bounds = unused.aggregate(low=Min('pk'), high=Max('pk'))
+    low, high = bounds['low'], bounds['high']
+
+    deleted = 0
+    while low is not None and low <= high and time.monotonic() < deadline:
+        try:
+            with transaction.atomic():
+                # Rows locked by a concurrent touch() are skipped; the log check is
+                # repeated under the lock
+                ids = list(
+                    MessageBody.objects.select_for_update(skip_locked=True)
+                    .filter(pk__gte=low, pk__lt=low + chunk_size, last_used__lt=threshold)
+                    .values_list('pk', flat=True)
+                )
+                count, _ = MessageBody.objects.filter(pk__in=ids, logs__isnull=True).delete()
+                deleted += count
+        except (IntegrityError, ProtectedError) as exc:
+            # A log started referring to one of them meanwhile; retried next run
+            logger.warning(f"Skipped message bodies {low}-{low + chunk_size - 1}: {exc}")
+        low += chunk_size
+    return deleted
+
 @shared_task
 def clean_old_logs():
     """
-    Task to clean up old email logs (older than 30 days)
+    Task to clean up old email logs (older than EMAIL_LOG_RETENTION_DAYS).
+    Whole partitions are dropped when the table is partitioned.
+    Returns the number of rows deleted; rows in dropped partitions are only
+    known as a planner estimate, so they are logged separately.
     """
-    threshold_date = timezone.now() - timedelta(days=30)
-    old_logs = EmailLog.objects.filter(sent_at__lt=threshold_date)
-    count = old_logs.count()
-    old_logs.delete()
+    threshold_date = timezone.now() - timedelta(days=settings.EMAIL_LOG_RETENTION_DAYS)
+    deadline = time.monotonic() + settings.EMAIL_LOG_DELETE_TIME_LIMIT
+
+    if partitions.is_partitioned():
+        estimated = partitions.drop_partitions_before(threshold_date)
+        logger.info(f"Dropped expired email log partitions holding an estimated {estimated} rows")
+    # Rows left in a partition that straddles the threshold, or the whole table when unpartitioned
+    count = delete_logs_before(threshold_date, deadline)
+
+    # Stored bodies no log refers to any more
+    delete_unused_bodies_before(threshold_date, deadline)
+
     logger.info(f"Cleaned up {count} old email logs")
     return count
+
+@shared_task
+def create_email_log_partitions():
+    """
+    Task to create upcoming email log partitions. Does nothing unless the table is partitioned.
+    """
+    if not partitions.is_partitioned():
+        return []
+    return partitions.create_partitions()
+
+@shared_task
+def flush_delivery_outcomes():
+    """
+    Task to write buffered delivery outcomes (EMAIL_WRITE_BEHIND) to the database.
+    """
+    if not settings.EMAIL_WRITE_BEHIND:
+        return 0
+    return outcomes.flush()
+
+@shared_task
+def update_backlog_metrics():
+    """
+    Task to store the due-but-unsent reminder backlog for the metrics endpoint,
+    so scrapes don't query the reminders table.
+    """
+    if not metrics.is_enabled():
+        return None
+    now = timezone.now()
+    # Same condition as the partial reminder_due_idx
+    rows = Reminder.objects.filter(
+        status__in=['pending', 'queued'],
+        scheduled_time__lte=now
+    ).values('status').annotate(count=Count('id'), oldest=Min('scheduled_time')).order_by()
+    backlog = {'pending': 0, 'queued': 0}
+    oldest = None
+    for row in rows:
+        backlog[row['status']] = row['count']
+        oldest = row['oldest'] if oldest is None else min(oldest, row['oldest'])
+
+    gauges = {
+        metrics.series('notimailer_reminder_backlog', {'status': status}): count
+        for status, count in backlog.items()
+    }
+    gauges['notimailer_reminder_backlog_oldest_seconds'] = (now - oldest).total_seconds() if oldest else 0
+    gauges['notimailer_metrics_updated_timestamp_seconds'] = now.timestamp()
+    metrics.set_gauges(gauges)
+    return backlog
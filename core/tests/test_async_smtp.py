@@ -0,0 +1,123 @@
+import socket
+from datetime import timedelta
+from unittest.mock import patch
+from aiosmtpd.controller import Controller
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from core import async_smtp
+from core.models import EmailLog, Reminder
+from core.tasks import send_email_batch, send_email_batch_async
+
+
+class SinkHandler:
+    """Collects delivered messages and rejects recipients starting with 'reject'"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('reject'):
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return '250 Message accepted for delivery'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class SMTPSinkTestCase(TestCase):
+    """Runs an in-process SMTP server and points both delivery engines at it"""
+
+    def setUp(self):
+        self.handler = SinkHandler()
+        self.controller = Controller(self.handler, hostname='127.0.0.1', port=free_port())
+        self.controller.start()
+        self.addCleanup(self.controller.stop)
+
+        self.settings_override = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.controller.port,
+            EMAIL_USE_TLS=False,
+            EMAIL_ASYNC_POOL_SIZE=3,
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        # Each test gets a pool connected to its own sink
+        self.addCleanup(async_smtp.shutdown)
+
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        self.reminders = [
+            Reminder.objects.create(
+                user=self.user,
+                title=f'Reminder {i}',
+                message=f'Message {i}',
+                scheduled_time=timezone.now() - timedelta(minutes=1),
+                status='queued'
+            )
+            for i in range(5)
+        ]
+
+    def messages(self, to_email='test@example.com'):
+        return [
+            {'to_email': to_email, 'subject': r.title, 'body': r.message, 'reminder_id': r.id}
+            for r in self.reminders
+        ]
+
+
+class TestAsyncEngine(SMTPSinkTestCase):
+    def test_batch_delivers_and_records_outcomes(self):
+        """Test that the async engine delivers every message and records it"""
+        self.assertEqual(send_email_batch_async(self.messages()), 5)
+
+        self.assertEqual(len(self.handler.messages), 5)
+        self.assertEqual(EmailLog.objects.filter(status='success').count(), 5)
+        self.assertFalse(Reminder.objects.exclude(status='sent').exists())
+
+    def test_pool_is_bounded_and_reused(self):
+        """Test that connections stay open between batches and never exceed the pool size"""
+        send_email_batch_async(self.messages())
+        pool = async_smtp.get_engine().pool
+        idle = list(pool._idle)
+        self.assertLessEqual(len(idle), 3)
+
+        send_email_batch_async(self.messages())
+        self.assertEqual({id(c) for c in pool._idle}, {id(c) for c in idle})
+        self.assertEqual(len(self.handler.messages), 10)
+
+    @patch('core.tasks.send_email_task.apply_async')
+    def test_rejected_messages_are_retried(self, mock_apply_async):
+        """Test that rejected messages are logged as failed and handed to send_email_task"""
+        self.assertEqual(send_email_batch_async(self.messages('reject@example.com')), 0)
+
+        self.assertEqual(EmailLog.objects.filter(status='failed').count(), 5)
+        self.assertEqual(mock_apply_async.call_count, 5)
+        reminder = Reminder.objects.get(id=self.reminders[0].id)
+        self.assertEqual(reminder.status, 'queued')
+        self.assertEqual(reminder.retry_count, 1)
+
+
+class TestEngineParity(SMTPSinkTestCase):
+    def test_both_engines_record_the_same_outcomes(self):
+        """Test that the sync and async engines deliver and record the same batch identically"""
+        send_email_batch(self.messages())
+        sync_logs = list(EmailLog.objects.order_by('reminder_id').values_list('reminder_id', 'status', 'subject'))
+        EmailLog.objects.all().delete()
+
+        send_email_batch_async(self.messages())
+        async_logs = list(EmailLog.objects.order_by('reminder_id').values_list('reminder_id', 'status', 'subject'))
+
+        self.assertEqual(sync_logs, async_logs)
+        self.assertEqual(len(self.handler.messages), 10)
@@ -0,0 +1,83 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from core import authentication
+from core.serializers import MyTokenObtainPairSerializer
+
+
+class TestCachedJWTAuthentication(TestCase):
+    def setUp(self):
+        cache.clear()
+        authentication._local_cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        self.token = MyTokenObtainPairSerializer.get_token(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.url = reverse('user_profile')
+
+    def authenticate(self):
+        return authentication.CachedJWTAuthentication().get_user(AccessToken(str(self.token)))
+
+    def test_user_is_cached_locally_and_in_redis(self):
+        """Test that only the first authentication loads the user from the database"""
+        with CaptureQueriesContext(connection) as first:
+            user = self.authenticate()
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(self.authenticate().pk, user.pk)
+
+        self.assertEqual(len(first), 1)
+        self.assertEqual(len(second), 0)
+        self.assertEqual(user.username, 'testuser')
+        self.assertIsNotNone(cache.get(authentication.user_cache_key(self.user.pk)))
+
+        # A new process starts without the local entry but finds the shared one
+        authentication._local_cache.clear()
+        with CaptureQueriesContext(connection) as third:
+            self.authenticate()
+        self.assertEqual(len(third), 0)
+
+    def test_saving_user_invalidates_cache(self):
+        """Test that a deactivated user is rejected on their next request"""
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertIsNone(cache.get(authentication.user_cache_key(self.user.pk)))
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_deleted_user_is_rejected(self):
+        """Test that a deleted user's token stops working"""
+        self.authenticate()
+        self.user.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_profile_update_uses_fresh_user(self):
+        """Test that updating the profile writes to the stored user, not the cached copy"""
+        self.authenticate()
+        response = self.client.patch(self.url, {'first_name': 'Updated'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Updated')
+        self.assertTrue(self.user.check_password('testpassword123'))
+
+    @override_settings(AUTH_JWT_STATELESS=True)
+    def test_stateless_mode_builds_user_from_claims(self):
+        """Test that stateless mode takes the user from the token's claims without a query"""
+        with CaptureQueriesContext(connection) as queries:
+            user = self.authenticate()
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual((user.pk, user.username, user.email), (self.user.pk, 'testuser', 'test@example.com'))
+        self.assertFalse(user.is_staff)
+        self.assertTrue(user._state.adding)
@@ -0,0 +1,48 @@
+from django.test import TestCase
+from core import benchmark
+from core.models import EmailLog, Reminder, UserProfile
+
+
+class TestBenchmark(TestCase):
+    def test_seed_and_run(self):
+        """Test that a small dataset is seeded and every scenario is measured"""
+        user = benchmark.seed(100)
+
+        self.assertEqual(Reminder.objects.count(), 100)
+        self.assertEqual(EmailLog.objects.count(), 100)
+        self.assertEqual(UserProfile.objects.filter(birthday_key__isnull=False).count(), 10)
+        self.assertEqual(user.reminders.count(), 10)
+
+        results = {name: benchmark.measure(fn) for name, fn in benchmark.scenarios(user)}
+        self.assertEqual(set(results), {
+            'api_reminders', 'api_email_logs', 'api_dashboard',
+            'reminder_task', 'birthday_task', 'clean_old_logs',
+        })
+        for metrics in results.values():
+            self.assertEqual(set(metrics), set(benchmark.METRICS))
+            self.assertGreater(metrics['queries'], 0)
+
+    def test_compare_flags_regressions(self):
+        """Test that extra queries and time beyond the tolerance are regressions"""
+        baseline = {'reminder_task': {'wall_time': 1.0, 'queries': 10, 'peak_memory': 10_000_000}}
+        results = {'reminder_task': {'wall_time': 1.2, 'queries': 11, 'peak_memory': 10_000_000}}
+
+        self.assertEqual(
+            benchmark.compare(results, baseline, tolerance=0.25),
+            [('reminder_task', 'queries', 10, 11)]
+        )
+        results['reminder_task'].update(wall_time=1.3, queries=10)
+        self.assertEqual(
+            benchmark.compare(results, baseline, tolerance=0.25),
+            [('reminder_task', 'wall_time', 1.0, 1.3)]
+        )
+
+    def test_delivery_compares_engines(self):
+        """Test that both engines deliver the same batch to the sink and report their throughput"""
+        results = benchmark.delivery(20)
+
+        self.assertEqual(set(results), {'sync', 'async'})
+        for metrics in results.values():
+            self.assertEqual(metrics['messages'], 20)
+            self.assertGreater(metrics['messages_per_second'], 0)
+        self.assertEqual(EmailLog.objects.filter(status='success').count(), 40)
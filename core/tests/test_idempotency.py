@@ -0,0 +1,126 @@
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from core import idempotency
+from core.models import Reminder
+from core.tasks import send_email_batch, send_email_task
+
+
+@patch('core.tasks.send_email_task.apply_async')
+class TestIdempotencyKey(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('send_email')
+        self.data = {'to_email': 'recipient@example.com', 'subject': 'Subject', 'body': 'Body'}
+
+    def post(self, data=None, key='key-1'):
+        return self.client.post(self.url, data or self.data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_first_response(self, mock_apply_async):
+        """Test that repeating a request with the same key sends once and returns the same response"""
+        first = self.post()
+        second = self.post()
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        mock_apply_async.assert_called_once()
+        self.assertEqual(Reminder.objects.count(), 1)
+
+    def test_keys_are_per_user_and_optional(self, mock_apply_async):
+        """Test that other users' keys and requests without a key are not deduplicated"""
+        self.post()
+        other = User.objects.create_user(username='otheruser', password='testpassword123')
+        self.client.force_authenticate(user=other)
+        self.post()
+        self.client.post(self.url, self.data, format='json')
+        self.client.post(self.url, self.data, format='json')
+
+        self.assertEqual(mock_apply_async.call_count, 4)
+
+    def test_key_reused_for_different_request(self, mock_apply_async):
+        """Test that a key can't be reused with a different payload"""
+        self.post()
+        response = self.post({**self.data, 'subject': 'Other'})
+
+        self.assertEqual(response.status_code, 422)
+        mock_apply_async.assert_called_once()
+
+    def test_request_in_progress(self, mock_apply_async):
+        """Test that a concurrent request with the same key is rejected while the first is running"""
+        cache.add(
+            idempotency.request_key(self.user.id, 'key-1'),
+            {'fingerprint': idempotency.fingerprint(self.data)}
+        )
+
+        self.assertEqual(self.post().status_code, 409)
+        mock_apply_async.assert_not_called()
+
+
+class TestSendDedup(TestCase):
+    def setUp(self):
+        self.messages = [
+            {'to_email': 'one@example.com', 'subject': 'One', 'body': 'Body one'},
+            {'to_email': 'two@example.com', 'subject': 'Two', 'body': 'Body two'},
+        ]
+
+    @patch('core.idempotency.get_client')
+    def test_claim_sets_key_only_if_absent(self, mock_get_client):
+        """Test that claiming uses SET NX GET and reports keys already claimed"""
+        pipe = mock_get_client.return_value.pipeline.return_value
+        pipe.execute.return_value = [None, b'done']
+
+        self.assertEqual(idempotency.claim(['a', 'b']), [None, 'done'])
+        pipe.set.assert_any_call('a', 'sending', nx=True, ex=600, get=True)
+
+    @patch('core.tasks.send_mail')
+    @patch('core.idempotency.finish')
+    @patch('core.idempotency.claim', return_value=[None])
+    def test_task_claims_and_finishes_its_attempt(self, mock_claim, mock_finish, mock_send_mail):
+        """Test that a send claims the attempt's key first and marks it done after sending"""
+        send_email_task.apply(args=('test@example.com', 'Subject', 'Body'), task_id='task-1')
+
+        mock_claim.assert_called_once_with(['dedup:send:task-1:0'])
+        mock_send_mail.assert_called_once()
+        mock_finish.assert_called_once_with(['dedup:send:task-1:0'])
+
+    @patch('core.tasks.send_mail')
+    @patch('core.idempotency.claim', return_value=['done'])
+    def test_redelivered_attempt_is_skipped(self, mock_claim, mock_send_mail):
+        """Test that a redelivered message whose attempt was made doesn't send again"""
+        result = send_email_task.apply(args=('test@example.com', 'Subject', 'Body'), task_id='task-1')
+
+        self.assertIsNone(result.result)
+        mock_send_mail.assert_not_called()
+
+    @override_settings(EMAIL_DEDUP_ENABLED=False)
+    @patch('core.tasks.send_mail')
+    @patch('core.idempotency.claim')
+    def test_disabled(self, mock_claim, mock_send_mail):
+        """Test that no keys are checked when dedup is disabled"""
+        send_email_task.apply(args=('test@example.com', 'Subject', 'Body'), task_id='task-1')
+        mock_claim.assert_not_called()
+        mock_send_mail.assert_called_once()
+
+    @patch('core.tasks.get_connection')
+    @patch('core.idempotency.finish')
+    @patch('core.idempotency.claim', return_value=[None, 'sending'])
+    def test_batch_skips_messages_already_handled(self, mock_claim, mock_finish, mock_get_connection):
+        """Test that a redelivered batch sends only the messages no earlier delivery claimed"""
+        result = send_email_batch.apply(args=(self.messages,), task_id='batch-1')
+
+        self.assertEqual(result.result, 1)
+        mock_claim.assert_called_once_with(['dedup:send:batch-1:0:0', 'dedup:send:batch-1:0:1'])
+        self.assertEqual(mock_get_connection.return_value.send_messages.call_count, 1)
+        mock_finish.assert_called_once_with(['dedup:send:batch-1:0:0'])
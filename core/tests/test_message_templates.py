@@ -0,0 +1,79 @@
+from datetime import date
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from core import message_templates
+from core.models import MessageTemplate
+from core.tasks import birthday_task
+
+
+class TestMessageTemplates(TestCase):
+    def test_default_template(self):
+        """Test that the built-in template is used when none is stored"""
+        messages = list(message_templates.render_messages('birthday', [('a@example.com', {'name': 'Ann'})]))
+
+        self.assertEqual(messages, [{
+            'to_email': 'a@example.com',
+            'subject': 'Happy Birthday!',
+            'body': "Hello Ann,\n\nWishing you a wonderful birthday and a great year ahead!\n\nBest regards,\nNotimailer Team",
+        }])
+
+    def test_unknown_template(self):
+        """Test that an unknown name without a built-in default is an error"""
+        with self.assertRaises(MessageTemplate.DoesNotExist):
+            message_templates.load('missing')
+
+    def test_batch_renders_each_recipient_without_escaping(self):
+        """Test that each recipient gets their own values and text isn't HTML-escaped"""
+        MessageTemplate.objects.create(name='note', subject='Hi {{ name }}', body='{{ name }} & <{{ email }}>')
+        recipients = [(f'user{i}@example.com', {'name': f'User {i}', 'email': f'user{i}@example.com'}) for i in range(3)]
+
+        with self.assertNumQueries(1):
+            messages = list(message_templates.render_messages('note', recipients))
+
+        self.assertEqual([m['subject'] for m in messages], ['Hi User 0', 'Hi User 1', 'Hi User 2'])
+        self.assertEqual(messages[2]['body'], 'User 2 & <user2@example.com>')
+
+    def test_sources_are_compiled_once(self):
+        """Test that loading a template again reuses the compiled sources"""
+        MessageTemplate.objects.create(name='note', subject='Subject {{ name }}', body='Body {{ name }}')
+        message_templates.load('note')
+
+        with patch.object(message_templates.engine, 'from_string') as mock_from_string:
+            message_templates.load('note')
+        mock_from_string.assert_not_called()
+
+    def test_variants_are_split_by_recipient(self):
+        """Test that recipients are spread over variants and always get the same one"""
+        MessageTemplate.objects.create(name='promo', variant='a', subject='A', body='Body A')
+        MessageTemplate.objects.create(name='promo', variant='b', subject='B', body='Body B')
+        recipients = [(f'user{i}@example.com', {}) for i in range(20)]
+
+        first = [m['subject'] for m in message_templates.render_messages('promo', recipients)]
+        second = [m['subject'] for m in message_templates.render_messages('promo', recipients)]
+
+        self.assertEqual(first, second)
+        self.assertEqual(set(first), {'A', 'B'})
+
+    def test_invalid_syntax_fails_validation(self):
+        """Test that a template that doesn't compile is rejected by full_clean"""
+        template = MessageTemplate(name='broken', subject='Hi', body='{% if %}')
+        with self.assertRaises(ValidationError) as cm:
+            template.full_clean()
+        self.assertIn('body', cm.exception.message_dict)
+
+    @patch('core.tasks.send_email_task.apply_async')
+    @patch('core.tasks.timezone.localdate', return_value=date(2025, 7, 16))
+    def test_birthday_task_uses_stored_template(self, mock_localdate, mock_apply_async):
+        """Test that birthday emails are rendered from the stored 'birthday' template"""
+        MessageTemplate.objects.create(name='birthday', subject='Happy birthday, {{ name }}', body='Cheers, {{ username }}')
+        user = User.objects.create_user(username='ann', email='ann@example.com', first_name='Ann')
+        user.profile.birthdate = date(1990, 7, 16)
+        user.profile.save()
+
+        self.assertEqual(birthday_task(), 1)
+        self.assertEqual(
+            mock_apply_async.call_args.kwargs['args'],
+            ('ann@example.com', 'Happy birthday, Ann', 'Cheers, ann')
+        )
@@ -0,0 +1,137 @@
+from datetime import timedelta
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from core import metrics
+from core.models import Reminder
+from core.tasks import send_email_task, update_backlog_metrics
+
+
+def written(mock_get_client):
+    """Return {series: amount} written by flush() through the mocked client"""
+    pipe = mock_get_client.return_value.pipeline.return_value
+    return {c.args[1]: c.args[2] for c in pipe.hincrbyfloat.call_args_list}
+
+
+@override_settings(METRICS_ENABLED=True)
+@patch('core.metrics.get_client')
+class TestMetrics(TestCase):
+    def setUp(self):
+        metrics._pending.clear()
+
+    def test_flush_writes_counters_and_histograms(self, mock_get_client):
+        """Test that recorded values are written to Redis in one pipeline and cleared"""
+        metrics.inc('notimailer_emails_sent_total', 2)
+        metrics.observe('notimailer_smtp_duration_seconds', 0.3)
+        metrics.flush()
+
+        values = written(mock_get_client)
+        self.assertEqual(values['notimailer_emails_sent_total'], 2)
+        self.assertNotIn('notimailer_smtp_duration_seconds_bucket{le="0.25"}', values)
+        self.assertEqual(values['notimailer_smtp_duration_seconds_bucket{le="0.5"}'], 1)
+        self.assertEqual(values['notimailer_smtp_duration_seconds_bucket{le="+Inf"}'], 1)
+        self.assertEqual(values['notimailer_smtp_duration_seconds_count'], 1)
+        mock_get_client.return_value.pipeline.return_value.execute.assert_called_once()
+        self.assertEqual(metrics._pending, {})
+
+    def test_disabled_records_nothing(self, mock_get_client):
+        """Test that nothing is recorded or written when metrics are disabled"""
+        with override_settings(METRICS_ENABLED=False):
+            metrics.inc('notimailer_emails_sent_total')
+            metrics.flush()
+        mock_get_client.assert_not_called()
+
+    @patch('core.metrics.queue_lengths', return_value={'celery': 7})
+    def test_render(self, mock_queue_lengths, mock_get_client):
+        """Test that stored values are rendered in the Prometheus text format with ordered buckets"""
+        mock_get_client.return_value.pipeline.return_value.execute.return_value = [
+            {
+                b'notimailer_emails_sent_total': b'12',
+                b'notimailer_task_db_seconds_count{task="t"}': b'2',
+                b'notimailer_task_db_seconds_bucket{task="t",le="+Inf"}': b'2',
+                b'notimailer_task_db_seconds_bucket{task="t",le="0.01"}': b'1',
+                b'notimailer_task_db_seconds_sum{task="t"}': b'0.5',
+                b'notimailer_task_db_seconds_bucket{task="t",le="0.5"}': b'2',
+            },
+            {b'notimailer_reminder_backlog{status="pending"}': b'3'},
+        ]
+
+        lines = metrics.render().splitlines()
+
+        self.assertIn('# TYPE notimailer_emails_sent_total counter', lines)
+        self.assertIn('notimailer_emails_sent_total 12', lines)
+        self.assertIn('notimailer_reminder_backlog{status="pending"} 3', lines)
+        self.assertIn('notimailer_celery_queue_length{queue="celery"} 7', lines)
+        start = lines.index('# TYPE notimailer_task_db_seconds histogram') + 1
+        self.assertEqual(lines[start:start + 5], [
+            'notimailer_task_db_seconds_bucket{task="t",le="0.01"} 1',
+            'notimailer_task_db_seconds_bucket{task="t",le="0.5"} 2',
+            'notimailer_task_db_seconds_bucket{task="t",le="+Inf"} 2',
+            'notimailer_task_db_seconds_sum{task="t"} 0.5',
+            'notimailer_task_db_seconds_count{task="t"} 2',
+        ])
+
+    @patch('core.tasks.send_mail')
+    def test_task_records_delivery_and_db_time(self, mock_send_mail, mock_get_client):
+        """Test that a sent email is counted and timed and the task's database time is recorded"""
+        send_email_task.apply(args=('test@example.com', 'Subject', 'Body'))
+
+        values = written(mock_get_client)
+        self.assertEqual(values['notimailer_emails_sent_total'], 1)
+        self.assertEqual(values['notimailer_smtp_duration_seconds_count'], 1)
+        self.assertEqual(values['notimailer_task_db_seconds_count{task="core.tasks.send_email_task"}'], 1)
+        self.assertGreater(values['notimailer_task_db_seconds_sum{task="core.tasks.send_email_task"}'], 0)
+
+
+@override_settings(METRICS_ENABLED=True)
+class TestBacklogMetrics(TestCase):
+    @patch('core.metrics.set_gauges')
+    def test_backlog_gauges(self, mock_set_gauges):
+        """Test that due pending and queued reminders are counted and the oldest one's age stored"""
+        user = User.objects.create_user(username='testuser', email='test@example.com', password='testpassword123')
+        now = timezone.now()
+        for minutes, status_value in [(-30, 'pending'), (-5, 'pending'), (-1, 'queued'), (-60, 'sent'), (10, 'pending')]:
+            Reminder.objects.create(
+                user=user,
+                title='Reminder',
+                message='Message',
+                scheduled_time=now + timedelta(minutes=minutes),
+                status=status_value
+            )
+
+        self.assertEqual(update_backlog_metrics(), {'pending': 2, 'queued': 1})
+
+        gauges = mock_set_gauges.call_args.args[0]
+        self.assertEqual(gauges['notimailer_reminder_backlog{status="pending"}'], 2)
+        self.assertEqual(gauges['notimailer_reminder_backlog{status="queued"}'], 1)
+        self.assertAlmostEqual(gauges['notimailer_reminder_backlog_oldest_seconds'], 1800, delta=60)
+
+
+@patch('core.metrics.render', return_value='notimailer_emails_sent_total 1\n')
+class TestMetricsView(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('metrics')
+
+    def test_requires_admin_without_token(self, mock_render):
+        """Test that only staff users can read metrics when no token is configured"""
+        user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'notimailer_emails_sent_total 1\n')
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_bearer_token(self, mock_render):
+        """Test that scrapers authenticate with the configured bearer token"""
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
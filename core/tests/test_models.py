@@ -1,9 +1,9 @@
 import pytest
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
 from django.utils import timezone
-from datetime import timedelta
-from core.models import UserProfile, Reminder, EmailLog
+from datetime import date, timedelta
+from core.models import UserProfile, Reminder, EmailLog, MessageBody
 
 class TestUserProfile(TestCase):
     def setUp(self):
@@ -22,6 +22,35 @@ class TestUserProfile(TestCase):
         self.assertEqual(self.profile.user.username, 'testuser')
         self.assertEqual(str(self.profile), "testuser's profile")
 
+class TestUserProfileBirthdayKey(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='birthdayuser',
+            email='birthday@example.com',
+            password='testpassword'
+        )
+        self.profile = self.user.profile
+
+    def test_birthday_key_synced_on_save(self):
+        """Test birthday_key follows birthdate on save"""
+        self.assertIsNone(self.profile.birthday_key)
+
+        self.profile.birthdate = date(1990, 7, 16)
+        self.profile.save(update_fields=['birthdate'])
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.birthday_key, 716)
+
+        self.profile.birthdate = None
+        self.profile.save()
+        self.profile.refresh_from_db()
+        self.assertIsNone(self.profile.birthday_key)
+
+    def test_birthday_keys_on_feb_28(self):
+        """Test Feb 29 birthdays are celebrated on Feb 28 in non-leap years only"""
+        self.assertEqual(UserProfile.birthday_keys_on(date(2025, 2, 28)), [228, 229])
+        self.assertEqual(UserProfile.birthday_keys_on(date(2024, 2, 28)), [228])
+        self.assertEqual(UserProfile.birthday_keys_on(date(2024, 2, 29)), [229])
+
 class TestReminder(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(
@@ -90,4 +119,32 @@ class TestEmailLog(TestCase):
             error_message='SMTP connection failed'
         )
         self.assertEqual(log.status, 'failed')
-        self.assertEqual(log.error_message, 'SMTP connection failed')
\ No newline at end of file
+        self.assertEqual(log.error_message, 'SMTP connection failed')
+
+class TestMessageBody(TestCase):
+    def test_identical_bodies_stored_once(self):
+        """Test that logs with the same body share one stored body"""
+        first = EmailLog.objects.create(to_email='a@example.com', subject='Hi', body='Same body', status='success')
+        second = EmailLog.objects.create(to_email='b@example.com', subject='Hi', body='Same body', status='success')
+
+        self.assertEqual(MessageBody.objects.count(), 1)
+        self.assertEqual(first.message_body_id, second.message_body_id)
+        self.assertEqual(EmailLog.objects.get(pk=second.pk).body, 'Same body')
+
+    @override_settings(MESSAGE_BODY_COMPRESS_THRESHOLD=10)
+    def test_large_bodies_compressed(self):
+        """Test that bodies over the threshold are compressed and read back intact"""
+        text = 'Happy birthday! ' * 50
+        body = MessageBody.objects.intern(text)
+
+        self.assertEqual(body.text, '')
+        self.assertLess(len(body.data), len(text))
+        self.assertEqual(MessageBody.objects.get(pk=body.pk).content, text)
+
+    def test_intern_many(self):
+        """Test that several bodies are stored with one lookup and one insert"""
+        MessageBody.objects.intern('existing')
+        with self.assertNumQueries(3):
+            bodies = MessageBody.objects.intern_many(['existing', 'new one', 'new two'])
+        self.assertEqual({text: body.content for text, body in bodies.items()},
+                         {'existing': 'existing', 'new one': 'new one', 'new two': 'new two'})
@@ -0,0 +1,180 @@
+import json
+from datetime import timedelta
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from redis.exceptions import RedisError
+from core import outcomes
+from core.models import EmailLog, Reminder
+
+
+class TestWriteOutcomes(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        self.reminder = Reminder.objects.create(
+            user=self.user,
+            title='Test Reminder',
+            message='Test message',
+            scheduled_time=timezone.now() - timedelta(minutes=1),
+            status='queued'
+        )
+
+    def test_failure_then_success_marks_sent(self):
+        """Test that a success in the same batch wins over an earlier failure"""
+        outcomes.write_outcomes([
+            outcomes.outcome('test@example.com', 'Subject', 'Body', 'failed',
+                             reminder_id=self.reminder.id, reminder_status='queued', error_message='Timeout'),
+            outcomes.outcome('test@example.com', 'Subject', 'Body', 'success',
+                             reminder_id=self.reminder.id, reminder_status='sent'),
+        ])
+
+        self.reminder.refresh_from_db()
+        self.assertEqual(self.reminder.status, 'sent')
+        self.assertEqual(self.reminder.retry_count, 1)
+        self.assertEqual(EmailLog.objects.filter(reminder=self.reminder).count(), 2)
+
+    def test_single_failure_counts_retry(self):
+        """Test that a single failed attempt increments retry_count in place"""
+        outcomes.write_outcome(
+            outcomes.outcome('test@example.com', 'Subject', 'Body', 'failed',
+                             reminder_id=self.reminder.id, reminder_status='queued', error_message='Timeout')
+        )
+
+        self.reminder.refresh_from_db()
+        self.assertEqual(self.reminder.status, 'queued')
+        self.assertEqual(self.reminder.retry_count, 1)
+        self.assertIsNotNone(self.reminder.last_retry)
+        self.assertEqual(EmailLog.objects.get().error_message, 'Timeout')
+
+    @patch('core.outcomes.invalidate_dashboards')
+    def test_single_outcome_invalidates_owner_dashboard(self, mock_invalidate):
+        """Test that the owner returned by the reminder update has their dashboard dropped"""
+        outcomes.write_outcome(
+            outcomes.outcome('test@example.com', 'Subject', 'Body', 'success',
+                             reminder_id=self.reminder.id, reminder_status='sent')
+        )
+
+        mock_invalidate.assert_called_once_with([self.user.id])
+        self.reminder.refresh_from_db()
+        self.assertEqual(self.reminder.status, 'sent')
+        self.assertGreater(self.reminder.updated_at, self.reminder.created_at)
+
+    @patch('core.outcomes.invalidate_dashboards')
+    @patch('core.outcomes.supports_update_returning', return_value=False)
+    def test_single_outcome_without_update_returning(self, mock_supports, mock_invalidate):
+        """Test that databases without UPDATE ... RETURNING apply the outcome and find the owner"""
+        outcomes.write_outcome(
+            outcomes.outcome('test@example.com', 'Subject', 'Body', 'failed',
+                             reminder_id=self.reminder.id, reminder_status='queued', error_message='Timeout')
+        )
+        outcomes.write_outcome(
+            outcomes.outcome('test@example.com', 'Subject', 'Body', 'success',
+                             reminder_id=self.reminder.id + 1, reminder_status='sent')
+        )
+
+        mock_invalidate.assert_called_once_with([self.user.id])
+        self.reminder.refresh_from_db()
+        self.assertEqual(self.reminder.retry_count, 1)
+        self.assertEqual(
+            sorted(EmailLog.objects.values_list('status', 'reminder_id')),
+            [('failed', self.reminder.id), ('success', None)]
+        )
+
+    def test_deleted_reminder_keeps_log(self):
+        """Test that an outcome for a deleted reminder is logged without the link"""
+        reminder_id = self.reminder.id
+        self.reminder.delete()
+
+        outcomes.write_outcomes([
+            outcomes.outcome('test@example.com', 'Subject', 'Body', 'success',
+                             reminder_id=reminder_id, reminder_status='sent'),
+        ])
+
+        outcomes.write_outcome(
+            outcomes.outcome('test@example.com', 'Subject', 'Body', 'success',
+                             reminder_id=reminder_id, reminder_status='sent')
+        )
+
+        for log in EmailLog.objects.all():
+            self.assertIsNone(log.reminder_id)
+            self.assertEqual(log.body, 'Body')
+
+
+@override_settings(EMAIL_WRITE_BEHIND=True, EMAIL_WRITE_BEHIND_FLUSH_SIZE=2)
+class TestWriteBehind(TestCase):
+    @patch('core.tasks.flush_delivery_outcomes.delay')
+    @patch('core.outcomes.get_client')
+    def test_record_buffers_and_triggers_flush(self, mock_get_client, mock_flush):
+        """Test that outcomes are buffered and a flush is triggered once enough are waiting"""
+        client = mock_get_client.return_value
+        client.pipeline.return_value.execute.return_value = [b'1-0', 2]
+        client.set.return_value = True
+
+        outcomes.record_outcome('test@example.com', 'Subject', 'Body', 'success')
+
+        client.pipeline.return_value.xadd.assert_called_once()
+        mock_flush.assert_called_once()
+        self.assertFalse(EmailLog.objects.exists())
+
+    @patch('core.outcomes.get_client', side_effect=RedisError('Connection refused'))
+    def test_unavailable_buffer_writes_directly(self, mock_get_client):
+        """Test that outcomes are written to the database when Redis can't buffer them"""
+        user = User.objects.create_user(username='testuser', email='test@example.com', password='testpassword123')
+        reminders = [
+            Reminder.objects.create(
+                user=user,
+                title=f'Reminder {i}',
+                message='Test message',
+                scheduled_time=timezone.now() - timedelta(minutes=1),
+                status='queued'
+            )
+            for i in range(2)
+        ]
+
+        outcomes.record_outcome('test@example.com', 'Subject', 'Body', 'success',
+                                reminder_id=reminders[0].id, reminder_status='sent')
+        outcomes.record_outcomes([
+            outcomes.outcome('test@example.com', 'Subject', 'Body', 'failed',
+                             reminder_id=reminders[1].id, reminder_status='queued', error_message='Timeout'),
+        ])
+
+        self.assertEqual(mock_get_client.call_count, 2)
+        self.assertEqual(Reminder.objects.get(id=reminders[0].id).status, 'sent')
+        self.assertEqual(Reminder.objects.get(id=reminders[1].id).retry_count, 1)
+        self.assertEqual(
+            sorted(EmailLog.objects.values_list('reminder_id', 'status')),
+            [(reminders[0].id, 'success'), (reminders[1].id, 'failed')]
+        )
+
+    @patch('core.tasks.flush_delivery_outcomes.delay')
+    @patch('core.outcomes.get_client')
+    def test_failed_flush_trigger_keeps_buffered_outcomes(self, mock_get_client, mock_flush):
+        """Test that outcomes already appended aren't written again when triggering the flush fails"""
+        client = mock_get_client.return_value
+        client.pipeline.return_value.execute.return_value = [b'1-0', 2]
+        client.set.side_effect = RedisError('Connection reset')
+
+        outcomes.record_outcome('test@example.com', 'Subject', 'Body', 'success')
+
+        mock_flush.assert_not_called()
+        self.assertFalse(EmailLog.objects.exists())
+
+    @patch('core.outcomes.get_client')
+    def test_flush_writes_and_acknowledges(self, mock_get_client):
+        """Test that flushed entries are written and only then acknowledged"""
+        entry = outcomes.outcome('test@example.com', 'Subject', 'Body', 'success')
+        client = mock_get_client.return_value
+        client.xautoclaim.return_value = [b'0-0', [], []]
+        client.xreadgroup.side_effect = [
+            [[outcomes.STREAM_KEY.encode(), [(b'1-0', {b'outcome': json.dumps(entry).encode()})]]],
+            [],
+        ]
+
+        self.assertEqual(outcomes.flush(), 1)
+        self.assertEqual(EmailLog.objects.get().to_email, 'test@example.com')
+        client.xack.assert_called_once_with(outcomes.STREAM_KEY, outcomes.GROUP, b'1-0')
@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from core.tasks import clean_old_logs, reminder_task
+
+
+class ProfilingTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.settings_override = override_settings(TASK_PROFILING_DIR=self.directory.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def artifacts(self):
+        return sorted(os.listdir(self.directory.name))
+
+
+class TestTaskProfiling(ProfilingTestCase):
+    @override_settings(TASK_PROFILING_ENABLED=True, TASK_PROFILING_SAMPLE_RATE=1.0)
+    def test_profiles_selected_task(self):
+        """Test that a selected task writes a cProfile dump and its SQL timings"""
+        result = reminder_task.apply()
+
+        prof, sql = self.artifacts()
+        self.assertTrue(prof.startswith('core.tasks.reminder_task-'))
+        self.assertTrue(prof.endswith(f'-{result.id}.prof'))
+        with open(os.path.join(self.directory.name, sql)) as f:
+            summary = json.load(f)
+        self.assertEqual(summary['task_id'], result.id)
+        self.assertGreater(summary['queries'], 0)
+        self.assertEqual(sum(s['count'] for s in summary['statements']), summary['queries'])
+
+    @override_settings(TASK_PROFILING_ENABLED=True, TASK_PROFILING_SAMPLE_RATE=0.0)
+    def test_sampling_rate(self):
+        """Test that runs outside the sampling rate are not profiled"""
+        reminder_task.apply()
+        self.assertEqual(self.artifacts(), [])
+
+    @override_settings(TASK_PROFILING_ENABLED=False)
+    def test_disabled(self):
+        """Test that nothing is profiled when profiling is off"""
+        reminder_task.apply()
+        self.assertEqual(self.artifacts(), [])
+
+    @override_settings(TASK_PROFILING_ENABLED=False)
+    def test_header_profiles_one_run(self):
+        """Test that the profiling header profiles a run even when profiling is off"""
+        clean_old_logs.apply(headers={'notimailer_profile': True})
+        self.assertEqual(len(self.artifacts()), 2)
+
+
+class TestProfileHeader(ProfilingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('run_reminder')
+
+    @patch('core.views.reminder_task.apply_async', side_effect=lambda headers=None: reminder_task.apply(headers=headers))
+    def test_staff_can_request_a_profile(self, mock_apply_async):
+        """Test that X-Profile: 1 on a task trigger profiles that run for staff users only"""
+        self.client.post(self.url, HTTP_X_PROFILE='1')
+        self.assertEqual(self.artifacts(), [])
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.post(self.url, HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.artifacts()), 2)
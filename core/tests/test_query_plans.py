@@ -0,0 +1,169 @@
+import re
+from datetime import timedelta
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from core.models import Reminder, EmailLog
+from core.tasks import reminder_task, clean_old_logs
+
+
+def explain(sql):
+    """Return the query plan for a captured SQL statement as text."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Test tables are tiny, so make the planner show whether an index can serve the query
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ' + sql)
+        else:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return '\n'.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    Runs a hot path, picks the statement that touches the big table and checks
+    that its plan is served by the expected index instead of a full scan.
+    """
+
+    def find_query(self, queries, pattern):
+        for query in queries:
+            if re.search(pattern, query['sql']):
+                return query['sql']
+        self.fail(f"No query matching {pattern!r} in:\n" + '\n'.join(q['sql'] for q in queries))
+
+    def assertUsesIndex(self, sql, index_name):
+        plan = explain(sql)
+        self.assertIn(index_name, plan, f"Expected {index_name} in plan:\n{plan}")
+
+    def assertNoSeqScan(self, sql, table):
+        plan = explain(sql)
+        if connection.vendor == 'postgresql':
+            self.assertNotIn(f'Seq Scan on {table}', plan, plan)
+        else:
+            self.assertIsNone(re.search(rf'\bSCAN {table}\b(?! USING)', plan), plan)
+
+
+class TestReminderTaskQueries(QueryPlanTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        now = timezone.now()
+        for i in range(3):
+            Reminder.objects.create(
+                user=self.user,
+                title=f'Due Reminder {i}',
+                message='Due',
+                scheduled_time=now - timedelta(minutes=i + 1),
+                status='pending'
+            )
+
+    @patch('core.tasks.send_email_task.apply_async')
+    def test_claim_uses_due_index(self, mock_send_email_task):
+        """Test that claiming due reminders is served by the partial due index"""
+        with CaptureQueriesContext(connection) as ctx:
+            reminder_task()
+
+        sql = self.find_query(ctx.captured_queries, r'ORDER BY "core_reminder"\."scheduled_time" ASC')
+        self.assertUsesIndex(sql, 'reminder_due_idx')
+
+    @patch('core.tasks.send_email_task.apply_async')
+    def test_claim_query_count(self, mock_send_email_task):
+        """Test that one claim batch costs a fixed number of queries"""
+        # savepoint, locking select, update, release, fetch claimed rows
+        with self.assertNumQueries(5):
+            reminder_task()
+
+
+class TestApiQueries(QueryPlanTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        now = timezone.now()
+        for i in range(3):
+            reminder = Reminder.objects.create(
+                user=self.user,
+                title=f'Reminder {i}',
+                message='Message',
+                scheduled_time=now - timedelta(days=i),
+                status='sent'
+            )
+            EmailLog.objects.create(
+                reminder=reminder,
+                to_email=self.user.email,
+                subject=reminder.title,
+                body=reminder.message,
+                status='success'
+            )
+        self.client.force_authenticate(user=self.user)
+
+    def test_email_log_list_avoids_seq_scan(self):
+        """Test that listing email logs is served by indexes"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('email_log-list'))
+        self.assertEqual(response.status_code, 200)
+
+        sql = self.find_query(ctx.captured_queries, r'FROM "core_emaillog"')
+        self.assertNoSeqScan(sql, 'core_emaillog')
+        self.assertNoSeqScan(sql, 'core_reminder')
+
+    def test_reminder_list_avoids_seq_scan(self):
+        """Test that listing reminders is served by the per-user index"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('reminder-list'))
+        self.assertEqual(response.status_code, 200)
+
+        sql = self.find_query(ctx.captured_queries, r'FROM "core_reminder"')
+        self.assertNoSeqScan(sql, 'core_reminder')
+
+    def test_reminder_cursor_page_uses_keyset_index(self):
+        """Test that a later keyset page is served by the (user, scheduled_time, id) index"""
+        first = self.client.get(reverse('reminder-list') + '?page_size=1')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(first.data['next'])
+        self.assertEqual(response.status_code, 200)
+
+        sql = self.find_query(ctx.captured_queries, r'FROM "core_reminder"')
+        self.assertUsesIndex(sql, 'reminder_user_sched_id_idx')
+
+    def test_dashboard_avoids_seq_scan(self):
+        """Test that every dashboard query is served by indexes"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+        for query in ctx.captured_queries:
+            if 'FROM "core_reminder"' in query['sql'] or 'FROM "core_emaillog"' in query['sql']:
+                self.assertNoSeqScan(query['sql'], 'core_reminder')
+                self.assertNoSeqScan(query['sql'], 'core_emaillog')
+
+
+class TestCleanOldLogsQueries(QueryPlanTestCase):
+    def test_cleanup_uses_sent_at_index(self):
+        """Test that the retention delete range-scans sent_at"""
+        EmailLog.objects.create(
+            to_email='test@example.com',
+            subject='Old',
+            body='Old',
+            status='success'
+        )
+        EmailLog.objects.update(sent_at=timezone.now() - timedelta(days=31))
+
+        with CaptureQueriesContext(connection) as ctx:
+            clean_old_logs()
+
+        sql = self.find_query(ctx.captured_queries, r'"core_emaillog"\."sent_at" <')
+        self.assertUsesIndex(sql, 'emaillog_sent_at_id_idx')
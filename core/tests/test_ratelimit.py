@@ -0,0 +1,149 @@
+from datetime import timedelta
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from core import ratelimit
+from core.models import EmailLog, Reminder
+from core.tasks import reminder_task, send_email_batch, send_email_task
+
+LIMITS = {'gmail.com': '60/min', '*': '10/s'}
+
+
+@override_settings(EMAIL_DOMAIN_RATE_LIMITS=LIMITS)
+@patch('core.ratelimit.get_client')
+@patch('core.ratelimit._reserve')
+class TestReserve(TestCase):
+    def test_waits_follow_the_rate(self, mock_reserve, mock_get_client):
+        """Test that sends beyond the available tokens are spaced at the domain's rate"""
+        mock_reserve.return_value = '2'
+
+        self.assertEqual(ratelimit.reserve('gmail.com', 4), [0, 0, 1.0, 2.0])
+        self.assertEqual(mock_reserve.call_args.kwargs['keys'], ['ratelimit:domain:gmail.com'])
+        self.assertEqual(mock_reserve.call_args.kwargs['args'], [1.0, 60, 4])
+
+    def test_default_limit_and_unlimited_domains(self, mock_reserve, mock_get_client):
+        """Test that '*' applies to other domains and nothing is reserved without a limit"""
+        mock_reserve.return_value = '0.5'
+        self.assertEqual(ratelimit.reserve_one('someone@Example.COM'), 0.05)
+
+        with override_settings(EMAIL_DOMAIN_RATE_LIMITS={'gmail.com': '60/min'}):
+            self.assertEqual(ratelimit.reserve('example.com', 2), [0, 0])
+        self.assertEqual(mock_reserve.call_count, 1)
+
+
+@override_settings(EMAIL_DOMAIN_RATE_LIMITS=LIMITS)
+class TestRateLimitedSending(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@gmail.com',
+            password='testpassword123'
+        )
+        self.reminder = Reminder.objects.create(
+            user=self.user,
+            title='Test Reminder',
+            message='Test message',
+            scheduled_time=timezone.now() - timedelta(minutes=1),
+            status='queued'
+        )
+
+    @patch('core.tasks.send_mail')
+    @patch('core.tasks.send_email_task.apply_async')
+    @patch('core.ratelimit.reserve', return_value=[12.5])
+    def test_task_reschedules_for_its_slot(self, mock_reserve, mock_apply_async, mock_send_mail):
+        """Test that a rate-limited send is rescheduled with the exact wait instead of failing"""
+        result = send_email_task('test@gmail.com', 'Subject', 'Body', reminder_id=self.reminder.id)
+
+        self.assertIsNone(result)
+        mock_send_mail.assert_not_called()
+        mock_apply_async.assert_called_once_with(
+            args=('test@gmail.com', 'Subject', 'Body'),
+            kwargs={'reminder_id': self.reminder.id, 'rate_reserved': 0},
+            countdown=12.5,
+            retries=0,
+            queue=None
+        )
+        self.assertFalse(EmailLog.objects.exists())
+        self.reminder.refresh_from_db()
+        self.assertEqual((self.reminder.status, self.reminder.retry_count), ('queued', 0))
+        # Kept claimed until the rescheduled send
+        self.assertGreater(self.reminder.updated_at, timezone.now() + timedelta(seconds=10))
+
+    @patch('core.tasks.send_mail')
+    @patch('core.ratelimit.reserve')
+    def test_reserved_slot_is_not_charged_twice(self, mock_reserve, mock_send_mail):
+        """Test that a rescheduled send uses its reserved slot without asking again"""
+        self.assertTrue(send_email_task('test@gmail.com', 'Subject', 'Body', rate_reserved=0))
+        mock_reserve.assert_not_called()
+        mock_send_mail.assert_called_once()
+
+    @patch('core.tasks.get_connection')
+    @patch('core.tasks.send_email_task.apply_async')
+    @patch('core.ratelimit.reserve', side_effect=lambda domain, count: [0] + [1.0] * (count - 1))
+    def test_batch_defers_messages_over_the_limit(self, mock_reserve, mock_apply_async, mock_get_connection):
+        """Test that a batch sends what fits in each domain's bucket and reschedules the rest"""
+        messages = [
+            {'to_email': f'user{i}@gmail.com', 'subject': 'Subject', 'body': 'Body'} for i in range(3)
+        ] + [{'to_email': 'user@example.com', 'subject': 'Subject', 'body': 'Body'}]
+
+        self.assertEqual(send_email_batch(messages), 2)
+
+        self.assertEqual(mock_get_connection.return_value.send_messages.call_count, 2)
+        self.assertEqual(mock_apply_async.call_count, 2)
+        self.assertEqual(mock_apply_async.call_args.kwargs['countdown'], 1.0)
+        self.assertEqual(mock_apply_async.call_args.kwargs['kwargs']['rate_reserved'], 0)
+
+    @override_settings(EMAIL_BATCH_SIZE=100)
+    @patch(
+        'core.tasks.send_email_batch.apply_async',
+        side_effect=lambda args=(), kwargs=None, **options: send_email_batch.apply(args, kwargs)
+    )
+    @patch('core.tasks.get_connection')
+    @patch('core.tasks.send_email_task.apply_async')
+    @patch('core.ratelimit.reserve', return_value=[7200])
+    def test_long_deferral_is_not_reclaimed(self, mock_reserve, mock_apply_async, mock_get_connection,
+                                            mock_batch_apply_async):
+        """Test that a reminder deferred for 2 hours isn't claimed and sent again by reminder_task meanwhile"""
+        Reminder.objects.filter(pk=self.reminder.pk).update(status='pending')
+        now = timezone.now()
+
+        reminder_task()
+        mock_apply_async.assert_called_once()
+        self.assertEqual(mock_apply_async.call_args.kwargs['countdown'], 7200)
+
+        with patch('django.utils.timezone.now', return_value=now + timedelta(hours=1)):
+            reminder_task()
+        mock_apply_async.assert_called_once()
+        mock_get_connection.return_value.send_messages.assert_not_called()
+        self.assertEqual(Reminder.objects.get(pk=self.reminder.pk).status, 'queued')
+
+        # Still reclaimed if the deferred send is lost
+        with patch('django.utils.timezone.now', return_value=now + timedelta(hours=2, minutes=31)):
+            reminder_task()
+        self.assertEqual(mock_apply_async.call_count, 2)
+        self.assertEqual(mock_batch_apply_async.call_count, 2)
+
+
+class TestRateLimitView(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('rate_limits')
+
+    def test_requires_admin(self):
+        """Test that only staff users can see bucket levels"""
+        user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    @patch('core.ratelimit.levels', return_value={'gmail.com': {'tokens': 3.0, 'capacity': 60}})
+    def test_returns_levels(self, mock_levels):
+        """Test that staff users get the current bucket levels"""
+        admin = User.objects.create_user(username='admin', password='testpassword123', is_staff=True)
+        self.client.force_authenticate(user=admin)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['gmail.com']['tokens'], 3.0)
@@ -0,0 +1,128 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from core import scheduler
+from core.models import Reminder
+from core.tasks import dispatch_scheduled_reminders, reminder_task
+
+
+class TestSchedulerQueue(TestCase):
+    @patch('core.scheduler.get_client')
+    def test_pop_due_returns_only_removed_entries(self, mock_get_client):
+        """Test that an entry removed by another dispatcher is not returned"""
+        client = mock_get_client.return_value
+        client.zrangebyscore.return_value = [b'1', b'2']
+        client.pipeline.return_value.execute.return_value = [1, 0]
+
+        self.assertEqual(scheduler.pop_due(timezone.now(), 10), [1])
+
+    @patch('core.scheduler.get_client')
+    def test_schedule_adds_pending_and_removes_others(self, mock_get_client):
+        """Test that pending reminders are scored by scheduled_time and others removed"""
+        when = timezone.now()
+        pipe = mock_get_client.return_value.pipeline.return_value
+        scheduler.schedule([
+            Reminder(id=1, status='pending', scheduled_time=when),
+            Reminder(id=2, status='sent', scheduled_time=when),
+        ])
+
+        pipe.zadd.assert_called_once_with(scheduler.QUEUE_KEY, {'1': when.timestamp()})
+        pipe.zrem.assert_called_once_with(scheduler.QUEUE_KEY, '2')
+
+
+class TestReminderDispatch(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        self.reminder = Reminder.objects.create(
+            user=self.user,
+            title='Due Reminder',
+            message='Due now',
+            scheduled_time=timezone.now() - timedelta(seconds=1),
+            status='pending'
+        )
+
+    @patch('core.tasks.send_email_task.apply_async')
+    @patch('core.scheduler.pop_due')
+    def test_dispatch_sends_popped_reminders(self, mock_pop_due, mock_send_email_task):
+        """Test that popped reminders are claimed and sent"""
+        mock_pop_due.return_value = [self.reminder.id]
+
+        self.assertEqual(dispatch_scheduled_reminders(), 1)
+        mock_send_email_task.assert_called_once_with(
+            args=('test@example.com', 'Reminder: Due Reminder', 'Due now'),
+            kwargs={'reminder_id': self.reminder.id},
+            queue='normal'
+        )
+        self.reminder.refresh_from_db()
+        self.assertEqual(self.reminder.status, 'queued')
+
+    @patch('core.tasks.send_email_task.apply_async')
+    @patch('core.scheduler.pop_due')
+    def test_dispatch_skips_already_claimed(self, mock_pop_due, mock_send_email_task):
+        """Test that a reminder already claimed by the sweep is not sent twice"""
+        Reminder.objects.filter(id=self.reminder.id).update(status='queued', updated_at=timezone.now())
+        mock_pop_due.return_value = [self.reminder.id]
+
+        self.assertEqual(dispatch_scheduled_reminders(), 0)
+        mock_send_email_task.assert_not_called()
+
+    @override_settings(REMINDER_SCHEDULER_ENABLED=True)
+    @patch('core.scheduler.schedule')
+    def test_reminder_scheduled_on_commit(self, mock_schedule):
+        """Test that saving a reminder queues it once the transaction commits"""
+        with self.captureOnCommitCallbacks(execute=True):
+            reminder = Reminder.objects.create(
+                user=self.user,
+                title='Later',
+                message='Later',
+                scheduled_time=timezone.now() + timedelta(minutes=10)
+            )
+        mock_schedule.assert_called_once_with([reminder])
+
+    @override_settings(REMINDER_SCHEDULER_ENABLED=True)
+    @patch('core.tasks.send_email_task.apply_async')
+    @patch('core.scheduler.schedule')
+    def test_sweep_reschedules_upcoming(self, mock_schedule, mock_send_email_task):
+        """Test that the reconciliation sweep re-registers upcoming pending reminders"""
+        upcoming = Reminder.objects.create(
+            user=self.user,
+            title='Soon',
+            message='Soon',
+            scheduled_time=timezone.now() + timedelta(minutes=5)
+        )
+        mock_schedule.reset_mock()
+
+        self.assertEqual(reminder_task(), 1)
+        scheduled = [r.id for call in mock_schedule.call_args_list for r in call.args[0]]
+        self.assertEqual(scheduled, [upcoming.id])
+
+
+@override_settings(REMINDER_SCHEDULER_ENABLED=True, REMINDER_DISPATCHER_IDLE_SECONDS=1.0,
+                   REMINDER_DISPATCHER_MAX_BACKOFF_SECONDS=3)
+class TestDispatcherCommand(TestCase):
+    @patch('core.management.commands.run_reminder_dispatcher.close_old_connections')
+    @patch('core.management.commands.run_reminder_dispatcher.scheduler.next_due', return_value=None)
+    @patch('core.management.commands.run_reminder_dispatcher.dispatch_scheduled_reminders')
+    @patch('core.management.commands.run_reminder_dispatcher.time.sleep')
+    def test_survives_errors_with_backoff(self, mock_sleep, mock_dispatch, mock_next_due, mock_close):
+        """Test that Redis and database errors are logged and retried with capped backoff"""
+        mock_dispatch.side_effect = [ConnectionError('redis down'), OperationalError('db down'),
+                                     ConnectionError('redis down'), 0]
+        # Stop the loop after the first normal idle sleep
+        mock_sleep.side_effect = [None, None, None, KeyboardInterrupt]
+
+        with self.assertRaises(KeyboardInterrupt), self.assertLogs('core.management', 'ERROR') as logs:
+            call_command('run_reminder_dispatcher', stdout=StringIO())
+
+        self.assertEqual([c.args[0] for c in mock_sleep.call_args_list], [2.0, 3, 3, 1.0])
+        self.assertEqual(len(logs.output), 3)
+        self.assertGreaterEqual(mock_close.call_count, 4)
@@ -0,0 +1,114 @@
+from datetime import timedelta
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from core import search
+from core.models import EmailLog, Reminder
+
+
+class SearchTestCase(TestCase):
+    install = True
+
+    def setUp(self):
+        cache.clear()
+        # Migrations install the index, so the fallback tests take it out again
+        self.installed_before = search.is_available(Reminder)
+        if self.install:
+            search.install()
+        else:
+            search.uninstall()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpassword123'
+        )
+        when = timezone.now() + timedelta(days=1)
+        self.dentist = Reminder.objects.create(
+            user=self.user, title='Dentist appointment', message='Bring the insurance card', scheduled_time=when
+        )
+        self.invoice = Reminder.objects.create(
+            user=self.user, title='Pay invoice', message='Ask the dentist about the invoice', scheduled_time=when
+        )
+        Reminder.objects.create(
+            user=self.other_user, title='Dentist', message='Someone else', scheduled_time=when
+        )
+        EmailLog.objects.create(
+            reminder=self.invoice,
+            to_email='test@example.com',
+            subject='Reminder: Pay invoice',
+            body='Your electricity bill is due',
+            status='success'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def search_titles(self, query, url_name='reminder-list'):
+        response = self.client.get(reverse(url_name), {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [item.get('title') or item.get('subject') for item in response.data['results']]
+
+
+class TestFullTextSearch(SearchTestCase):
+    def test_results_are_ranked(self):
+        """Test that a title match ranks above a message match, and other users' reminders are excluded"""
+        self.assertTrue(search.is_available(Reminder))
+        self.assertEqual(self.search_titles('dentist'), ['Dentist appointment', 'Pay invoice'])
+
+    def test_all_terms_must_match(self):
+        """Test that every search term has to match"""
+        self.assertEqual(self.search_titles('dentist insurance'), ['Dentist appointment'])
+        self.assertEqual(self.search_titles('"unbalanced'), [])
+
+    def test_index_follows_writes(self):
+        """Test that updates and deletes are reflected in search results"""
+        self.dentist.title = 'Optician appointment'
+        self.dentist.save()
+        self.invoice.delete()
+
+        self.assertEqual(self.search_titles('optician'), ['Optician appointment'])
+        self.assertEqual(self.search_titles('dentist'), [])
+
+    def test_email_log_body_search(self):
+        """Test that email logs are searchable by body text"""
+        self.assertEqual(self.search_titles('electricity', 'email_log-list'), ['Reminder: Pay invoice'])
+
+    def test_ranked_results_paginate(self):
+        """Test that keyset pagination follows the rank order"""
+        first = self.client.get(reverse('reminder-list'), {'search': 'dentist', 'page_size': 1})
+        second = self.client.get(first.data['next'])
+
+        self.assertEqual(first.data['results'][0]['title'], 'Dentist appointment')
+        self.assertEqual(second.data['results'][0]['title'], 'Pay invoice')
+        self.assertIsNone(second.data['next'])
+
+    def test_admin_uses_full_text_search(self):
+        """Test that admin search uses the index and matches usernames exactly"""
+        request = RequestFactory().get('/admin/core/reminder/')
+        model_admin = site._registry[Reminder]
+
+        results, _ = model_admin.get_search_results(request, Reminder.objects.all(), 'insurance')
+        self.assertEqual(list(results), [self.dentist])
+        results, _ = model_admin.get_search_results(request, Reminder.objects.all(), 'otheruser')
+        self.assertEqual([r.user for r in results], [self.other_user])
+
+
+class TestSearchFallback(SearchTestCase):
+    install = False
+
+    def tearDown(self):
+        if self.installed_before:
+            search.install()
+
+    def test_substring_search_without_index(self):
+        """Test that ?search= falls back to substring matching when the index isn't installed"""
+        self.assertFalse(search.is_available(Reminder))
+        self.assertEqual(sorted(self.search_titles('dentis')), ['Dentist appointment', 'Pay invoice'])
@@ -1,12 +1,18 @@
 import pytest
+from unittest import skipUnless
 from unittest.mock import patch, Mock, call
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.core import mail
 from django.utils import timezone
 from django.contrib.auth.models import User
-from datetime import timedelta
-from core.models import Reminder, EmailLog, UserProfile
-from core.tasks import send_email_task, birthday_task, reminder_task, clean_old_logs
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from core.models import Reminder, EmailLog, MessageBody, MessageBodyManager, UserProfile
+from core.tasks import send_email_task, send_email_batch, birthday_task, reminder_task, clean_old_logs, dispatch_emails
+from core import partitions
 from celery.exceptions import Retry
+from notimailer.celery import app as celery_app
 
 class TestSendEmailTask(TestCase):
     def setUp(self):
@@ -58,6 +64,15 @@ class TestSendEmailTask(TestCase):
         self.reminder.refresh_from_db()
         self.assertEqual(self.reminder.status, 'sent')
 
+    @patch('core.tasks.send_mail')
+    def test_send_email_task_query_count(self, mock_send_mail):
+        """Test that recording a delivery attempt never fetches the reminder or its owner"""
+        send_email_task('recipient@example.com', 'Test Subject', 'Test Body', reminder_id=self.reminder.id)
+
+        # savepoint, reminder update returning the owner, body lookup, log insert, release
+        with self.assertNumQueries(5):
+            send_email_task('recipient@example.com', 'Test Subject', 'Test Body', reminder_id=self.reminder.id)
+
     @patch('core.tasks.send_mail')
     @patch('core.tasks.send_email_task.retry')
     def test_send_email_task_failure_and_retry(self, mock_retry, mock_send_mail):
@@ -93,10 +108,10 @@ class TestSendEmailTask(TestCase):
         # Check that retry was called with exponential backoff
         mock_retry.assert_called_once_with(exc=exception, countdown=60)
         
-        # Check that the reminder was updated
+        # Check that the reminder was updated and stays claimed for the retry
         self.reminder.refresh_from_db()
         self.assertEqual(self.reminder.retry_count, 1)
-        self.assertEqual(self.reminder.status, 'pending')
+        self.assertEqual(self.reminder.status, 'queued')
 
     @patch('core.tasks.send_mail')
     @patch('core.tasks.send_email_task.retry')
@@ -132,6 +147,87 @@ class TestSendEmailTask(TestCase):
         self.assertEqual(self.reminder.retry_count, 1)
 
 
+class TestSendEmailBatch(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        self.reminder = Reminder.objects.create(
+            user=self.user,
+            title='Test Reminder',
+            message='This is a test reminder',
+            scheduled_time=timezone.now(),
+            status='pending'
+        )
+        self.messages = [
+            {'to_email': 'one@example.com', 'subject': 'One', 'body': 'Body one', 'reminder_id': self.reminder.id},
+            {'to_email': 'two@example.com', 'subject': 'Two', 'body': 'Body two'},
+        ]
+
+    def test_send_email_batch_uses_one_connection(self):
+        """Test that a batch is sent over a single connection and logged per message"""
+        with patch('core.tasks.get_connection', wraps=mail.get_connection) as mock_get_connection:
+            result = send_email_batch(self.messages)
+
+        self.assertEqual(result, 2)
+        mock_get_connection.assert_called_once()
+        self.assertEqual([m.to for m in mail.outbox], [['one@example.com'], ['two@example.com']])
+        self.assertEqual(EmailLog.objects.filter(status='success').count(), 2)
+        self.assertEqual(EmailLog.objects.get(to_email='one@example.com').reminder, self.reminder)
+
+        self.reminder.refresh_from_db()
+        self.assertEqual(self.reminder.status, 'sent')
+
+    @patch('core.tasks.send_email_task.apply_async')
+    def test_send_email_batch_records_failures(self, mock_apply_async):
+        """Test that failed messages are logged and handed to send_email_task"""
+        connection = mail.get_connection()
+        original_send = connection.send_messages
+
+        def send_messages(emails):
+            if emails[0].to == ['one@example.com']:
+                raise Exception('Mailbox unavailable')
+            return original_send(emails)
+
+        connection.send_messages = send_messages
+        with patch('core.tasks.get_connection', return_value=connection):
+            result = send_email_batch(self.messages)
+
+        self.assertEqual(result, 1)
+        failed_log = EmailLog.objects.get(to_email='one@example.com')
+        self.assertEqual(failed_log.status, 'failed')
+        self.assertEqual(failed_log.error_message, 'Mailbox unavailable')
+        self.assertEqual(EmailLog.objects.get(to_email='two@example.com').status, 'success')
+
+        self.reminder.refresh_from_db()
+        self.assertEqual(self.reminder.retry_count, 1)
+        mock_apply_async.assert_called_once_with(
+            args=('one@example.com', 'One', 'Body one'),
+            kwargs={'reminder_id': self.reminder.id},
+            countdown=60,
+            retries=1,
+            queue='normal'
+        )
+
+    @patch('core.tasks.send_mail', side_effect=Exception('Mailbox unavailable'))
+    @patch('core.tasks.get_connection')
+    def test_batch_failure_counts_toward_max_retries(self, mock_get_connection, mock_send_mail):
+        """Test that a message failing in a batch gets 3 retries in total, then the reminder fails"""
+        mock_get_connection.return_value.send_messages.side_effect = Exception('Mailbox unavailable')
+        with patch('core.tasks.send_email_task.apply_async') as mock_apply_async:
+            send_email_batch(self.messages[:1])
+        retry = mock_apply_async.call_args.kwargs
+
+        send_email_task.apply(args=retry['args'], kwargs=retry['kwargs'], retries=retry['retries'])
+
+        self.assertEqual(mock_send_mail.call_count, 3)
+        self.reminder.refresh_from_db()
+        self.assertEqual((self.reminder.status, self.reminder.retry_count), ('failed', 4))
+        self.assertEqual(EmailLog.objects.filter(status='failed').count(), 4)
+
+
 class TestBirthdayTask(TestCase):
     def setUp(self):
         # Create users with various birthdates
@@ -172,7 +268,7 @@ class TestBirthdayTask(TestCase):
             birthdate=(today - timedelta(days=1)).replace(year=today.year - 40)
         )
 
-    @patch('core.tasks.send_email_task.delay')
+    @patch('core.tasks.send_email_task.apply_async')
     def test_birthday_task(self, mock_send_email_task):
         """Test that birthday task sends emails to users with birthdays today"""
         # Run the task
@@ -183,10 +279,59 @@ class TestBirthdayTask(TestCase):
         
         # Check that send_email_task was called once for the birthday user
         mock_send_email_task.assert_called_once()
-        args, kwargs = mock_send_email_task.call_args
-        self.assertEqual(kwargs['to_email'], 'birthday@example.com')
-        self.assertEqual(kwargs['subject'], 'Happy Birthday!')
-        self.assertIn('Birthday', kwargs['body'])
+        to_email, subject, body = mock_send_email_task.call_args.kwargs['args']
+        self.assertEqual(to_email, 'birthday@example.com')
+        self.assertEqual(subject, 'Happy Birthday!')
+        self.assertIn('Birthday', body)
+
+
+class TestBirthdayTaskLookup(TestCase):
+    def create_user(self, username, birthdate):
+        user = User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='testpassword123',
+            first_name=username.title()
+        )
+        user.profile.birthdate = birthdate
+        user.profile.save()
+        return user
+
+    @patch('core.tasks.send_email_task.apply_async')
+    @patch('core.tasks.timezone.localdate', return_value=date(2025, 7, 16))
+    def test_birthday_task_uses_birthday_key(self, mock_localdate, mock_send_email_task):
+        """Test that birthday task matches month and day through birthday_key"""
+        self.create_user('birthday', date(1990, 7, 16))
+        self.create_user('tomorrow', date(1990, 7, 17))
+
+        self.assertEqual(birthday_task(), 1)
+        args = mock_send_email_task.call_args.kwargs['args']
+        self.assertEqual(args[0], 'birthday@example.com')
+        self.assertEqual(args[1], 'Happy Birthday!')
+        self.assertIn('Birthday', args[2])
+
+    @patch('core.tasks.send_email_task.apply_async')
+    @patch('core.tasks.timezone.localdate', return_value=date(2025, 2, 28))
+    def test_birthday_task_leap_day_in_non_leap_year(self, mock_localdate, mock_send_email_task):
+        """Test that Feb 29 birthdays are sent on Feb 28 in non-leap years"""
+        self.create_user('leapling', date(2000, 2, 29))
+        self.create_user('february', date(1995, 2, 28))
+
+        self.assertEqual(birthday_task(), 2)
+        recipients = sorted(c.kwargs['args'][0] for c in mock_send_email_task.call_args_list)
+        self.assertEqual(recipients, ['february@example.com', 'leapling@example.com'])
+
+    @override_settings(BIRTHDAY_CHUNK_SIZE=1, EMAIL_BATCH_SIZE=2)
+    @patch('core.tasks.send_email_batch.apply_async')
+    @patch('core.tasks.timezone.localdate', return_value=date(2025, 7, 16))
+    def test_birthday_task_streams_in_chunks(self, mock_localdate, mock_send_email_batch):
+        """Test that birthday emails are dispatched in chunks"""
+        for i in range(3):
+            self.create_user(f'user{i}', date(1980 + i, 7, 16))
+
+        self.assertEqual(birthday_task(), 3)
+        chunk_sizes = [len(c.args[0][0]) for c in mock_send_email_batch.call_args_list]
+        self.assertEqual(chunk_sizes, [2, 1])
 
 
 class TestReminderTask(TestCase):
@@ -236,7 +381,7 @@ class TestReminderTask(TestCase):
             status='failed'
         )
 
-    @patch('core.tasks.send_email_task.delay')
+    @patch('core.tasks.send_email_task.apply_async')
     def test_reminder_task(self, mock_send_email_task):
         """Test that reminder task processes due reminders"""
         # Run the task
@@ -247,10 +392,9 @@ class TestReminderTask(TestCase):
         
         # Check that send_email_task was called once for the due reminder
         mock_send_email_task.assert_called_once_with(
-            'test@example.com',
-            'Reminder: Due Reminder',
-            'This reminder is due now',
-            reminder_id=self.due_reminder.id
+            args=('test@example.com', 'Reminder: Due Reminder', 'This reminder is due now'),
+            kwargs={'reminder_id': self.due_reminder.id},
+            queue='normal'
         )
         
         # Verify that other reminders were not processed
@@ -262,6 +406,67 @@ class TestReminderTask(TestCase):
         self.assertEqual(self.sent_reminder.status, 'sent')
         self.assertEqual(self.failed_reminder.status, 'failed')
 
+    @patch('core.tasks.send_email_task.apply_async')
+    def test_reminder_task_claims_due_reminders(self, mock_send_email_task):
+        """Test that a claimed reminder is not enqueued again by the next run"""
+        self.assertEqual(reminder_task(), 1)
+        self.due_reminder.refresh_from_db()
+        self.assertEqual(self.due_reminder.status, 'queued')
+
+        self.assertEqual(reminder_task(), 0)
+        mock_send_email_task.assert_called_once()
+
+    @override_settings(REMINDER_CLAIM_BATCH_SIZE=1)
+    @patch('core.tasks.send_email_task.apply_async')
+    def test_reminder_task_claims_in_batches(self, mock_send_email_task):
+        """Test that all due reminders are claimed when they span several batches"""
+        Reminder.objects.create(
+            user=self.user,
+            title='Second Due Reminder',
+            message='Also due',
+            scheduled_time=timezone.now() - timedelta(minutes=1),
+            status='pending'
+        )
+
+        self.assertEqual(reminder_task(), 2)
+        self.assertEqual(mock_send_email_task.call_count, 2)
+
+    @patch('core.tasks.send_email_task.apply_async')
+    def test_reminder_task_reclaims_stale_queued(self, mock_send_email_task):
+        """Test that reminders left queued past the timeout are claimed again"""
+        stale = timezone.now() - timedelta(hours=1)
+        Reminder.objects.filter(id=self.due_reminder.id).update(status='queued', updated_at=stale)
+
+        self.assertEqual(reminder_task(), 1)
+        mock_send_email_task.assert_called_once()
+
+    @override_settings(EMAIL_BATCH_SIZE=2)
+    @patch('core.tasks.send_email_batch.apply_async')
+    def test_reminder_task_batches_fan_out(self, mock_send_email_batch):
+        """Test that due reminders are routed through send_email_batch in chunks"""
+        for i in range(2):
+            Reminder.objects.create(
+                user=self.user,
+                title=f'Extra Reminder {i}',
+                message='Extra',
+                scheduled_time=timezone.now() - timedelta(minutes=1),
+                status='pending'
+            )
+
+        result = reminder_task()
+
+        self.assertEqual(result, 3)
+        chunk_sizes = [len(c.args[0][0]) for c in mock_send_email_batch.call_args_list]
+        self.assertEqual(chunk_sizes, [2, 1])
+
+    @override_settings(EMAIL_ENGINE='async', EMAIL_BATCH_SIZE=0)
+    @patch('core.tasks.send_email_batch_async.apply_async')
+    def test_reminder_task_uses_async_engine(self, mock_send_email_batch_async):
+        """Test that the async engine receives due reminders as one batch"""
+        self.assertEqual(reminder_task(), 1)
+        mock_send_email_batch_async.assert_called_once()
+        self.assertEqual(len(mock_send_email_batch_async.call_args.args[0][0]), 1)
+
 
 class TestCleanOldLogs(TestCase):
     def setUp(self):
@@ -318,4 +523,172 @@ class TestCleanOldLogs(TestCase):
         # Verify that only recent logs remain
         self.assertEqual(EmailLog.objects.count(), 3)
         for log in EmailLog.objects.all():
-            self.assertEqual(log.subject.startswith('Recent'), True)
\ No newline at end of file
+            self.assertEqual(log.subject.startswith('Recent'), True)
+
+    @override_settings(EMAIL_LOG_DELETE_CHUNK_SIZE=2)
+    def test_clean_old_logs_deletes_in_chunks(self):
+        """Test that old logs are deleted in primary-key chunks, keeping recent ones"""
+        old_date = timezone.now() - timedelta(days=31)
+        EmailLog.objects.filter(subject__startswith='Old').update(sent_at=old_date)
+
+        with CaptureQueriesContext(connection) as ctx:
+            result = clean_old_logs()
+
+        self.assertEqual(result, 5)
+        self.assertEqual(EmailLog.objects.count(), 3)
+        # five consecutive ids in chunks of two
+        deletes = [q for q in ctx.captured_queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 3)
+
+    @patch('core.partitions.drop_partitions_before', return_value=1000)
+    @patch('core.partitions.is_partitioned', return_value=True)
+    def test_clean_old_logs_excludes_partition_estimate(self, mock_is_partitioned, mock_drop):
+        """Test that the estimated rows of dropped partitions aren't added to the exact deleted count"""
+        EmailLog.objects.filter(subject__startswith='Old').update(sent_at=timezone.now() - timedelta(days=31))
+
+        with self.assertLogs('core.tasks', level='INFO') as logs:
+            self.assertEqual(clean_old_logs(), 5)
+
+        mock_drop.assert_called_once()
+        self.assertIn('an estimated 1000 rows', '\n'.join(logs.output))
+
+    @override_settings(EMAIL_LOG_DELETE_TIME_LIMIT=0)
+    def test_clean_old_logs_respects_time_limit(self):
+        """Test that cleanup stops when its time budget is used up"""
+        EmailLog.objects.filter(subject__startswith='Old').update(sent_at=timezone.now() - timedelta(days=31))
+
+        self.assertEqual(clean_old_logs(), 0)
+        self.assertEqual(EmailLog.objects.count(), 8)
+
+    @override_settings(EMAIL_LOG_DELETE_CHUNK_SIZE=2)
+    def test_clean_old_logs_sweeps_unused_bodies(self):
+        """Test that bodies without logs are deleted only once unused for the retention period"""
+        old_date = timezone.now() - timedelta(days=31)
+        EmailLog.objects.filter(subject__startswith='Old').update(sent_at=old_date)
+        MessageBody.objects.update(last_used=old_date)
+        MessageBody.objects.intern('This is an old log 0')
+
+        clean_old_logs()
+
+        # Bodies of recent logs and the one just handed out again are kept
+        self.assertEqual(
+            set(MessageBody.objects.values_list('text', flat=True)),
+            {'This is an old log 0', 'This is a recent log 0', 'This is a recent log 1', 'This is a recent log 2'}
+        )
+
+    def test_intern_restores_swept_body(self):
+        """Test that a body deleted between intern()'s read and its touch is stored again"""
+        text = 'This is a recent log 0'
+        body = MessageBody.objects.get(text=text)
+        EmailLog.objects.filter(message_body=body).delete()
+        MessageBody.objects.filter(pk=body.pk).update(last_used=timezone.now() - timedelta(days=31))
+        touch = MessageBodyManager.touch
+
+        def swept_before_touch(manager, bodies):
+            MessageBody.objects.filter(pk=body.pk).delete()
+            return touch(manager, bodies)
+
+        with patch.object(MessageBodyManager, 'touch', autospec=True, side_effect=swept_before_touch):
+            restored = MessageBody.objects.intern(text)
+
+        self.assertNotEqual(restored.pk, body.pk)
+        self.assertEqual(MessageBody.objects.get(pk=restored.pk).content, text)
+
+
+class TestEmailLogPartitions(TestCase):
+    def test_monthly_periods(self):
+        """Test monthly partition bounds and names"""
+        moment = datetime(2025, 12, 15, 10, 30, tzinfo=dt_timezone.utc)
+        start = partitions.period_start(moment, 'month')
+        self.assertEqual(start, datetime(2025, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partitions.next_period(start, 'month'), datetime(2026, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partitions.partition_name(start, 'month'), 'core_emaillog_p202512')
+
+    def test_daily_periods(self):
+        """Test daily partition bounds and names"""
+        moment = datetime(2024, 2, 28, 23, 59, tzinfo=dt_timezone.utc)
+        start = partitions.period_start(moment, 'day')
+        self.assertEqual(partitions.next_period(start, 'day'), datetime(2024, 2, 29, tzinfo=dt_timezone.utc))
+        self.assertEqual(partitions.partition_name(start, 'day'), 'core_emaillog_p20240228')
+
+    def test_unpartitioned_backend(self):
+        """Test that a migrated table is not reported as partitioned"""
+        self.assertFalse(partitions.is_partitioned())
+        if connection.vendor != 'postgresql':
+            with self.assertRaises(RuntimeError):
+                partitions.convert_to_partitioned()
+
+    def create_log(self, sent_at):
+        log = EmailLog.objects.create(to_email='test@example.com', subject='Subject', body='Body', status='success')
+        EmailLog.objects.filter(pk=log.pk).update(sent_at=sent_at)
+        return log
+
+    @skipUnless(connection.vendor == 'postgresql', 'EmailLog partitioning requires PostgreSQL')
+    def test_convert_create_and_drop_partitions(self):
+        """Test converting a table with rows, creating partitions ahead and dropping an expired one"""
+        # Deferred foreign key checks left pending by the inserts would block ALTER TABLE inside the test transaction
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        now = timezone.now()
+        legacy_logs = [self.create_log(now - timedelta(days=days)) for days in (400, 40, 1)]
+        legacy_max = max(log.pk for log in legacy_logs)
+
+        partitions.convert_to_partitioned()
+        self.assertTrue(partitions.is_partitioned())
+        # Existing rows stay in the legacy table, now the partition up to the end of this period
+        boundary = partitions.next_period(partitions.period_start(now))
+        self.assertEqual(
+            [(name, upper) for name, _, upper in partitions.list_partitions()],
+            [(partitions.LEGACY_TABLE, boundary)]
+        )
+        self.assertEqual(EmailLog.objects.count(), 3)
+
+        # Ids keep increasing past the legacy max
+        first = self.create_log(now)
+        second = self.create_log(now)
+        self.assertGreater(first.pk, legacy_max)
+        self.assertGreater(second.pk, first.pk)
+
+        # The current period is covered by the legacy partition, so only upcoming ones are created
+        created = partitions.create_partitions(ahead=2)
+        following = partitions.next_period(boundary)
+        self.assertEqual(created, [partitions.partition_name(boundary), partitions.partition_name(following)])
+        self.assertEqual(partitions.create_partitions(ahead=2), [])
+        upcoming = self.create_log(boundary + timedelta(hours=1))
+
+        # Everything in the legacy partition has expired once its upper bound is passed
+        partitions.drop_partitions_before(boundary)
+        self.assertEqual(
+            [name for name, _, _ in partitions.list_partitions()],
+            created
+        )
+        self.assertEqual(list(EmailLog.objects.values_list('pk', flat=True)), [upcoming.pk])
+        self.assertGreater(upcoming.pk, second.pk)
+
+
+class TestQueueRouting(TestCase):
+    def setUp(self):
+        self.messages = [{'to_email': 'test@example.com', 'subject': 'Subject', 'body': 'Body'}]
+
+    @patch('core.tasks.send_email_task.apply_async')
+    def test_call_site_routes(self, mock_apply_async):
+        """Test that emails go to the queue configured for their call site"""
+        dispatch_emails(iter(self.messages), call_site='birthday')
+        self.assertEqual(mock_apply_async.call_args.kwargs['queue'], 'bulk')
+
+        with override_settings(EMAIL_QUEUE_ROUTES={'birthday': 'normal'}):
+            dispatch_emails(iter(self.messages), call_site='birthday')
+        self.assertEqual(mock_apply_async.call_args.kwargs['queue'], 'normal')
+
+    @override_settings(EMAIL_BATCH_SIZE=10)
+    @patch('core.tasks.send_email_batch.apply_async')
+    def test_batches_follow_call_site(self, mock_apply_async):
+        """Test that batches are sent to the call site's queue"""
+        dispatch_emails(iter(self.messages), call_site='reminder')
+        mock_apply_async.assert_called_once_with((self.messages,), queue='normal')
+
+    def test_task_routes(self):
+        """Test that tasks without a call-site queue follow CELERY_TASK_ROUTES"""
+        router = celery_app.amqp.router
+        self.assertEqual(router.route({}, 'core.tasks.send_email_batch')['queue'].name, 'bulk')
+        self.assertEqual(router.route({}, 'core.tasks.reminder_task')['queue'].name, 'normal')
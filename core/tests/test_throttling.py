@@ -0,0 +1,62 @@
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from core import throttling
+from core.views import EmailRateThrottle
+
+
+@patch('core.tasks.send_email_task.apply_async')
+class TestSlidingWindowRateThrottle(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('send_email')
+        self.data = {'to_email': 'recipient@example.com', 'subject': 'Subject', 'body': 'Body'}
+
+    @patch('core.throttling._script')
+    @patch('core.throttling.get_client')
+    def test_allowed_request_is_counted_in_redis(self, mock_get_client, mock_script, mock_apply_async):
+        """Test that the check and increment run as one script call on the user's window key"""
+        mock_script.return_value = [1, b'99']
+
+        response = self.client.post(self.url, self.data, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        mock_script.assert_called_once_with(
+            keys=[f'throttle:window:throttle_emails_{self.user.pk}'],
+            args=[100, 86400],
+            client=mock_get_client.return_value
+        )
+
+    @patch('core.throttling._script', return_value=[0, b'12.5'])
+    @patch('core.throttling.get_client')
+    def test_rejected_request_reports_wait(self, mock_get_client, mock_script, mock_apply_async):
+        """Test that a request over the limit gets a 429 with the script's wait as Retry-After"""
+        response = self.client.post(self.url, self.data, format='json')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '13')
+        mock_apply_async.assert_not_called()
+
+    @patch('core.throttling._script', side_effect=ConnectionError('down'))
+    @patch('core.throttling.get_client')
+    def test_redis_error_allows_request(self, mock_get_client, mock_script, mock_apply_async):
+        """Test that requests are allowed when the Redis script fails"""
+        response = self.client.post(self.url, self.data, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    @patch.object(EmailRateThrottle, 'THROTTLE_RATES', {'emails': '1/day'})
+    def test_falls_back_to_cache_without_redis(self, mock_apply_async):
+        """Test that the cache-based throttle is used when the cache isn't backed by Redis"""
+        self.assertIsNone(throttling.get_client())
+        self.assertEqual(self.client.post(self.url, self.data, format='json').status_code, 200)
+        self.assertEqual(self.client.post(self.url, self.data, format='json').status_code, 429)
@@ -1,14 +1,21 @@
 import pytest
-from django.test import TestCase
+from django.conf import settings
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from core.models import Reminder, EmailLog, UserProfile
+from core.serializers import EmailLogListSerializer, EmailLogSerializer, ReminderListSerializer, ReminderSerializer
 from django.utils import timezone
 from datetime import timedelta
+import gzip
 import json
 from unittest.mock import patch
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 class TestJWTAuthentication(TestCase):
     def setUp(self):
@@ -100,8 +107,8 @@ class TestReminderViewSet(TestCase):
         """Test that only the user's reminders are returned"""
         response = self.client.get(self.reminder_list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['title'], 'User Reminder 1')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['title'], 'User Reminder 1')
     
     def test_create_reminder(self):
         """Test creating a new reminder"""
@@ -222,6 +229,75 @@ class TestDashboardView(TestCase):
         self.assertEqual(len(response.data['recent_logs']), 3)
 
 
+class TestDashboardCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        now = timezone.now()
+        for status_value in ['pending', 'queued', 'sent', 'failed']:
+            Reminder.objects.create(
+                user=self.user,
+                title=f'{status_value} reminder',
+                message='Message',
+                scheduled_time=now + timedelta(days=1),
+                status=status_value
+            )
+        self.client.force_authenticate(user=self.user)
+        self.dashboard_url = reverse('dashboard')
+
+    def test_dashboard_counts_in_one_query(self):
+        """Test that the dashboard counts come from a single aggregate query"""
+        # counts, upcoming reminders (with users), recent logs
+        with self.assertNumQueries(3):
+            response = self.client.get(self.dashboard_url)
+
+        self.assertEqual(response.data['total_reminders'], 4)
+        self.assertEqual(response.data['pending_reminders'], 2)
+        self.assertEqual(response.data['sent_reminders'], 1)
+        self.assertEqual(response.data['failed_reminders'], 1)
+        self.assertEqual(response.data['upcoming_reminders'][0]['user_email'], 'test@example.com')
+
+    def test_dashboard_served_from_cache(self):
+        """Test that a repeat load doesn't touch the database"""
+        first = self.client.get(self.dashboard_url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.dashboard_url)
+        self.assertEqual(first.data, second.data)
+
+    def test_dashboard_invalidated_on_reminder_change(self):
+        """Test that saving or deleting a reminder refreshes the dashboard"""
+        self.client.get(self.dashboard_url)
+
+        reminder = Reminder.objects.create(
+            user=self.user,
+            title='New reminder',
+            message='Message',
+            scheduled_time=timezone.now() + timedelta(days=2)
+        )
+        self.assertEqual(self.client.get(self.dashboard_url).data['total_reminders'], 5)
+
+        reminder.delete()
+        self.assertEqual(self.client.get(self.dashboard_url).data['total_reminders'], 4)
+
+    def test_dashboard_invalidated_on_email_log(self):
+        """Test that a new email log refreshes the dashboard"""
+        self.client.get(self.dashboard_url)
+
+        EmailLog.objects.create(
+            reminder=Reminder.objects.filter(status='sent').first(),
+            to_email=self.user.email,
+            subject='Sent',
+            body='Sent',
+            status='success'
+        )
+        self.assertEqual(len(self.client.get(self.dashboard_url).data['recent_logs']), 1)
+
+
 class TestSendEmailView(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -236,7 +312,7 @@ class TestSendEmailView(TestCase):
         self.client.force_authenticate(user=self.user)
         self.send_email_url = reverse('send_email')
 
-    @patch('core.tasks.send_email_task.delay')
+    @patch('core.tasks.send_email_task.apply_async')
     def test_send_email_view(self, mock_send_email_task):
         """Test sending an email via the API"""
         data = {
@@ -255,10 +331,9 @@ class TestSendEmailView(TestCase):
         
         # Check that the task was called
         mock_send_email_task.assert_called_once_with(
-            'recipient@example.com', 
-            'Test Email', 
-            'This is a test email.',
-            reminder_id=reminder.id
+            args=('recipient@example.com', 'Test Email', 'This is a test email.'),
+            kwargs={'reminder_id': reminder.id},
+            queue='high'
         )
 
     def test_send_email_validation(self):
@@ -269,4 +344,347 @@ class TestSendEmailView(TestCase):
             'body': 'This is a test email.'
         }
         response = self.client.post(self.send_email_url, data, format='json')
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'PAGE_SIZE': 2})
+class TestKeysetPagination(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        # Two reminders share a scheduled_time, so the id tie breaker matters
+        when = timezone.now() - timedelta(days=1)
+        self.reminders = [
+            Reminder.objects.create(
+                user=self.user,
+                title=f'Reminder {i}',
+                message='Message',
+                scheduled_time=when - timedelta(hours=min(i, 2)),
+                status='sent'
+            )
+            for i in range(5)
+        ]
+        for reminder in self.reminders:
+            EmailLog.objects.create(
+                reminder=reminder,
+                to_email=self.user.email,
+                subject=reminder.title,
+                body=reminder.message,
+                status='success'
+            )
+        self.client.force_authenticate(user=self.user)
+
+    def collect(self, url):
+        titles, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            titles += [item.get('title') or item.get('subject') for item in response.data['results']]
+            url = response.data['next']
+            pages += 1
+        return titles, pages
+
+    def test_reminder_pages_follow_keyset_order(self):
+        """Test that following next links returns every reminder once, newest first"""
+        titles, pages = self.collect(reverse('reminder-list'))
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(titles, ['Reminder 0', 'Reminder 1', 'Reminder 4', 'Reminder 3', 'Reminder 2'])
+
+    def test_ascending_ordering(self):
+        """Test that the keyset follows ?ordering= in both directions"""
+        titles, _ = self.collect(reverse('reminder-list') + '?ordering=scheduled_time')
+
+        self.assertEqual(titles, ['Reminder 2', 'Reminder 3', 'Reminder 4', 'Reminder 1', 'Reminder 0'])
+
+    def test_sent_action_and_email_logs_are_paginated(self):
+        """Test that the sent action and the email log list are paginated too"""
+        titles, pages = self.collect(reverse('reminder-sent'))
+        self.assertEqual((len(titles), pages), (5, 3))
+
+        subjects, pages = self.collect(reverse('email_log-list'))
+        self.assertEqual(sorted(subjects), sorted(r.title for r in self.reminders))
+        self.assertEqual(pages, 3)
+
+    def test_count_is_opt_in(self):
+        """Test that the total is only computed when requested"""
+        response = self.client.get(reverse('reminder-list'))
+        self.assertNotIn('count', response.data)
+
+        response = self.client.get(reverse('reminder-list') + '?count=estimate')
+        self.assertEqual(response.data['count'], 5)
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        response = self.client.get(reverse('reminder-list') + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestBulkReminders(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpassword123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('reminder-bulk')
+        self.when = (timezone.now() + timedelta(days=1)).isoformat()
+
+    def items(self, count):
+        return [{'title': f'Reminder {i}', 'message': 'Message', 'scheduled_time': self.when} for i in range(count)]
+
+    @override_settings(REMINDER_BULK_BATCH_SIZE=2)
+    def test_bulk_create(self):
+        """Test that a list of reminders is created with batched INSERTs"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, self.items(5), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 5)
+        self.assertTrue(all(item['id'] for item in response.data))
+        self.assertEqual(Reminder.objects.filter(user=self.user, status='pending').count(), 5)
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "core_reminder"')]
+        self.assertEqual(len(inserts), 3)
+
+    def test_bulk_create_reports_errors_per_item(self):
+        """Test that one invalid item rejects the request with an error at its position"""
+        items = self.items(3)
+        del items[1]['scheduled_time']
+
+        response = self.client.post(self.url, items, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.data['errors']), [1])
+        self.assertIn('scheduled_time', response.data['errors'][1])
+        self.assertFalse(Reminder.objects.exists())
+
+    @override_settings(REMINDER_SCHEDULER_ENABLED=True)
+    @patch('core.scheduler.schedule')
+    def test_bulk_create_schedules_in_one_call(self, mock_schedule):
+        """Test that created reminders are registered with the scheduler in one call"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, self.items(3), format='json')
+
+        mock_schedule.assert_called_once()
+        self.assertEqual(len(mock_schedule.call_args.args[0]), 3)
+
+    def test_bulk_update(self):
+        """Test that reminders are updated in place and other users' reminders are not found"""
+        mine = Reminder.objects.create(user=self.user, title='Old', message='Message', scheduled_time=timezone.now())
+        theirs = Reminder.objects.create(user=self.other_user, title='Theirs', message='Message', scheduled_time=timezone.now())
+
+        response = self.client.patch(self.url, [{'id': mine.id, 'title': 'New'}, {'id': theirs.id, 'title': 'Mine'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'], {1: {'id': ['Not found.']}})
+
+        response = self.client.patch(self.url, [{'id': mine.id, 'title': 'New'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mine.refresh_from_db()
+        theirs.refresh_from_db()
+        self.assertEqual((mine.title, theirs.title), ('New', 'Theirs'))
+
+    def test_bulk_delete(self):
+        """Test that the user's reminders and their logs are deleted and unknown ids reported"""
+        mine = Reminder.objects.create(user=self.user, title='Mine', message='Message', scheduled_time=timezone.now())
+        theirs = Reminder.objects.create(user=self.other_user, title='Theirs', message='Message', scheduled_time=timezone.now())
+        EmailLog.objects.create(reminder=mine, to_email='test@example.com', subject='Mine', body='Message', status='success')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(self.url, {'ids': [mine.id, theirs.id]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'deleted': 1, 'not_found': [theirs.id]})
+        self.assertFalse(Reminder.objects.filter(id=mine.id).exists())
+        self.assertFalse(EmailLog.objects.exists())
+        self.assertTrue(Reminder.objects.filter(id=theirs.id).exists())
+
+    def test_bulk_delete_rejects_non_integer_ids(self):
+        """Test that booleans and strings are reported per item instead of deleting reminders 1 and 0"""
+        reminder = Reminder.objects.create(user=self.user, title='Mine', message='Message', scheduled_time=timezone.now())
+
+        response = self.client.delete(self.url, {'ids': [reminder.id, True, '2']}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data['errors']), {1, 2})
+        self.assertTrue(Reminder.objects.filter(id=reminder.id).exists())
+
+        response = self.client.patch(self.url, [{'id': True, 'title': 'Renamed'}], format='json')
+        self.assertEqual(response.data['errors'][0], {'id': ['Not found.']})
+
+    def test_bulk_write_invalidates_dashboard(self):
+        """Test that a bulk write drops the cached dashboard"""
+        self.client.get(reverse('dashboard'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, self.items(2), format='json')
+
+        self.assertEqual(self.client.get(reverse('dashboard')).data['total_reminders'], 2)
+
+
+class TestListSerialization(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.add_reminders(3)
+
+    def add_reminders(self, count):
+        for i in range(count):
+            reminder = Reminder.objects.create(
+                user=self.user,
+                title=f'Reminder {i}',
+                message='Message',
+                scheduled_time=timezone.now() + timedelta(days=1)
+            )
+            EmailLog.objects.create(reminder=reminder, to_email='test@example.com', subject='Subject', body='Body', status='success')
+
+    def assertConstantQueries(self, url, expected):
+        """Fail if the number of queries grows with the number of rows, i.e. an N+1"""
+        with self.assertNumQueries(expected):
+            self.client.get(url)
+        self.add_reminders(10)
+        cache.clear()
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_reminder_list_has_no_n_plus_one(self):
+        """Test that listing reminders takes one query regardless of the number of rows"""
+        self.assertConstantQueries(reverse('reminder-list'), 1)
+
+    def test_email_log_list_has_no_n_plus_one(self):
+        """Test that listing email logs takes one query regardless of the number of rows"""
+        self.assertConstantQueries(reverse('email_log-list'), 1)
+
+    def test_dashboard_has_no_n_plus_one(self):
+        """Test that the dashboard takes three queries regardless of the number of rows"""
+        self.assertConstantQueries(reverse('dashboard'), 3)
+
+    @override_settings(MESSAGE_BODY_COMPRESS_THRESHOLD=10)
+    def test_list_output_matches_model_serializers(self):
+        """Test that the values() serializers produce the same output as the model serializers"""
+        EmailLog.objects.create(
+            reminder=None, to_email='test@example.com', subject='Subject', body='Long body ' * 10, status='failed'
+        )
+
+        reminders = Reminder.objects.order_by('id')
+        logs = EmailLog.objects.order_by('id')
+        self.assertEqual(
+            ReminderListSerializer(ReminderListSerializer.values(reminders)).data,
+            ReminderSerializer(reminders, many=True).data
+        )
+        self.assertEqual(
+            EmailLogListSerializer(EmailLogListSerializer.values(logs)).data,
+            EmailLogSerializer(logs, many=True).data
+        )
+
+    def test_json_matches_standard_renderer(self):
+        """Test that the orjson renderer produces the same JSON as DRF's renderer"""
+        response = self.client.get(reverse('reminder-list'), {'page_size': 2})
+
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content), json.loads(JSONRenderer().render(response.data)))
+        self.assertEqual(json.loads(response.content)['next'], response.data['next'])
+
+
+class TestEmailLogExport(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('email_log-export')
+        self.logs = []
+        for i in range(5):
+            reminder = Reminder.objects.create(
+                user=self.user,
+                title=f'Reminder {i}',
+                message='Message',
+                scheduled_time=timezone.now()
+            )
+            self.logs.append(EmailLog.objects.create(
+                reminder=reminder, to_email='test@example.com', subject=f'Subject, "{i}"', body=f'Body {i}', status='success'
+            ))
+        other = User.objects.create_user(username='otheruser', password='testpassword123')
+        reminder = Reminder.objects.create(user=other, title='Other', message='Message', scheduled_time=timezone.now())
+        EmailLog.objects.create(reminder=reminder, to_email='other@example.com', subject='Other', body='Body', status='success')
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson_export(self):
+        """Test that NDJSON export streams the user's logs oldest first in the list format"""
+        response, content = self.export(format='ndjson')
+
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertTrue(response['Content-Type'].startswith('application/x-ndjson'))
+        self.assertEqual([row['id'] for row in rows], [log.id for log in self.logs])
+        self.assertEqual(rows[0], EmailLogSerializer(self.logs[0]).data)
+
+    def test_csv_export(self):
+        """Test that CSV export has a header row and quotes values"""
+        response, content = self.export(format='csv')
+
+        lines = content.decode().splitlines()
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertEqual(lines[0], 'id,reminder,to_email,subject,body,status,sent_at,error_message')
+        self.assertEqual(len(lines), 6)
+        self.assertIn('"Subject, ""0"""', lines[1])
+
+        # An empty export still has the header
+        _, content = self.export(format='csv', after=self.logs[-1].id)
+        self.assertEqual(content.decode().splitlines(), [lines[0]])
+
+    def test_resume_after_cursor_and_since(self):
+        """Test that ?after= resumes after a log id and ?since= filters on the send time"""
+        _, content = self.export(format='ndjson', after=self.logs[2].id)
+        self.assertEqual([json.loads(line)['id'] for line in content.splitlines()], [self.logs[3].id, self.logs[4].id])
+
+        EmailLog.objects.filter(id__in=[log.id for log in self.logs[:4]]).update(sent_at=timezone.now() - timedelta(days=2))
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        _, content = self.export(format='ndjson', since=since)
+        self.assertEqual([json.loads(line)['id'] for line in content.splitlines()], [self.logs[4].id])
+
+        response = self.client.get(self.url, {'format': 'ndjson', 'since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_gzip(self):
+        """Test that the export is gzip-compressed when the client accepts it"""
+        response = self.client.get(self.url, {'format': 'ndjson'}, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(len(content.splitlines()), 5)
+
+    @patch('core.renderers.StreamingRenderer.rows_per_chunk', 2)
+    def test_export_streams_in_chunks(self):
+        """Test that the response is sent in chunks of rows rather than as one body"""
+        response = self.client.get(self.url, {'format': 'ndjson'})
+        self.assertEqual([len(chunk.splitlines()) for chunk in response.streaming_content], [2, 2, 1])
+
+    def test_unknown_format(self):
+        """Test that only CSV and NDJSON can be requested"""
+        self.assertEqual(self.client.get(self.url, {'format': 'xml'}).status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,112 @@
+"""
+Sliding-window request throttling in Redis.
+
+DRF's SimpleRateThrottle keeps a list of request timestamps per user in the
+cache and rewrites it on every request, which costs O(rate) and can lose
+updates when two workers handle requests from the same user at once.
+SlidingWindowRateThrottle keeps two counters per user instead, for the
+current and the previous fixed window, and counts the previous window in
+proportion to how much of it still overlaps the sliding window. The check
+and the increment happen in one Lua script, so they are atomic. A sliding
+window counter is used rather than GCRA because GCRA lets a client send a
+full burst and then keep sending at the steady rate, nearly twice the
+configured number of requests per period.
+
+Rates and scopes come from DEFAULT_THROTTLE_RATES as usual. When the cache
+isn't django-redis, the parent class's cache-based implementation is used.
+"""
+import logging
+from django_redis import get_redis_connection
+from rest_framework.throttling import UserRateThrottle
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'throttle:window:'
+
+# Returns {1, remaining requests} if the request is allowed and counted,
+# otherwise {0, seconds until it would be allowed}.
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local duration = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local window = math.floor(now / duration)
+local elapsed = now - window * duration
+
+local data = redis.call('HMGET', KEYS[1], 'window', 'current', 'previous')
+local stored = tonumber(data[1])
+local current = tonumber(data[2]) or 0
+local previous = tonumber(data[3]) or 0
+if stored == window - 1 then
+    previous, current = current, 0
+elseif stored ~= window then
+    previous, current = 0, 0
+end
+
+local estimate = previous * (1 - elapsed / duration) + current
+if estimate + 1 > limit then
+    local excess = estimate + 1 - limit
+    local wait
+    if previous > 0 and excess * duration / previous <= duration - elapsed then
+        -- Allowed once enough of the previous window has slid out
+        wait = excess * duration / previous
+    else
+        -- Only after this window ends and part of it has slid out too
+        wait = duration - elapsed + math.max(0, current + 1 - limit) * duration / math.max(current, 1)
+    end
+    return {0, tostring(wait)}
+end
+
+redis.call('HSET', KEYS[1], 'window', window, 'current', current + 1, 'previous', previous)
+redis.call('EXPIRE', KEYS[1], math.ceil(2 * duration))
+return {1, tostring(limit - estimate - 1)}
+"""
+
+_script = None
+
+
+def get_client():
+    """Return the Redis client behind the default cache, or None if it isn't django-redis"""
+    try:
+        return get_redis_connection('default')
+    except NotImplementedError:
+        return None
+
+
+class SlidingWindowRateThrottle(UserRateThrottle):
+    """UserRateThrottle counted in a Redis sliding window, O(1) per request"""
+    _wait = None
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        client = get_client()
+        if client is None:
+            return super().allow_request(request, view)
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        global _script
+        if _script is None:
+            _script = client.register_script(SLIDING_WINDOW_SCRIPT)
+        try:
+            allowed, value = _script(
+                keys=[KEY_PREFIX + self.key],
+                args=[self.num_requests, self.duration],
+                client=client
+            )
+        except Exception as exc:
+            # Don't reject requests because the throttle itself is unavailable
+            logger.warning(f"Throttle unavailable, allowing request: {exc}")
+            return True
+        if allowed:
+            return True
+        self._wait = float(value)
+        return self.throttle_failure()
+
+    def wait(self):
+        if self._wait is not None:
+            return self._wait
+        return super().wait()
@@ -11,6 +11,8 @@ from .views import (
     EmailLogViewSet,
     DashboardView,
     CleanupLogsView,
+    RateLimitView,
+    MetricsView,
     MyTokenObtainPairView
 )
 
@@ -36,5 +38,9 @@ urlpatterns = [
     path('tasks/reminder/', ReminderTaskView.as_view(), name='run_reminder'),
     path('tasks/cleanup-logs/', CleanupLogsView.as_view(), name='cleanup_logs'),
 
+    # Monitoring (admin-only, metrics also with METRICS_TOKEN)
+    path('rate-limits/', RateLimitView.as_view(), name='rate_limits'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+
     # Frontend test page
 ]
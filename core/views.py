@@ -1,21 +1,35 @@
 from rest_framework import generics, status, viewsets, filters
 from django.contrib.auth.models import User
 from .models import Reminder, EmailLog, UserProfile
-from .serializers import UserSerializer, ReminderSerializer, EmailLogSerializer, MyTokenObtainPairSerializer
+from .serializers import (
+    UserSerializer, ReminderSerializer, EmailLogSerializer, MyTokenObtainPairSerializer,
+    ReminderListSerializer, EmailLogListSerializer,
+)
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny, BasePermission
 from rest_framework.decorators import action
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.utils import timezone
-from django.db.models import Q
-from .tasks import birthday_task, reminder_task, send_email_task, clean_old_logs
-from rest_framework.throttling import UserRateThrottle
+from django.db.models import Count, Q
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
+from django.utils.crypto import constant_time_compare
+from . import bulk, idempotency, metrics, profiling, ratelimit
+from .cache import get_dashboard, set_dashboard
+from .filters import FullTextSearchFilter
+from .renderers import CSVRenderer, NDJSONRenderer
+from .tasks import birthday_task, reminder_task, send_email_task, clean_old_logs, email_queue
+from .throttling import SlidingWindowRateThrottle
 import logging
 
 logger = logging.getLogger(__name__)
 
-class EmailRateThrottle(UserRateThrottle):
+class EmailRateThrottle(SlidingWindowRateThrottle):
     scope = 'emails'
     
 class MyTokenObtainPairView(TokenObtainPairView):
@@ -31,12 +45,29 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_object(self):
-        return self.request.user
+        # request.user may be cached or built from the token, so load the row to update
+        return User.objects.get(pk=self.request.user.pk)
 
-class ReminderViewSet(viewsets.ModelViewSet):
+class ValuesListMixin:
+    """List through a values() based serializer instead of serializer_class"""
+    list_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        return self.values_response(self.filter_queryset(self.get_queryset()))
+
+    def values_response(self, queryset):
+        rows = self.list_serializer_class.values(queryset)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(self.list_serializer_class(rows).data)
+        return self.get_paginated_response(self.list_serializer_class(page).data)
+
+class ReminderViewSet(ValuesListMixin, viewsets.ModelViewSet):
     serializer_class = ReminderSerializer
+    list_serializer_class = ReminderListSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    # Full-text search runs after ordering so results are ranked unless ?ordering= is given
+    filter_backends = [filters.OrderingFilter, FullTextSearchFilter]
     search_fields = ['title', 'message']
     ordering_fields = ['scheduled_time', 'created_at', 'status']
     ordering = ['-scheduled_time']
@@ -49,36 +80,126 @@ class ReminderViewSet(viewsets.ModelViewSet):
         # Check if user is authenticated before filtering
         if not user.is_authenticated:
             return Reminder.objects.none()
-        return Reminder.objects.filter(user=user)
+        return Reminder.objects.filter(user=user).select_related('user')
     
-    @action(detail=False, methods=['get'])
-    def upcoming(self):
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def upcoming(self, request):
         """Return upcoming reminders"""
         now = timezone.now()
         reminders = self.get_queryset().filter(
             scheduled_time__gt=now,
             status='pending'
         ).order_by('scheduled_time')[:5]
-        serializer = self.get_serializer(reminders, many=True)
-        return Response(serializer.data)
+        return self.values_response(reminders)
     
+    def list_by_status(self, status):
+        return self.values_response(self.get_queryset().filter(status=status).order_by('-scheduled_time'))
+
     @action(detail=False, methods=['get'])
-    def sent(self):
+    def sent(self, request):
         """Return sent reminders"""
-        reminders = self.get_queryset().filter(status='sent').order_by('-scheduled_time')
-        serializer = self.get_serializer(reminders, many=True)
-        return Response(serializer.data)
+        return self.list_by_status('sent')
     
     @action(detail=False, methods=['get'])
-    def failed(self):
+    def failed(self, request):
         """Return failed reminders"""
-        reminders = self.get_queryset().filter(status='failed').order_by('-scheduled_time')
-        serializer = self.get_serializer(reminders, many=True)
-        return Response(serializer.data)
+        return self.list_by_status('failed')
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        """
+        Create (POST a list), update (PATCH a list of objects with an id) or
+        delete (DELETE {"ids": [...]}) many reminders at once. Nothing is
+        written unless every item is valid; errors are returned per item.
+        """
+        if request.method == 'DELETE':
+            return self.bulk_delete(request)
+
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'error': 'Expected a list of reminders'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.REMINDER_BULK_MAX_ITEMS:
+            return Response({
+                'error': f'At most {settings.REMINDER_BULK_MAX_ITEMS} reminders per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'POST':
+            return self.bulk_create(request, items)
+        return self.bulk_update(request, items)
+
+    def bulk_create(self, request, items):
+        serializer = self.get_serializer(data=items, many=True)
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        reminders = bulk.create_reminders(request.user, serializer.validated_data)
+        return Response(self.get_serializer(reminders, many=True).data, status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, request, items):
+        def item_id(item):
+            try:
+                if isinstance(item['id'], bool):
+                    return None
+                return int(item['id'])
+            except (KeyError, TypeError, ValueError):
+                return None
+
+        ids = [item_id(item) for item in items]
+        instances = self.get_queryset().select_related('user').in_bulk([i for i in ids if i is not None])
+
+        # Keyed by item position, like the list serializer used by bulk_create
+        errors, reminders, fields = {}, [], set()
+        for index, (item, reminder_id) in enumerate(zip(items, ids)):
+            reminder = instances.get(reminder_id)
+            if reminder is None:
+                errors[index] = {'id': ['Not found.']}
+                continue
+            serializer = self.get_serializer(reminder, data=item, partial=True)
+            if not serializer.is_valid():
+                errors[index] = serializer.errors
+                continue
+            for field, value in serializer.validated_data.items():
+                setattr(reminder, field, value)
+                fields.add(field)
+            reminders.append(reminder)
+
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        if fields:
+            bulk.update_reminders(request.user, reminders, sorted(fields))
+        return Response(self.get_serializer(reminders, many=True).data)
+
+    def bulk_delete(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list):
+            return Response({'error': 'Expected {"ids": [...]}'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > settings.REMINDER_BULK_MAX_ITEMS:
+            return Response({
+                'error': f'At most {settings.REMINDER_BULK_MAX_ITEMS} reminders per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # bool is a subclass of int, but true/false are not ids
+        errors = {
+            index: ['A valid integer is required.']
+            for index, i in enumerate(ids)
+            if not isinstance(i, int) or isinstance(i, bool)
+        }
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        deleted = bulk.delete_reminders(request.user, ids)
+        return Response({
+            'deleted': len(deleted),
+            'not_found': sorted(set(ids) - set(deleted))
+        }, status=status.HTTP_200_OK)
         
-class EmailLogViewSet(viewsets.ReadOnlyModelViewSet):
+class EmailLogViewSet(ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = EmailLogSerializer
+    list_serializer_class = EmailLogListSerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [FullTextSearchFilter]
+    search_fields = ['subject', 'to_email']
     
     def get_queryset(self):
         """
@@ -88,7 +209,45 @@ class EmailLogViewSet(viewsets.ReadOnlyModelViewSet):
         # Check if user is authenticated before filtering
         if not user.is_authenticated:
             return EmailLog.objects.none()
-        return EmailLog.objects.filter(reminder__user=user).order_by('-sent_at')
+        return EmailLog.objects.filter(reminder__user=user).select_related('message_body').order_by('-sent_at')
+
+    @method_decorator(gzip_page)
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """
+        Stream all of the user's email logs, oldest first, as CSV or NDJSON
+        (?format=csv|ndjson). ?since= limits them to logs sent at or after an
+        ISO 8601 time; a dropped download resumes with ?after=<last id received>.
+        """
+        queryset = self.get_queryset().order_by('id')
+        since = request.query_params.get('since')
+        if since:
+            since_time = parse_datetime(since)
+            if since_time is None:
+                return Response({'error': 'since must be an ISO 8601 date and time'}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(since_time):
+                since_time = timezone.make_aware(since_time)
+            queryset = queryset.filter(sent_at__gte=since_time)
+        after = request.query_params.get('after')
+        if after:
+            try:
+                queryset = queryset.filter(id__gt=int(after))
+            except ValueError:
+                return Response({'error': 'after must be an email log id'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Read through a server-side cursor on PostgreSQL, chunk by chunk elsewhere
+        rows = self.list_serializer_class.values(queryset).iterator(chunk_size=settings.EMAIL_LOG_EXPORT_CHUNK_SIZE)
+        serializer = self.list_serializer_class(rows)
+        renderer = request.accepted_renderer
+        header = [name for name, _, _ in self.list_serializer_class.fields]
+        response = StreamingHttpResponse(
+            renderer.render_stream(map(serializer.to_representation, rows), header=header),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = f'attachment; filename="email-logs.{renderer.format}"'
+        # Let proxies pass chunks on as they come instead of buffering the export
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
 class DashboardView(APIView):
     permission_classes = [IsAuthenticated]
@@ -101,13 +260,19 @@ class DashboardView(APIView):
         if not user.is_authenticated:
             return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
             
+        data = get_dashboard(user.id)
+        if data is not None:
+            return Response(data)
+
         now = timezone.now()
         
-        # Get counts
-        total_reminders = Reminder.objects.filter(user=user).count()
-        pending_reminders = Reminder.objects.filter(user=user, status='pending').count()
-        sent_reminders = Reminder.objects.filter(user=user, status='sent').count()
-        failed_reminders = Reminder.objects.filter(user=user, status='failed').count()
+        # Get all counts in one query
+        data = Reminder.objects.filter(user=user).aggregate(
+            total_reminders=Count('id'),
+            pending_reminders=Count('id', filter=Q(status__in=['pending', 'queued'])),
+            sent_reminders=Count('id', filter=Q(status='sent')),
+            failed_reminders=Count('id', filter=Q(status='failed')),
+        )
         
         # Get upcoming reminders
         upcoming_reminders = Reminder.objects.filter(
@@ -122,17 +287,11 @@ class DashboardView(APIView):
         ).order_by('-sent_at')[:10]
         
         # Serialize the data
-        upcoming_serializer = ReminderSerializer(upcoming_reminders, many=True)
-        logs_serializer = EmailLogSerializer(recent_logs, many=True)
+        data['upcoming_reminders'] = ReminderListSerializer(ReminderListSerializer.values(upcoming_reminders)).data
+        data['recent_logs'] = EmailLogListSerializer(EmailLogListSerializer.values(recent_logs)).data
         
-        return Response({
-            'total_reminders': total_reminders,
-            'pending_reminders': pending_reminders,
-            'sent_reminders': sent_reminders,
-            'failed_reminders': failed_reminders,
-            'upcoming_reminders': upcoming_serializer.data,
-            'recent_logs': logs_serializer.data
-        })
+        set_dashboard(user.id, data)
+        return Response(data)
 
 class SendEmailView(APIView):
     permission_classes = [IsAuthenticated]
@@ -140,8 +299,45 @@ class SendEmailView(APIView):
     
     def post(self, request):
         """
-        Send an immediate email (not a scheduled reminder)
+        Send an immediate email (not a scheduled reminder).
+        A request repeating an earlier Idempotency-Key gets the first response back.
         """
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return self.send(request)
+        if not key or len(key) > idempotency.MAX_KEY_LENGTH:
+            return Response({
+                'error': f'Idempotency-Key must be 1 to {idempotency.MAX_KEY_LENGTH} characters'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        cache_key = idempotency.request_key(request.user.id, key)
+        fingerprint = idempotency.fingerprint(request.data)
+        if not cache.add(cache_key, {'fingerprint': fingerprint}, settings.IDEMPOTENCY_KEY_TTL):
+            stored = cache.get(cache_key)
+            if stored is not None and stored['fingerprint'] != fingerprint:
+                return Response({
+                    'error': 'Idempotency-Key was already used for a different request'
+                }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if stored is None or 'status' not in stored:
+                return Response({
+                    'error': 'A request with this Idempotency-Key is in progress'
+                }, status=status.HTTP_409_CONFLICT)
+            return Response(stored['data'], status=stored['status'], headers={'Idempotent-Replayed': 'true'})
+
+        try:
+            response = self.send(request)
+        except Exception:
+            # Let the client retry with the same key
+            cache.delete(cache_key)
+            raise
+        cache.set(cache_key, {
+            'fingerprint': fingerprint,
+            'status': response.status_code,
+            'data': response.data,
+        }, settings.IDEMPOTENCY_KEY_TTL)
+        return response
+
+    def send(self, request):
         to_email = request.data.get('to_email')
         subject = request.data.get('subject')
         body = request.data.get('body')
@@ -151,23 +347,33 @@ class SendEmailView(APIView):
                 'error': 'Please provide to_email, subject, and body'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Create a reminder for tracking
+        # Create a reminder for tracking, already claimed so reminder_task won't send it again
         reminder = Reminder.objects.create(
             user=request.user,
             title=subject,
             message=body,
             scheduled_time=timezone.now(),
-            status='pending'
+            status='queued'
         )
         
         # Send the email
-        send_email_task.delay(to_email, subject, body, reminder_id=reminder.id)
+        send_email_task.apply_async(
+            args=(to_email, subject, body),
+            kwargs={'reminder_id': reminder.id},
+            queue=email_queue('send_now')
+        )
         
         return Response({
             'message': 'Email sent successfully',
             'reminder_id': reminder.id
         }, status=status.HTTP_200_OK)
 
+def task_headers(request):
+    """Message headers for a manually triggered task; staff users can ask for a profile with X-Profile: 1"""
+    if request.user.is_staff and request.headers.get('X-Profile', '').lower() in ('1', 'true'):
+        return {profiling.PROFILE_HEADER: True}
+    return None
+
 class BirthdayTaskView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -175,7 +381,7 @@ class BirthdayTaskView(APIView):
         """
         Manually trigger the birthday email task
         """
-        task = birthday_task.delay()
+        task = birthday_task.apply_async(headers=task_headers(request))
         return Response({
             'message': 'Birthday email task started',
             'task_id': task.id
@@ -188,7 +394,7 @@ class ReminderTaskView(APIView):
         """
         Manually trigger the reminder processing task
         """
-        task = reminder_task.delay()
+        task = reminder_task.apply_async(headers=task_headers(request))
         return Response({
             'message': 'Reminder processing task started',
             'task_id': task.id
@@ -201,10 +407,47 @@ class CleanupLogsView(APIView):
         """
         Manually trigger cleanup of old email logs
         """
-        task = clean_old_logs.delay()
+        task = clean_old_logs.apply_async(headers=task_headers(request))
         return Response({
             'message': 'Log cleanup task started',
             'task_id': task.id
         }, status=status.HTTP_200_OK)
 
+class RateLimitView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """
+        Return the current send rate limit bucket of each recipient domain
+        """
+        return Response(ratelimit.levels())
+
+class MetricsPermission(BasePermission):
+    """Bearer METRICS_TOKEN when one is configured, otherwise an admin user"""
+
+    def has_permission(self, request, view):
+        if not settings.METRICS_TOKEN:
+            return bool(request.user and request.user.is_staff)
+        return constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {settings.METRICS_TOKEN}')
+
+class MetricsView(APIView):
+    permission_classes = [MetricsPermission]
+
+    def get_authenticators(self):
+        # The bearer token is not a JWT
+        if settings.METRICS_TOKEN:
+            return []
+        return super().get_authenticators()
+
+    def get(self, request):
+        """
+        Return delivery metrics in the Prometheus text format
+        """
+        try:
+            body = metrics.render()
+        except Exception as exc:
+            logger.error(f"Could not read metrics: {exc}")
+            return HttpResponse('Metrics unavailable\n', status=503, content_type='text/plain')
+        return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # Frontend view removed
@@ -22,6 +22,45 @@ DEBUG = True
 ALLOWED_HOSTS = ['*']  # For development - restrict in production
 
 
+# Event-driven reminder scheduling (core.scheduler): reminders are queued in a Redis
+# sorted set and sent by `manage.py run_reminder_dispatcher` when due. reminder_task
+# then only runs as a reconciliation sweep every REMINDER_SWEEP_MINUTES.
+REMINDER_SCHEDULER_ENABLED = os.environ.get('REMINDER_SCHEDULER_ENABLED', 'False') == 'True'
+REMINDER_SWEEP_MINUTES = 30 if REMINDER_SCHEDULER_ENABLED else 5
+REMINDER_DISPATCHER_IDLE_SECONDS = 1.0
+# Longest pause after repeated dispatcher errors (Redis or database down)
+REMINDER_DISPATCHER_MAX_BACKOFF_SECONDS = 30
+
+# Write-behind recording of delivery outcomes (core.outcomes): logs and reminder
+# statuses are buffered in a Redis stream and written in bulk once FLUSH_SIZE are
+# waiting, and at least every FLUSH_SECONDS.
+EMAIL_WRITE_BEHIND = os.environ.get('EMAIL_WRITE_BEHIND', 'False') == 'True'
+EMAIL_WRITE_BEHIND_FLUSH_SIZE = 500
+EMAIL_WRITE_BEHIND_FLUSH_SECONDS = 10
+
+# Task profiling (core.profiling): with TASK_PROFILING_ENABLED, this share of the
+# runs of TASK_PROFILING_TASKS writes a cProfile dump and SQL timings to
+# TASK_PROFILING_DIR. Staff can profile a single run of a /api/tasks/ trigger with
+# the "X-Profile: 1" header.
+TASK_PROFILING_ENABLED = os.environ.get('TASK_PROFILING_ENABLED', 'False') == 'True'
+TASK_PROFILING_SAMPLE_RATE = float(os.environ.get('TASK_PROFILING_SAMPLE_RATE', 1.0))
+TASK_PROFILING_TASKS = [
+    'core.tasks.reminder_task',
+    'core.tasks.birthday_task',
+    'core.tasks.clean_old_logs',
+]
+TASK_PROFILING_DIR = os.environ.get('TASK_PROFILING_DIR', str(BASE_DIR / 'profiles'))
+
+# Prometheus metrics at /api/metrics/ (core.metrics), aggregated in Redis. Scrapers
+# authenticate with "Authorization: Bearer <METRICS_TOKEN>"; without a token the
+# endpoint is admin-only. The backlog gauges are refreshed every
+# METRICS_BACKLOG_INTERVAL_SECONDS and METRICS_QUEUES are the Celery queues whose
+# length is reported.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'False') == 'True'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_BACKLOG_INTERVAL_SECONDS = 60
+METRICS_QUEUES = ['high', 'normal', 'bulk']
+
 CELERY_BEAT_SCHEDULE = {
     'run-birthday-task-every-day': {
         'task': 'core.tasks.birthday_task',
@@ -29,7 +68,19 @@ CELERY_BEAT_SCHEDULE = {
     },
     'run-reminder-task-every-5-mins': {
         'task': 'core.tasks.reminder_task',
-        'schedule': crontab(minute='*/5'),
+        'schedule': crontab(minute=f'*/{REMINDER_SWEEP_MINUTES}'),
+    },
+    'flush-delivery-outcomes': {
+        'task': 'core.tasks.flush_delivery_outcomes',
+        'schedule': float(EMAIL_WRITE_BEHIND_FLUSH_SECONDS),
+    },
+    'update-backlog-metrics': {
+        'task': 'core.tasks.update_backlog_metrics',
+        'schedule': float(METRICS_BACKLOG_INTERVAL_SECONDS),
+    },
+    'create-email-log-partitions-every-day': {
+        'task': 'core.tasks.create_email_log_partitions',
+        'schedule': crontab(hour=3, minute=0),
     },
 }
 
@@ -53,6 +104,58 @@ INSTALLED_APPS = [
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Duplicate send protection (core.idempotency). Each delivery attempt claims a key in
+# Redis before SMTP, so a redelivered task message doesn't send again; the claim
+# expires after EMAIL_DEDUP_SENDING_TTL if the worker dies mid-attempt and is kept
+# EMAIL_DEDUP_TTL seconds once done. SendEmailView keeps responses to requests with
+# an Idempotency-Key header for IDEMPOTENCY_KEY_TTL seconds.
+EMAIL_DEDUP_ENABLED = os.environ.get('EMAIL_DEDUP_ENABLED', 'True') == 'True'
+EMAIL_DEDUP_SENDING_TTL = 600
+EMAIL_DEDUP_TTL = 86400
+IDEMPOTENCY_KEY_TTL = 86400
+
+# Fan-out batching: when set, birthday and reminder emails are sent in chunks
+# of this size over one connection (core.tasks.send_email_batch). 0 disables it.
+EMAIL_BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', 0))
+
+# Delivery engine for batched sends: 'sync' (one connection per batch, one message
+# at a time) or 'async' (core.async_smtp: each worker process sends concurrently over
+# up to EMAIL_ASYNC_POOL_SIZE persistent SMTP connections to EMAIL_HOST).
+EMAIL_ENGINE = os.environ.get('EMAIL_ENGINE', 'sync')
+EMAIL_ASYNC_POOL_SIZE = int(os.environ.get('EMAIL_ASYNC_POOL_SIZE', 10))
+EMAIL_ASYNC_BATCH_SIZE = 100  # used when EMAIL_BATCH_SIZE is 0
+
+# Per-recipient-domain send rates (core.ratelimit), e.g. {'gmail.com': '600/min', '*': '60/s'}.
+# Emails over the limit are rescheduled for their slot. Empty disables the limiter.
+EMAIL_DOMAIN_RATE_LIMITS = {}
+
+# reminder_task claims due reminders (pending -> queued) in batches of this size.
+# Reminders left queued longer than the timeout (e.g. after a worker crash) are reclaimed.
+REMINDER_CLAIM_BATCH_SIZE = 500
+REMINDER_QUEUED_TIMEOUT_MINUTES = 30
+
+# /api/reminders/bulk/: items accepted per request and rows written per statement
+REMINDER_BULK_MAX_ITEMS = 5000
+REMINDER_BULK_BATCH_SIZE = 500
+
+# birthday_task streams matching profiles from the database in chunks of this size
+BIRTHDAY_CHUNK_SIZE = 2000
+
+# GET /api/email-logs/export/ reads this many rows per database round trip
+EMAIL_LOG_EXPORT_CHUNK_SIZE = 2000
+
+# Compiled message templates (core.message_templates) kept per worker, LRU evicted
+MESSAGE_TEMPLATE_CACHE_SIZE = 256
+
+# Email log retention (clean_old_logs). On PostgreSQL the table can be partitioned by
+# sent_at with `manage.py emaillog_partitions --convert`; old partitions are then dropped
+# whole. Otherwise rows are deleted in primary-key chunks within a time budget per run.
+EMAIL_LOG_RETENTION_DAYS = 30
+EMAIL_LOG_PARTITION_INTERVAL = 'month'  # 'month' or 'day'
+EMAIL_LOG_PARTITIONS_AHEAD = 3
+EMAIL_LOG_DELETE_CHUNK_SIZE = 5000
+EMAIL_LOG_DELETE_TIME_LIMIT = 60  # seconds
+
 # Celery settings
 CELERY_BROKER_URL = 'redis://redis:6379/0'
 CELERY_RESULT_BACKEND = 'redis://redis:6379/0'
@@ -60,6 +163,36 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+# Acknowledge task messages after the task finishes instead of before, so a
+# crashed worker's tasks are redelivered. Safe for the email tasks, which skip
+# attempts already made (EMAIL_DEDUP_ENABLED).
+CELERY_TASK_ACKS_LATE = os.environ.get('CELERY_TASK_ACKS_LATE', 'False') == 'True'
+CELERY_TASK_REJECT_ON_WORKER_LOST = CELERY_TASK_ACKS_LATE
+
+# Queues: 'high' for interactive sends, 'normal' for reminders and periodic work,
+# 'bulk' for fan-out batches and maintenance. Workers must consume all three
+# (-Q high,normal,bulk) or be dedicated to one each, see docker-compose.yml.
+CELERY_TASK_DEFAULT_QUEUE = 'normal'
+CELERY_TASK_ROUTES = {
+    'core.tasks.send_email_task': {'queue': 'normal'},
+    'core.tasks.send_email_batch': {'queue': 'bulk'},
+    'core.tasks.send_email_batch_async': {'queue': 'bulk'},
+    'core.tasks.birthday_task': {'queue': 'bulk'},
+    'core.tasks.clean_old_logs': {'queue': 'bulk'},
+    'core.tasks.create_email_log_partitions': {'queue': 'bulk'},
+}
+# Queue for the email tasks sent from each call site, overriding CELERY_TASK_ROUTES:
+# SendEmailView, reminder delivery, birthday fan-out and retries of failed batch messages
+EMAIL_QUEUE_ROUTES = {
+    'send_now': 'high',
+    'reminder': 'normal',
+    'birthday': 'bulk',
+    'retry': 'normal',
+}
+# Messages each worker process reserves ahead. 1 keeps a worker busy with a long batch
+# from holding tasks other workers could run; dedicated bulk workers can raise it
+# with --prefetch-multiplier.
+CELERY_WORKER_PREFETCH_MULTIPLIER = int(os.environ.get('CELERY_WORKER_PREFETCH_MULTIPLIER', 1))
 
 # Redis cache settings
 CACHES = {
@@ -72,20 +205,47 @@ CACHES = {
     }
 }
 
+# Email bodies are stored once per distinct text (core.models.MessageBody); bodies
+# larger than this many bytes are zlib-compressed. None disables compression.
+MESSAGE_BODY_COMPRESS_THRESHOLD = 1024
+# intern() refreshes MessageBody.last_used at most this often (seconds); must stay
+# well below EMAIL_LOG_RETENTION_DAYS so bodies in use are never swept
+MESSAGE_BODY_TOUCH_INTERVAL = 24 * 60 * 60
+
+# Cached dashboard payloads are invalidated on reminder/log changes, the timeout
+# bounds staleness for bulk updates that skip signals
+DASHBOARD_CACHE_TIMEOUT = 60
+
+# Authenticated users are cached per process and in Redis (core.authentication),
+# invalidated on save/delete. The local timeout bounds how long other processes
+# keep a changed user. AUTH_JWT_STATELESS trusts the token's claims instead and
+# skips the lookup entirely.
+AUTH_USER_CACHE_TTL = 300
+AUTH_USER_LOCAL_CACHE_TTL = 5
+AUTH_USER_LOCAL_CACHE_SIZE = 10000
+AUTH_JWT_STATELESS = os.environ.get('AUTH_JWT_STATELESS', 'False') == 'True'
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_THROTTLE_CLASSES': [
         'rest_framework.throttling.ScopedRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'emails': '100/day',
     },
+    # Lists are keyset-paginated (core.pagination), ?page_size= up to 500
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
 # JWT settings
@@ -0,0 +1,42 @@
+"""
+Settings for `manage.py benchmark`. Uses a local SQLite file by default, or a
+local PostgreSQL database with BENCH_DB=postgres. Celery runs tasks eagerly and
+nothing needs Redis or an SMTP server. The benchmark wipes this database.
+"""
+from .settings import *  # noqa
+
+BENCHMARK = True
+
+if os.environ.get('BENCH_DB', 'sqlite') == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('BENCH_DB_NAME', 'notimailer_bench'),
+            'USER': os.environ.get('BENCH_DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('BENCH_DB_PASSWORD', ''),
+            'HOST': os.environ.get('BENCH_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('BENCH_DB_PORT', '5432'),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'bench.sqlite3',
+        }
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+CELERY_TASK_ALWAYS_EAGER = True
+CELERY_TASK_EAGER_PROPAGATES = True
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+EMAIL_ENGINE = 'sync'
+EMAIL_WRITE_BEHIND = False
+EMAIL_DEDUP_ENABLED = False
+REMINDER_SCHEDULER_ENABLED = False
+DEBUG = False